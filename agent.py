@@ -1,10 +1,6 @@
 # agent.py
-from groq import Groq
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+from typing import Iterator, Optional
+import tiers  # model tiers over the shared pooled client: hedging + failover
 
 SYSTEM_PROMPT = (
     "You are Mr.TomBot — an empathetic, non-clinical mental-health assistant.\n"
@@ -39,12 +35,15 @@ SYSTEM_PROMPT = (
 )
 
 
-def get_response(user_input: str) -> str:
+def stream_response(user_input: str, session: Optional[str] = None) -> Iterator[str]:
     """
     user_input: the full prompt from app.py (includes latest query and optional context).
-    Returns a single string (non-stream) for the UI to render/stream locally.
+    session: the chat's session id, so the rate-limit scheduler can take turns between chats.
+    Yields text deltas as Groq streams them, so the UI can render the first token immediately.
     """
-    completion = client.chat.completions.create(
+    completion = tiers.stream_completion(
+        app="therapy",
+        session=session,
         model="llama-3.1-8b-instant",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -53,11 +52,19 @@ def get_response(user_input: str) -> str:
         temperature=1,            # lower drift, steady tone
         max_completion_tokens=400,  # enough for concise, useful replies
         top_p=0.1,
-        stream=True,                # stream from Groq API; we buffer to a single string
+        stream=True,
         stop=None,
     )
+    try:
+        for chunk in completion:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    finally:
+        # Consumer stopped early (or errored): release the HTTP connection
+        completion.close()
 
-    response = ""
-    for chunk in completion:
-        response += chunk.choices[0].delta.content or ""
-    return response
+
+def get_response(user_input: str) -> str:
+    """Non-streaming convenience wrapper: the full reply as one string."""
+    return "".join(stream_response(user_input))
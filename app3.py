@@ -1,10 +1,11 @@
 # app2.py  (THERAPY CHAT)
 from __future__ import annotations
-import os, re, time
-from typing import List, Dict
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Optional
 import streamlit as st
 from dotenv import load_dotenv
-from fpdf import FPDF
 from datetime import datetime
 
 # ================== ENV / PAGE ==================
@@ -17,44 +18,59 @@ try:
 except Exception:
     pass
 
-from agent import get_response  # uses your existing streaming Groq wrapper
+from backend import get_backend  # stream_chat yields Groq deltas as they arrive (in-process or via service.py)
+from chat_memory import ConversationMemory
+from retrieval import new_index
+from session_store import get_store, resume_or_create
+from message_store import get_registry, SessionMessages, Avatar, AVATAR_PATHS, RESUME_PAGE
+from rules import get_rules
+import metrics
 
 # ================== UI HELPERS ==================
-THERAPIST_ICON = "assets/favicon.png"
-SOLUTION_ICON  = "assets/green.png"
-OOS_ICON       = "assets/red.png"
-
-def show_crisis_banner(text: str):
-    t = (text or "").lower()
-    if any(k in t for k in ["suicide", "self-harm", "kill myself", "hurt myself"]):
-        st.info("If you're in danger or considering self-harm, call 988 (U.S.) or local emergency services.", icon="🆘")
-
-def classify_avatar(text: str) -> str:
-    t = (text or "").lower()
-    oos = ["outside my scope","out of scope","cannot assist","i can’t assist","i can't assist",
-           "i can’t help","i can't help","contact hr","report to hr","authorities",
-           "legal advice","lawsuit","file a case","police report","financial advice",
-           "tax advice","not able to help"]
-    if any(x in t for x in oos):
+THERAPIST_ICON = AVATAR_PATHS[Avatar.THERAPIST]
+SOLUTION_ICON  = AVATAR_PATHS[Avatar.SOLUTION]
+OOS_ICON       = AVATAR_PATHS[Avatar.OUT_OF_SCOPE]
+
+CRISIS_MESSAGE = "If you're in danger or considering self-harm, call 988 (U.S.) or local emergency services."
+RULES = get_rules()   # keyword sets from rules.json, compiled once per process
+
+def show_crisis_banner(text: str) -> bool:
+    if RULES.matches(text, "crisis"):
+        st.info(CRISIS_MESSAGE, icon="🆘")
+        return True
+    return False
+
+def classify_avatar(text: str, found=None) -> str:
+    """`found`: categories already matched (e.g. by the stream matcher), to skip a rescan."""
+    if found is None:
+        found = RULES.scan(text, stop_at=("out_of_scope",), categories=("out_of_scope", "solution"))
+    if "out_of_scope" in found:
         return OOS_ICON
-    solution = ["steps","plan","solution","checklist","follow these","next actions",
-                "here’s how","here is how","actionable","tl;dr","tldr"]
-    if any(x in t for x in solution):
+    if "solution" in found:
         return SOLUTION_ICON
     return THERAPIST_ICON
 
-def stream_text(s: str, delay: float = 0.02):
-    for part in re.split(r'(\n\n+|\n)', s):
-        if part:
-            yield part
-            time.sleep(delay)
+def watch_stream(deltas, matcher, banner, already_shown: bool = False):
+    """
+    Pass stream deltas through `matcher`, raising the crisis banner as soon as a crisis
+    phrase arrives instead of after the reply completes.
+    """
+    for delta in deltas:
+        if not already_shown and "crisis" in matcher.feed(delta):
+            banner.info(CRISIS_MESSAGE, icon="🆘")
+            already_shown = True
+        yield delta
 
-def build_full_prompt(history: List[Dict[str, str]], latest: str, mode: str, max_turns: int = 24) -> str:
-    pruned = [m for m in history if m["role"] in ("user","assistant")]
-    if len(pruned) > max_turns:
-        pruned = pruned[-max_turns:]
-    history_lines = [("User" if m["role"]=="user" else "Assistant") + f": {m['content']}" for m in pruned]
-    history_text = "\n".join(history_lines) if history_lines else "(none)"
+HISTORY_TOKEN_BUDGET = 1500   # prompt tokens reserved for prior conversation
+HISTORY_WINDOW = int(os.getenv("HUB_CHAT_WINDOW", "30"))   # messages drawn; "load earlier" widens it
+
+def build_full_prompt(memory: ConversationMemory, latest: str, mode: str) -> str:
+    """
+    memory holds the turns *before* `latest`. With a retrieval index (HUB_RETRIEVAL=on) the
+    history is the last few turns plus the earlier ones relevant to `latest`; otherwise the
+    summary + recent window, cached between turns.
+    """
+    history_text = memory.history_text(latest) or "(none)"
 
     if mode == "Segmented explainer":
         style_rule = ("When explaining, use up to 4 sections: TL;DR, Key Points, Steps, Next Actions. "
@@ -69,14 +85,25 @@ def build_full_prompt(history: List[Dict[str, str]], latest: str, mode: str, max
              f"Latest query:\n{latest}" )
 
 # ----------- Export helpers (ALWAYS return bytes) -----------
+# PDFs render on a small worker pool, off the Streamlit script thread
+_EXPORT_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+
+@lru_cache(maxsize=1)
+def _pdf_font_path() -> Optional[str]:
+    """Unicode font lookup, done once per process."""
+    font_path = "assets/DejaVuSans.ttf"
+    return font_path if os.path.exists(font_path) else None
+
 def _export_pdf_bytes(messages: List[Dict[str, str]], title="Chat Therapy") -> bytes:
+    from fpdf import FPDF   # only paid for when someone actually exports
+
     pdf = FPDF()
     pdf.set_margins(15, 15, 15)
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
 
-    font_path = "assets/DejaVuSans.ttf"
-    if os.path.exists(font_path):
+    font_path = _pdf_font_path()
+    if font_path:
         pdf.add_font("DejaVu", "", font_path, uni=True)
         pdf.add_font("DejaVu", "B", font_path, uni=True)
         body_font = ("DejaVu", "", 10); head_font = ("DejaVu", "B", 16); role_font = ("DejaVu", "B", 11)
@@ -115,6 +142,100 @@ def _export_md_bytes(messages: List[Dict[str, str]]) -> bytes:
         lines.append(f"**{role}:**\n\n{m['content']}\n")
     return ("\n---\n".join(lines)).encode("utf-8")
 
+EXPORTS = {
+    # kind: (label, extension, mime, builder)
+    "pdf": ("PDF", "pdf", "application/pdf", _export_pdf_bytes),
+    "md": ("Markdown", "md", "text/markdown", _export_md_bytes),
+}
+
+def _export_job(kind: str, sid: str, end_seq: int) -> bytes:
+    """Export pool: the whole conversation before end_seq, read from session_store (memory holds only a tail)."""
+    return EXPORTS[kind][3](get_store().load_before(sid, end_seq, end_seq))
+
+def _schedule_export(kind: str, history: SessionMessages):
+    """Start (or reuse) the export job for the current conversation version."""
+    exports = st.session_state.setdefault("exports", {})    # kind -> (version, Future[bytes])
+    version = history.version()
+    entry = exports.get(kind)
+    if entry is None or entry[0] != version:
+        end_seq = history.first_seq + len(history)          # the worker must not see later appends
+        entry = exports[kind] = (version, _EXPORT_POOL.submit(_export_job, kind, history.sid, end_seq))
+    return entry[1]
+
+def _refresh_requested_exports(history: SessionMessages):
+    """After a new message, re-render in the background only the exports this session asked for."""
+    for kind in list(st.session_state.get("exports", {})):
+        _schedule_export(kind, history)
+
+@st.fragment
+def _export_panel(sid: str):
+    """
+    Exports are built only on request and memoized per conversation version, so a
+    plain rerun does no export work. Once requested, they are kept fresh in the background.
+    A fragment: its buttons rerun only this panel.
+    """
+    history = get_registry().get(sid)
+    version = history.version()
+    exports = st.session_state.get("exports", {})
+    stamp = datetime.now().strftime('%Y%m%d_%H%M')
+    for col, kind in zip(st.columns(len(EXPORTS)), EXPORTS):
+        label, ext, mime, _ = EXPORTS[kind]
+        entry = exports.get(kind)
+        with col:
+            if entry and entry[0] == version and entry[1].done() and entry[1].exception() is None:
+                st.download_button(f"⬇️ Download {label}", data=entry[1].result(),
+                                   file_name=f"chat_therapy_{stamp}.{ext}", mime=mime,
+                                   use_container_width=True, key=f"download_{kind}")
+            elif st.button(f"📄 Prepare {label}", use_container_width=True, key=f"prepare_{kind}"):
+                fut = _schedule_export(kind, history)
+                with st.spinner(f"Rendering {label}…"):
+                    err = fut.exception()
+                if err is not None:
+                    st.session_state["exports"].pop(kind, None)
+                    st.error(f"{label} export failed: {err}")
+                else:
+                    st.rerun(scope="fragment")
+
+# ----------- Chat log (windowed) -----------
+def _window(history: SessionMessages, window: int):
+    """
+    (role, avatar, text) for the last `window` messages. Kept per session by seq, so a
+    rerun doesn't decompress or re-read older messages; entries outside the window are pruned.
+    """
+    cache = st.session_state.setdefault("rendered", {})    # seq -> (role, avatar, text)
+    messages = history.recent(window)
+    first = history.first_seq + len(history) - len(messages)
+    out = []
+    for seq, m in enumerate(messages, first):
+        item = cache.get(seq)
+        if item is None:
+            item = cache[seq] = (m.role_name, m.avatar_path, m.content)
+        out.append(item)
+    if len(cache) > len(out):
+        for seq in [k for k in cache if k < first]:
+            del cache[seq]
+    return out
+
+@st.fragment
+def _chat_log(sid: str):
+    """
+    The last HISTORY_WINDOW messages; "load earlier" widens the window (paging older
+    messages in from session_store when needed) and reruns only this fragment, so a
+    long conversation costs a constant amount of drawing per rerun.
+    """
+    history = get_registry().get(sid)
+    window = st.session_state.setdefault("history_window", HISTORY_WINDOW)
+    if len(history) > window or (history and history.first_seq > 1):
+        if st.button("⬆️ Load earlier messages", use_container_width=True):
+            if len(history) < window + RESUME_PAGE and history.first_seq > 1:
+                history.prepend(get_store().load_before(sid, history.first_seq, RESUME_PAGE))
+            st.session_state.history_window = window + RESUME_PAGE
+            st.rerun(scope="fragment")
+    with metrics.phase("therapy", "render_history"):
+        for role, avatar, text in _window(history, window):
+            with st.chat_message(role, avatar=avatar):
+                st.markdown(text)
+
 # ======= PUBLIC RENDER FUNCTION =======
 def render_therapy():
     # ================== SIDEBAR ==================
@@ -125,12 +246,29 @@ def render_therapy():
         st.write("GROQ_API_KEY present:", bool(os.getenv("GROQ_API_KEY")))
         mode = st.radio("Reply style", ["Therapist (concise)", "Segmented explainer"], index=0)
         if st.button("🆕 New chat", use_container_width=True):
+            if "session_id" in st.session_state:
+                get_registry().drop(st.session_state.session_id)
             st.session_state.clear()
+            st.query_params.pop("therapy_sid", None)
             st.rerun()
 
     # ================== SESSION ==================
-    if "messages" not in st.session_state:
-        st.session_state.messages: List[Dict[str, str]] = []
+    # The session id lives in the URL, so a reload or another replica resumes the same chat.
+    # The messages live in the process-wide message_store registry, not in session_state,
+    # so idle tabs can be evicted (they reload from session_store on the next rerun).
+    store = get_store()
+    registry = get_registry()
+    if "session_id" not in st.session_state:
+        sid, resumed = resume_or_create("therapy", st.query_params)
+        st.session_state.session_id = sid
+        registry.get(sid, resume=resumed)
+    history = registry.get(st.session_state.session_id)
+    # Prompt memory (and its retrieval index) hangs off the registry's history, not
+    # session_state: it is capped and evicted with the messages and rebuilt on reload.
+    if history.memory is None:
+        history.memory = ConversationMemory.from_messages(
+            history.export(), budget_tokens=HISTORY_TOKEN_BUDGET, index=new_index())
+    memory: ConversationMemory = history.memory
 
     # ================== HEADER ==================
     st.markdown("""
@@ -142,7 +280,7 @@ def render_therapy():
     """, unsafe_allow_html=True)
 
     # Welcome card
-    if not st.session_state.messages:
+    if not history:
         st.markdown("""
         <div style="display:flex;justify-content:center;margin-top:24px;">
           <div style="max-width:720px;padding:16px;border-radius:16px;
@@ -153,46 +291,65 @@ def render_therapy():
         </div>
         """, unsafe_allow_html=True)
 
-    # History
-    for m in st.session_state.messages:
-        avatar = m.get("avatar") if m["role"] == "assistant" else None
-        with st.chat_message(m["role"], avatar=avatar):
-            st.markdown(m["content"])
+    # History: a fragment (only the last HISTORY_WINDOW messages; older ones on request)
+    _chat_log(st.session_state.session_id)
 
-    # Input / Response
+    # Input / Response. chat_input stays in the main script (pinned to the bottom): a new
+    # message reruns the page, which is cheap now that the log is windowed and cached.
     if prompt := st.chat_input("What’s on your mind?"):
-        show_crisis_banner(prompt)
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        crisis_shown = show_crisis_banner(prompt)
+        with metrics.phase("therapy", "prompt_build"):
+            full_prompt = build_full_prompt(memory, prompt, mode)
+        # Persisted before streaming: if the reply is interrupted (a rerun, a closed tab), the
+        # store still holds every message in memory, so index i stays seq first_seq + i.
+        user_msg = history.append("user", prompt)
+        memory.add("user", prompt)
+        with metrics.phase("therapy", "persist"):
+            store.append(st.session_state.session_id, user_msg.to_dict())
+            store.flush()
+        with st.chat_message("user"):
+            st.markdown(prompt)
 
-        full_prompt = build_full_prompt(st.session_state.messages, prompt, mode, max_turns=24)
-        try:
-            reply_text = get_response(full_prompt) or "[No response]"
-        except Exception as e:
-            reply_text = f"[Error contacting model] {e}"
+        # Stream tokens straight into the chat bubble; the avatar depends on the full
+        # reply, so the bubble is redrawn once the stream ends if it needs a different one.
+        banner = st.empty()
+        slot = st.empty()
+        matcher = RULES.stream()
+        with slot.container(), metrics.phase("therapy", "llm_stream"):
+            with st.chat_message("assistant", avatar=THERAPIST_ICON):
+                try:
+                    reply_text = st.write_stream(watch_stream(get_backend().stream_chat(full_prompt, st.session_state.session_id), matcher, banner, crisis_shown))
+                except Exception as e:
+                    reply_text = f"[Error contacting model] {e}"
+                    matcher = None
+                    st.markdown(reply_text)
+        if not isinstance(reply_text, str):
+            reply_text = "".join(str(part) for part in reply_text)
+        redraw = not reply_text
+        reply_text = reply_text or "[No response]"
 
-        avatar_path = classify_avatar(reply_text)
-        with st.chat_message("assistant", avatar=avatar_path):
-            if len(reply_text) > 500:
-                st.write_stream(stream_text(reply_text))
-            else:
-                st.markdown(reply_text)
+        avatar_path = classify_avatar(reply_text, matcher.seen if matcher else None)
+        if redraw or avatar_path != THERAPIST_ICON:
+            with slot.container():
+                with st.chat_message("assistant", avatar=avatar_path):
+                    st.markdown(reply_text)
 
-        st.session_state.messages.append({"role": "assistant", "content": reply_text, "avatar": avatar_path})
+        reply_msg = history.append("assistant", reply_text, avatar_path)
+        memory.add("assistant", reply_text)
+        with metrics.phase("therapy", "persist"):
+            store.append(st.session_state.session_id, reply_msg.to_dict())
+            store.flush()
+        with metrics.phase("therapy", "export"):
+            _refresh_requested_exports(history)
 
     # ================== FOOTER: EXPORT ==================
-    # (Keeping your layout; these helpers output bytes)
-    if st.session_state.get("messages"):
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.download_button("⬇️ Download PDF", data=_export_pdf_bytes(st.session_state["messages"]),
-                                  file_name=f"chat_therapy_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
-                                  mime="application/pdf", use_container_width=True):
-                pass
-        with col2:
-            if st.download_button("⬇️ Download Markdown", data=_export_md_bytes(st.session_state["messages"]),
-                                  file_name=f"chat_therapy_{datetime.now().strftime('%Y%m%d_%H%M')}.md",
-                                  mime="text/markdown", use_container_width=True):
-                pass
+    if history:
+        with metrics.phase("therapy", "export_panel"):
+            _export_panel(st.session_state.session_id)
+
+    # Drawn last so it includes this rerun's timings
+    with st.sidebar:
+        metrics.render_panel(st, "therapy")
 
 # Allow standalone run
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+# backend.py  (PLUGGABLE AGENT BACKEND — IN-PROCESS OR REMOTE SERVICE)
+from __future__ import annotations
+import os, json, threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+# One call's outcome in a batch: the parsed record, or the exception that row raised
+BatchResult = Union[Dict[str, Any], Exception]
+
+class BackendError(RuntimeError):
+    """The remote service answered with an error (message = its error text)."""
+
+class LocalBackend:
+    """Runs the agents in this process (the default): shared llm_client pool and scheduler."""
+    name = "local"
+
+    def stream_chat(self, prompt: str, session: Optional[str] = None) -> Iterator[str]:
+        from agent import stream_response
+        return stream_response(prompt, session)
+
+    def extract(self, description: str, fast_path: bool = True, session: Optional[str] = None) -> Dict[str, Any]:
+        import scheduler
+        from prodbot import extract, coerce_json
+        with scheduler.lane(scheduler.INTERACTIVE, session):
+            return extract(description, fast_path=fast_path, parse=coerce_json)
+
+    def extract_batch(self, descriptions: Sequence[str], fast_path: bool = True, pack: bool = False,
+                      session: Optional[str] = None) -> List[BatchResult]:
+        """
+        One work unit in the scheduler's batch lane. pack=True sends the descriptions as one
+        request (prodbot.extract_many); otherwise they run one after another.
+        """
+        import scheduler
+        from prodbot import extract, extract_many, coerce_json
+        with scheduler.lane(scheduler.BATCH, session):
+            if pack:
+                return extract_many(descriptions, fast_path=fast_path, parse=coerce_json)
+            out: List[BatchResult] = []
+            for desc in descriptions:
+                try:
+                    out.append(extract(desc, fast_path=fast_path, parse=coerce_json))
+                except Exception as e:
+                    out.append(e)
+            return out
+
+class HTTPBackend:
+    """
+    Client for service.py. One pooled httpx client per process; chat arrives as SSE and
+    is yielded delta by delta, so the UI streams exactly as it does in-process.
+    """
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        import httpx
+        self.name = base_url.rstrip("/")
+        self._client = httpx.Client(
+            base_url=self.name,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        )
+
+    def _post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        r = self._client.post(path, json=body)
+        try:
+            data = r.json()
+        except ValueError:
+            data = {}
+        if r.status_code >= 400:
+            raise BackendError(data.get("error") or f"{path}: HTTP {r.status_code}")
+        return data
+
+    def stream_chat(self, prompt: str, session: Optional[str] = None) -> Iterator[str]:
+        with self._client.stream("POST", "/v1/chat/stream", json={"prompt": prompt, "session": session}) as r:
+            if r.status_code >= 400:
+                r.read()
+                raise BackendError(_error_of(r) or f"/v1/chat/stream: HTTP {r.status_code}")
+            event = "message"
+            for line in r.iter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[5:])
+                    if event == "error":
+                        raise BackendError(data.get("error") or "chat stream failed")
+                    if event == "done":
+                        return
+                    if data.get("delta"):
+                        yield data["delta"]
+                elif not line:
+                    event = "message"
+
+    def extract(self, description: str, fast_path: bool = True, session: Optional[str] = None) -> Dict[str, Any]:
+        return self._post("/v1/extract", {"description": description, "fast_path": fast_path,
+                                          "session": session})["result"]
+
+    def extract_batch(self, descriptions: Sequence[str], fast_path: bool = True, pack: bool = False,
+                      session: Optional[str] = None) -> List[BatchResult]:
+        data = self._post("/v1/extract/batch", {"descriptions": list(descriptions), "fast_path": fast_path,
+                                                "pack": pack, "session": session})
+        return [BackendError(item["error"]) if "error" in item else item["result"] for item in data["results"]]
+
+def _error_of(response) -> Optional[str]:
+    try:
+        return response.json().get("error")
+    except ValueError:
+        return None
+
+# ==============================================================================
+# PROCESS SINGLETON — HUB_BACKEND_URL=http://host:8000 sends all agent calls to service.py
+# ==============================================================================
+_lock = threading.Lock()
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                url = os.getenv("HUB_BACKEND_URL", "").strip()
+                _backend = HTTPBackend(url) if url else LocalBackend()
+    return _backend
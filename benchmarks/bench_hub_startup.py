@@ -0,0 +1,88 @@
+# benchmarks/bench_hub_startup.py  (HUB COLD START / ROUTE SWITCH)
+"""
+Measures what hub.py pays before it can draw anything, and what a route switch costs.
+
+    python benchmarks/bench_hub_startup.py [--runs 7]
+
+cold start    fresh interpreter importing what the landing page needs
+                before: streamlit + llm_client (Groq SDK, httpx) imported eagerly
+                after:  streamlit + hub_registry (tile metadata only)
+route switch  resolving an app's render function inside one process
+                before: _import_first/_call_render probing on every rerun
+                after:  hub_registry.load_render (first call imports, then memoized)
+
+Every number is a median over --runs fresh subprocesses, in milliseconds.
+"""
+from __future__ import annotations
+import os, sys, json, argparse, statistics, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_BEFORE = "import streamlit, importlib, llm_client"
+COLD_AFTER = "import streamlit, importlib, hub_registry"
+
+# Route switch: time the first resolve and the mean of 50 repeated resolves (= later reruns)
+ROUTE_BEFORE = """
+import importlib, time, json
+def _import_first(mod_names):
+    for name in mod_names:
+        try:
+            return importlib.import_module(name)
+        except Exception:
+            continue
+def resolve(mods, fns):
+    mod = _import_first(mods)
+    return next(getattr(mod, f) for f in fns if hasattr(mod, f))
+out = {}
+for key, mods, fns in (("therapy", ["app3", "app2"], ["render_therapy", "render"]),
+                       ("extractor", ["prodapp", "prodapp2"], ["render_extractor", "render"])):
+    t = time.perf_counter(); resolve(mods, fns); first = time.perf_counter() - t
+    t = time.perf_counter()
+    for _ in range(50): resolve(mods, fns)
+    out[key] = (first, (time.perf_counter() - t) / 50)
+print(json.dumps(out))
+"""
+
+ROUTE_AFTER = """
+import time, json
+from hub_registry import load_render
+out = {}
+for key in ("therapy", "extractor"):
+    t = time.perf_counter(); load_render(key); first = time.perf_counter() - t
+    t = time.perf_counter()
+    for _ in range(50): load_render(key)
+    out[key] = (first, (time.perf_counter() - t) / 50)
+print(json.dumps(out))
+"""
+
+def _python(code: str) -> str:
+    env = dict(os.environ, GROQ_PREWARM="0", PRODBOT_CACHE="off")
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True,
+                          capture_output=True, text=True).stdout
+
+def cold_start(imports: str, runs: int) -> float:
+    code = f"import time; t = time.perf_counter(); {imports}; print(time.perf_counter() - t)"
+    return statistics.median(float(_python(code)) for _ in range(runs)) * 1000
+
+def route_switch(code: str, runs: int):
+    samples = [json.loads(_python(code)) for _ in range(runs)]
+    return {key: (statistics.median(s[key][0] for s in samples) * 1000,
+                  statistics.median(s[key][1] for s in samples) * 1000)
+            for key in samples[0]}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    print(f"{'measurement':<34}{'before ms':>12}{'after ms':>12}")
+    print(f"{'hub cold start (landing)':<34}{cold_start(COLD_BEFORE, args.runs):>12.1f}"
+          f"{cold_start(COLD_AFTER, args.runs):>12.1f}")
+    before, after = route_switch(ROUTE_BEFORE, args.runs), route_switch(ROUTE_AFTER, args.runs)
+    for key in before:
+        print(f"{'route → ' + key + ' (first)':<34}{before[key][0]:>12.1f}{after[key][0]:>12.1f}")
+        print(f"{'route → ' + key + ' (rerun)':<34}{before[key][1]:>12.3f}{after[key][1]:>12.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# benchmarks/bench_memory.py  (CHAT HISTORY MEMORY: PLAIN DICTS vs message_store)
+"""
+Bytes per message held in memory for a therapy conversation, measured with tracemalloc:
+
+dicts       what app3 kept in st.session_state.messages: one dict per message, records
+            resumed from session_store carrying their own copy of the avatar path
+compact     message_store.SessionMessages: slotted records, int role/avatar, older
+            turns zlib-compressed (no cap, so every message is still held)
+capped      the same with the default per-session cap (HUB_SESSION_MAX_BYTES); older
+            messages stay on disk and page back in on "load earlier"
+
+    python benchmarks/bench_memory.py [--messages 200,2000] [--reply-chars 600]
+
+Also reported: the cost of reading the history back (iterating every message's content).
+"""
+from __future__ import annotations
+import gc, os, sys, json, time, random, argparse, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from message_store import SessionMessages, AVATAR_PATHS, Avatar, SESSION_MAX_BYTES  # noqa: E402
+
+WORDS = ("feel calm breathe today work sleep tired anxious talk friend walk morning notice thought "
+         "gently moment small kind rest evening plan boundary manager email routine wind down").split()
+AVATARS = [AVATAR_PATHS[a] for a in (Avatar.THERAPIST, Avatar.THERAPIST, Avatar.SOLUTION, Avatar.OUT_OF_SCOPE)]
+
+def make_records(n: int, reply_chars: int, seed: int = 7):
+    """Alternating user/assistant records as session_store stores them (JSON payloads)."""
+    rnd = random.Random(seed)
+    def text(chars: int) -> str:
+        out, size = [], 0
+        while size < chars:
+            w = rnd.choice(WORDS)
+            out.append(w)
+            size += len(w) + 1
+        return " ".join(out).capitalize() + "."
+    payloads = []
+    for i in range(n):
+        if i % 2 == 0:
+            record = {"role": "user", "content": text(rnd.randint(40, 160))}
+        else:
+            record = {"role": "assistant", "content": text(rnd.randint(reply_chars // 2, reply_chars * 3 // 2)),
+                      "avatar": rnd.choice(AVATARS)}
+        payloads.append(json.dumps(record))
+    return payloads
+
+def build_dicts(payloads):
+    return [json.loads(p) for p in payloads]
+
+def build_compact(payloads, max_bytes: int):
+    history = SessionMessages("bench", max_bytes=max_bytes)
+    for p in payloads:
+        record = json.loads(p)
+        history.append(record["role"], record["content"], record.get("avatar"))
+    return history
+
+def measured(build, *args):
+    """(object, bytes still allocated by build once it returns)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build(*args)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+def read_ms(messages, content) -> float:
+    t = time.perf_counter()
+    for m in messages:
+        content(m)
+    return (time.perf_counter() - t) * 1000
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", default="200,2000", help="comma-separated conversation lengths")
+    ap.add_argument("--reply-chars", type=int, default=600, help="average assistant reply length")
+    args = ap.parse_args(argv)
+
+    print(f"{'messages':>9}{'dicts B/msg':>14}{'compact B/msg':>15}{'saved':>8}"
+          f"{'capped held':>13}{'capped KB':>11}{'read dicts ms':>15}{'read compact ms':>17}")
+    for n in (int(x) for x in args.messages.split(",")):
+        payloads = make_records(n, args.reply_chars)
+        dicts, dict_bytes = measured(build_dicts, payloads)
+        compact, compact_bytes = measured(build_compact, payloads, 1 << 62)
+        capped, capped_bytes = measured(build_compact, payloads, SESSION_MAX_BYTES)
+        print(f"{n:>9}{dict_bytes / n:>14.0f}{compact_bytes / n:>15.0f}{1 - compact_bytes / dict_bytes:>8.0%}"
+              f"{len(capped):>13}{capped_bytes / 1024:>11.0f}"
+              f"{read_ms(dicts, lambda m: m['content']):>15.2f}{read_ms(compact, lambda m: m.content):>17.2f}")
+        del dicts, compact, capped
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# benchmarks/bench_packing.py  (ONE PRODUCT PER CALL vs PACKED CALLS)
+"""
+Compares the one-description-per-request path with packed mode (K per request).
+
+    python benchmarks/bench_packing.py --dry-run [--n 200]          # token accounting only
+    python benchmarks/bench_packing.py [--n 64] [-c 4] [--input f]  # live, needs GROQ_API_KEY
+
+--dry-run   no network: counts the prompt tokens each path would send and estimates the
+            completion tokens, using the same estimator iter_packs uses to pick K.
+live        runs prodbatch.iter_extract both ways with the response cache off and the
+            local fast path off (so every row reaches the model), and reports
+            products/sec plus tokens/product. Tokens are counted from the messages sent
+            and the text streamed back (chars/4, same estimate as chat_memory).
+
+Inputs: --input (one description per line) or generated listings of mixed length.
+"""
+from __future__ import annotations
+import os, sys, json, time, random, argparse, threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["PRODBOT_CACHE"] = "off"   # measure the model path, not the cache
+
+import prodbot  # noqa: E402
+import llm_client  # noqa: E402
+from chat_memory import count_tokens  # noqa: E402
+
+BRANDS = ("Apple", "Samsung", "Sony", "Nike", "Dell", "Bose", "Logitech", "Garmin")
+NOUNS = ("smartphone", "laptop", "headphones", "running shoes", "smartwatch", "mouse", "speaker")
+EXTRAS = ("water resistant", "fast charging", "2-year warranty", "noise cancelling", "backlit keys",
+          "breathable mesh upper", "OLED display", "USB-C", "Bluetooth 5.3", "recycled materials")
+
+def make_descriptions(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        parts = [f"{rnd.choice(BRANDS)} {rnd.choice(NOUNS)} X{rnd.randint(1, 99)}"]
+        parts += rnd.sample(EXTRAS, rnd.randint(1, 6))
+        if rnd.random() < 0.7:
+            parts.append(f"Price: ${rnd.randint(19, 1999)}")
+        if rnd.random() < 0.3:   # some long, prose-style rows
+            parts.append(" ".join(rnd.choice(EXTRAS) for _ in range(rnd.randint(10, 40))))
+        out.append(", ".join(parts))
+    return out
+
+# ---------- dry run ----------
+def dry_run(descs):
+    single_in = sum(count_tokens(prodbot.SYSTEM_PROMPT) + count_tokens(d) for d in descs)
+    single_out = sum(prodbot.estimate_output_tokens(d) for d in descs)
+    packed_in = packed_out = calls = 0
+    sizes = []
+    for pack in prodbot.iter_packs(descs):
+        payload = json.dumps([{"i": i, "text": d} for i, d in enumerate(pack)], ensure_ascii=False)
+        packed_in += count_tokens(prodbot.PACKED_SYSTEM_PROMPT) + count_tokens(payload)
+        packed_out += sum(prodbot.estimate_output_tokens(d) + 4 for d in pack)   # + '"i": n,'
+        calls += 1
+        sizes.append(len(pack))
+    n = len(descs)
+    print(f"{n} products, K per pack: min {min(sizes)} / mean {n / calls:.1f} / max {max(sizes)}")
+    print(f"{'path':<12}{'calls':>8}{'in tok/prod':>14}{'out tok/prod':>14}{'total tok/prod':>16}")
+    print(f"{'single':<12}{n:>8}{single_in / n:>14.0f}{single_out / n:>14.0f}{(single_in + single_out) / n:>16.0f}")
+    print(f"{'packed':<12}{calls:>8}{packed_in / n:>14.0f}{packed_out / n:>14.0f}{(packed_in + packed_out) / n:>16.0f}")
+
+# ---------- live ----------
+class _Meter:
+    """Wraps llm_client.chat_completion to count calls and token estimates in/out."""
+    def __init__(self, inner):
+        self.inner = inner
+        self.lock = threading.Lock()
+        self.calls = self.tokens_in = self.tokens_out = 0
+
+    def __call__(self, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.tokens_in += sum(count_tokens(m["content"]) for m in kwargs["messages"])
+        return _MeteredStream(self, self.inner(**kwargs))
+
+class _MeteredStream:
+    def __init__(self, meter, stream):
+        self.meter, self.stream = meter, stream
+
+    def __iter__(self):
+        for chunk in self.stream:
+            delta = getattr(chunk.choices[0].delta, "content", None) if chunk.choices else None
+            if delta:
+                with self.meter.lock:
+                    self.meter.tokens_out += count_tokens(delta)
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+
+def live(descs, concurrency: int):
+    from prodbatch import iter_extract
+    print(f"{'path':<12}{'calls':>8}{'errors':>8}{'prod/s':>10}{'in tok/prod':>14}{'out tok/prod':>14}")
+    for name, pack in (("single", False), ("packed", True)):
+        meter = _Meter(llm_client.chat_completion)
+        llm_client.chat_completion = meter
+        try:
+            t = time.perf_counter()
+            rows = list(iter_extract(descs, concurrency=concurrency, fast_path=False, pack=pack))
+            elapsed = time.perf_counter() - t
+        finally:
+            llm_client.chat_completion = meter.inner
+        n = len(rows)
+        errors = sum(1 for r in rows if r[3])
+        print(f"{name:<12}{meter.calls:>8}{errors:>8}{n / elapsed:>10.2f}"
+              f"{meter.tokens_in / n:>14.0f}{meter.tokens_out / n:>14.0f}")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=64, help="generated descriptions (ignored with --input)")
+    ap.add_argument("--input", help="file with one description per line")
+    ap.add_argument("-c", "--concurrency", type=int, default=4)
+    ap.add_argument("--dry-run", action="store_true", help="token accounting only, no requests")
+    args = ap.parse_args(argv)
+
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            descs = [prodbot.normalize_description(line) for line in f if line.strip()]
+    else:
+        descs = make_descriptions(args.n)
+    if args.dry_run:
+        dry_run(descs)
+    else:
+        live(descs, args.concurrency)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# benchmarks/bench_rules.py  (KEYWORD MATCHING: LINEAR SCANS vs COMPILED RULES)
+"""
+Compares the original app3 keyword checks (hard-coded lists, lower() + any(k in t))
+with rules.RuleSet on long texts, for the crisis check and avatar classification, plus
+two single-pass regex matchers that were tried and rejected (combined alternation and
+a prefix trie). Last line: the streaming matcher that app3 now uses for the reply,
+which yields crisis + avatar categories in the same pass as the stream itself.
+
+    python benchmarks/bench_rules.py [--repeat 200]
+
+Times are per call, median of --repeat calls, in microseconds.
+"""
+from __future__ import annotations
+import os, re, sys, time, random, argparse, statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rules import get_rules  # noqa: E402
+
+# ---------- the implementation rules.py replaced ----------
+CRISIS = ["suicide", "self-harm", "kill myself", "hurt myself"]
+OOS = ["outside my scope", "out of scope", "cannot assist", "i can’t assist", "i can't assist",
+       "i can’t help", "i can't help", "contact hr", "report to hr", "authorities",
+       "legal advice", "lawsuit", "file a case", "police report", "financial advice",
+       "tax advice", "not able to help"]
+SOLUTION = ["steps", "plan", "solution", "checklist", "follow these", "next actions",
+            "here’s how", "here is how", "actionable", "tl;dr", "tldr"]
+
+def legacy_crisis(text: str) -> bool:
+    t = (text or "").lower()
+    return any(k in t for k in CRISIS)
+
+def legacy_avatar(text: str) -> str:
+    t = (text or "").lower()
+    if any(x in t for x in OOS):
+        return "oos"
+    if any(x in t for x in SOLUTION):
+        return "solution"
+    return "therapist"
+
+RULES = get_rules()
+
+# ---------- rejected alternatives: one compiled regex over all phrases ----------
+def _trie_regex(phrases) -> str:
+    trie = {}
+    for p in phrases:
+        node = trie
+        for ch in p:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    def build(node) -> str:
+        alts = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+    return build(trie)
+
+ALL = CRISIS + OOS + SOLUTION
+ALTERNATION = re.compile("|".join(map(re.escape, sorted(ALL, key=len, reverse=True))), re.IGNORECASE)
+TRIE = re.compile(_trie_regex(ALL))
+
+def alternation_scan(text: str) -> bool:
+    return ALTERNATION.search(text) is not None
+
+def trie_scan(text: str) -> bool:
+    return TRIE.search(text.lower()) is not None
+
+def compiled_crisis(text: str) -> bool:
+    return RULES.matches(text, "crisis")
+
+def compiled_avatar(text: str) -> str:
+    found = RULES.scan(text, stop_at=("out_of_scope",), categories=("out_of_scope", "solution"))
+    return "oos" if "out_of_scope" in found else "solution" if "solution" in found else "therapist"
+
+# ---------- inputs ----------
+WORDS = ("feel calm breathe today work sleep tired anxious talk friend walk morning "
+         "notice thought gently moment small kind rest").split()
+
+def make_text(n_chars: int, tail: str = "") -> str:
+    rnd = random.Random(n_chars)
+    out, size = [], 0
+    while size < n_chars:
+        w = rnd.choice(WORDS).capitalize() if rnd.random() < 0.1 else rnd.choice(WORDS)
+        out.append(w)
+        size += len(w) + 1
+    return " ".join(out) + tail
+
+def per_call_us(fn, text: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(text)
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1e6
+
+def stream_us(text: str, chunk: int = 8) -> float:
+    """Incremental crisis matching over the whole text, fed `chunk` chars at a time (per char)."""
+    t = time.perf_counter()
+    m = RULES.stream()
+    for i in range(0, len(text), chunk):
+        m.feed(text[i:i + chunk])
+    return (time.perf_counter() - t) * 1e6 / max(1, len(text))
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    cases = []
+    for size in (1_000, 10_000, 100_000):
+        cases.append((f"{size // 1000}k chars, no match", make_text(size)))
+        cases.append((f"{size // 1000}k chars, match at end", make_text(size, " Here is how: a plan.")))
+
+    for (name, text) in cases:
+        assert legacy_crisis(text) == compiled_crisis(text) and legacy_avatar(text) == compiled_avatar(text)
+
+    print(f"{'case':<28}{'crisis old':>12}{'crisis new':>12}{'avatar old':>12}{'avatar new':>12}"
+          f"{'regex alt':>12}{'regex trie':>12}   (µs/call)")
+    for name, text in cases:
+        print(f"{name:<28}"
+              f"{per_call_us(legacy_crisis, text, args.repeat):>12.1f}{per_call_us(compiled_crisis, text, args.repeat):>12.1f}"
+              f"{per_call_us(legacy_avatar, text, args.repeat):>12.1f}{per_call_us(compiled_avatar, text, args.repeat):>12.1f}"
+              f"{per_call_us(alternation_scan, text, max(5, args.repeat // 20)):>12.1f}"
+              f"{per_call_us(trie_scan, text, max(5, args.repeat // 20)):>12.1f}")
+    print(f"\nstreamed matching (8-char chunks): {stream_us(make_text(100_000)):.3f} µs/char")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# benchmarks/bench_suite.py  (OFFLINE BENCHMARK SUITE — HOT FUNCTIONS + BOTH get_response PATHS)
+"""
+Repeatable numbers for the code on every request path, with no API quota spent.
+
+    python benchmarks/bench_suite.py [--repeat 200] [--only coerce,prompt] [--json out.json]
+
+micro     app3.build_full_prompt   (short and long conversation memories; the long one also
+                                    with the retrieval index; rows carry prompt_tokens)
+          app3._export_pdf_bytes   (20-message conversation; needs fpdf)
+          prodbot.coerce_json      (clean JSON, and JSON wrapped in stray prose)
+e2e       agent.get_response       therapy reply, streamed through llm_client
+          prodbot.get_response     extractor JSON, streamed and parsed (cache off)
+          Both run against benchmarks/fake_groq.py started in-process, so the numbers
+          are client-side overhead plus the simulated model time (--ttft, --tps).
+
+Every row reports throughput and p50/p95/p99 per call. --json writes the rows plus the
+configuration, so two runs (before/after a change) can be diffed.
+"""
+from __future__ import annotations
+import os, sys, json, argparse
+
+from harness import summarize, time_calls, print_table, write_json, fake_groq
+
+os.environ["PRODBOT_CACHE"] = "off"   # measure the model path, not the cache
+os.environ.setdefault("GROQ_PREWARM", "0")
+os.environ.setdefault("GROQ_RPM", "1000000")      # the fake server has no limits; keep the
+os.environ.setdefault("GROQ_TPM", "1000000000")   # scheduler's overhead, not its waits
+
+SAMPLE_TURNS = (
+    ("user", "I've been feeling overwhelmed at work and can't switch off in the evenings."),
+    ("assistant", "That sounds exhausting. Evenings that never really start make recovery hard. "
+                  "- Try a 10-minute wind-down ritual\n- Write tomorrow's top 3 tasks, then close the laptop"),
+    ("user", "I tried the list but I keep checking email in bed."),
+    ("assistant", "Checking email is a habit loop, not a character flaw. Could the phone charge outside the bedroom?"),
+)
+PRODUCT = ("Apple iPhone 15 Pro Max smartphone, 256GB, Natural Titanium, 6.7-inch Super Retina XDR display, "
+           "A17 Pro chip, 48MP main camera, USB-C, 159.9 x 76.7 x 8.25 mm, 221 g. Price: $1,199.")
+JSON_CLEAN = json.dumps({"product_name": "Apple iPhone 15 Pro Max", "brand": "Apple", "category": "Smartphone",
+                         "model": "15 Pro Max", "color": "Natural Titanium", "material": "", "storage": "256GB",
+                         "size": "6.7-inch", "dimensions": "159.9 x 76.7 x 8.25 mm", "weight": "221 g",
+                         "price": "$1,199", "description": "Apple's flagship smartphone.",
+                         "features": ["A17 Pro chip", "48MP main camera", "USB-C"]})
+JSON_WRAPPED = "Sure! Here is the JSON you asked for:\n```json\n" + JSON_CLEAN + "\n```\nLet me know if you need more."
+
+def _memory(turns: int, retrieval: bool = False):
+    from chat_memory import ConversationMemory
+    from retrieval import TurnIndex
+    memory = ConversationMemory(budget_tokens=1500, index=TurnIndex() if retrieval else None)
+    for i in range(turns):
+        role, text = SAMPLE_TURNS[i % len(SAMPLE_TURNS)]
+        memory.add(role, text)
+    return memory
+
+def _messages(n: int):
+    return [{"role": role, "content": text} for role, text in (SAMPLE_TURNS[i % len(SAMPLE_TURNS)] for i in range(n))]
+
+# ---------- micro ----------
+def bench_prompt(repeat: int):
+    from app3 import build_full_prompt
+    from chat_memory import count_tokens
+    rows = []
+    latest = "I can't sleep before big meetings."
+    for turns, retrieval in ((4, False), (200, False), (200, True)):
+        memory = _memory(turns, retrieval)
+        samples = time_calls(lambda: build_full_prompt(memory, latest, "Therapist (concise)"), repeat)
+        name = f"build_full_prompt ({turns} turns{', retrieval' if retrieval else ''})"
+        rows.append(summarize(name, samples,
+                              prompt_tokens=count_tokens(build_full_prompt(memory, latest, "Therapist (concise)"))))
+    return rows
+
+def bench_pdf(repeat: int):
+    try:
+        import fpdf  # noqa: F401
+    except ImportError:
+        return [{"name": "_export_pdf_bytes (20 msgs)", "skipped": "fpdf not installed"}]
+    from app3 import _export_pdf_bytes
+    messages = _messages(20)
+    samples = time_calls(lambda: _export_pdf_bytes(messages), max(5, repeat // 20))
+    return [summarize("_export_pdf_bytes (20 msgs)", samples)]
+
+def bench_coerce(repeat: int):
+    from prodbot import coerce_json
+    return [summarize("coerce_json (clean)", time_calls(lambda: coerce_json(JSON_CLEAN), repeat)),
+            summarize("coerce_json (wrapped in prose)", time_calls(lambda: coerce_json(JSON_WRAPPED), repeat))]
+
+# ---------- end to end (fake server) ----------
+def _e2e(name: str, fn, repeat: int):
+    samples, errors = [], 0
+    for i in range(repeat):
+        try:
+            samples.append(time_calls(lambda: fn(i), 1, warmup=0)[0])
+        except Exception:
+            errors += 1
+    return summarize(name, samples, errors=errors)
+
+def bench_e2e(repeat: int, server_kwargs):
+    import agent, prodbot
+    from app3 import build_full_prompt
+    memory = _memory(8)
+    n = max(5, repeat // 10)
+    with fake_groq(**server_kwargs) as server:
+        agent.get_response("warm up the connection pool")
+        rows = [
+            _e2e("agent.get_response", lambda i: agent.get_response(
+                build_full_prompt(memory, f"Turn {i}: how do I stop overthinking?", "Therapist (concise)")), n),
+            # a distinct description per call, so nothing is served from memory
+            _e2e("prodbot.get_response", lambda i: json.loads(prodbot.get_response(f"{PRODUCT} SKU-{i}")), n),
+        ]
+        rows[-1]["server_status"] = dict(server.requests)
+    return rows
+
+BENCHES = {"prompt": bench_prompt, "pdf": bench_pdf, "coerce": bench_coerce}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=200, help="calls per micro benchmark (e2e runs repeat/10)")
+    ap.add_argument("--only", help="comma list of: prompt, pdf, coerce, e2e")
+    ap.add_argument("--ttft", type=float, default=0.05, help="fake server: seconds to first token")
+    ap.add_argument("--tps", type=float, default=1000.0, help="fake server: tokens per second")
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args(argv)
+
+    only = set(args.only.split(",")) if args.only else set(BENCHES) | {"e2e"}
+    server_kwargs = {"ttft": args.ttft, "tps": args.tps, "jitter": 0.0, "seed": 1}
+    rows = []
+    for name, bench in BENCHES.items():
+        if name in only:
+            rows += bench(args.repeat)
+    if "e2e" in only:
+        rows += bench_e2e(args.repeat, server_kwargs)
+    print_table(rows)
+    if args.json:
+        write_json(args.json, rows, {"repeat": args.repeat, **server_kwargs})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+# benchmarks/fake_groq.py  (LOCAL GROQ-COMPATIBLE STUB SERVER)
+"""
+A local stand-in for the Groq (OpenAI-compatible) chat API, so benchmarks and load tests
+run offline and spend no quota. The Groq SDK reads GROQ_BASE_URL, so nothing in the apps
+changes:
+
+    python benchmarks/fake_groq.py --port 8765 --ttft 0.25 --tps 300 --error-rate 0.02
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=fake streamlit run hub.py
+
+Endpoints   POST /openai/v1/chat/completions (stream or not), GET /openai/v1/models
+Replies     canned, shaped like the real ones: a JSON object with exactly the keys in the
+            system prompt's SCHEMA block (prodbot, incl. reduced prompts), a JSON array
+            with one {"i": ...} object per item for packed requests, and a short
+            supportive paragraph otherwise (therapy agent).
+Timing      --ttft seconds before the first token (± --jitter), then --tps tokens/sec.
+            --slow-rate: share of requests that wait --slow-ttft instead (the tail).
+            Streams end with a usage chunk under x_groq, as Groq sends it.
+Faults      --error-rate: share of requests answered 500; --rate-limit: share answered
+            429 with retry-after-ms. Both hit before streaming starts, like the real API.
+            --overloaded MODEL answers 429 to every request for that model.
+Limits      --rpm / --tpm enforce per-minute budgets (token buckets): a request over
+            budget gets 429 with the wait until it would fit, and every response carries
+            x-ratelimit-limit-tokens / x-ratelimit-remaining-tokens, as Groq's do.
+
+In-process use (benchmarks/harness.py does this):
+
+    server = FakeGroq(ttft=0.05, tps=500).start()
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    ...
+    server.stop()
+"""
+from __future__ import annotations
+import re, sys, json, time, random, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence
+
+THERAPY_REPLY = (
+    "That sounds like a lot to carry right now, and it makes sense that you feel stretched thin. "
+    "It might help to pick one small thing you can finish today, and to notice when your body "
+    "asks for a pause. What part of this feels heaviest at the moment?"
+)
+SCHEMA_KEY_RE = re.compile(r'^\s+"(\w+)":', re.MULTILINE)
+TOKEN_RE = re.compile(r"\S*\s*")   # one word + trailing space ≈ one streamed token
+
+# ==============================================================================
+# CANNED COMPLETIONS
+# ==============================================================================
+def _schema_keys(system_prompt: str) -> List[str]:
+    """Keys listed in prodbot's SCHEMA block (full or reduced prompt); [] when there is none."""
+    start = system_prompt.find("SCHEMA")
+    if start < 0:
+        return []
+    block = system_prompt[start:system_prompt.find("}", start)]
+    return SCHEMA_KEY_RE.findall(block)
+
+def _record(keys: List[str], text: str) -> Dict[str, Any]:
+    words = text.split()
+    canned = {
+        "product_name": " ".join(words[:4]),
+        "brand": words[0] if words else "",
+        "category": "Product",
+        "description": text.split(".")[0][:160],
+    }
+    return {k: canned.get(k, "") for k in keys}
+
+def reply_for(messages: List[Dict[str, Any]]) -> str:
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    keys = _schema_keys(system)
+    if not keys:
+        return THERAPY_REPLY
+    if "PACKED MODE" in system:
+        try:
+            items = json.loads(user)
+        except ValueError:
+            items = []
+        return json.dumps([{"i": it.get("i"), **_record(keys, str(it.get("text", "")))} for it in items],
+                          ensure_ascii=False)
+    return json.dumps(_record(keys, user), ensure_ascii=False)
+
+def _tokens(text: str) -> int:
+    return max(1, (len(text) + 3) // 4)   # same chars/4 estimate as chat_memory.count_tokens
+
+# ==============================================================================
+# SERVER
+# ==============================================================================
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)   # clients dropping keep-alive sockets is normal
+
+class FakeGroq:
+    """Threaded stub server; one thread per connection, keep-alive like the real API."""
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, ttft: float = 0.2, tps: float = 300.0,
+                 jitter: float = 0.25, error_rate: float = 0.0, rate_limit: float = 0.0,
+                 retry_after_ms: int = 200, seed: Optional[int] = None, rpm: float = 0, tpm: float = 0,
+                 slow_rate: float = 0.0, slow_ttft: float = 5.0, overloaded: Sequence[str] = ()):
+        self.ttft, self.tps, self.jitter = ttft, tps, jitter
+        self.slow_rate, self.slow_ttft, self.overloaded = slow_rate, slow_ttft, set(overloaded)
+        self.error_rate, self.rate_limit, self.retry_after_ms = error_rate, rate_limit, retry_after_ms
+        self.rpm, self.tpm = rpm, tpm
+        self._budget = {"requests": float(rpm), "tokens": float(tpm), "stamp": time.monotonic()}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests: Dict[int, int] = {}   # status -> count
+        self.disconnects = 0                 # clients that closed a stream early
+        self._httpd = _Server((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGroq":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    # ---------- decisions (shared RNG, so guarded) ----------
+    def _roll(self) -> Optional[int]:
+        with self._lock:
+            r = self._rng.random()
+        if r < self.error_rate:
+            return 500
+        if r < self.error_rate + self.rate_limit:
+            return 429
+        return None
+
+    def _charge(self, tokens: int) -> float:
+        """Take one request and `tokens` from the per-minute budgets; 0, or seconds until it would fit."""
+        with self._lock:
+            b, now = self._budget, time.monotonic()
+            elapsed, b["stamp"] = now - b["stamp"], now
+            b["requests"] = min(self.rpm, b["requests"] + elapsed * self.rpm / 60)
+            b["tokens"] = min(self.tpm, b["tokens"] + elapsed * self.tpm / 60)
+            waits = []
+            if self.rpm and b["requests"] < 1:
+                waits.append((1 - b["requests"]) * 60 / self.rpm)
+            if self.tpm and b["tokens"] < tokens:
+                waits.append((tokens - b["tokens"]) * 60 / self.tpm)
+            if waits:
+                return max(waits)
+            b["requests"] -= 1
+            b["tokens"] -= tokens
+            return 0.0
+
+    def limit_headers(self) -> Dict[str, str]:
+        if not self.tpm:
+            return {}
+        with self._lock:
+            remaining = max(0, int(self._budget["tokens"]))
+        return {"x-ratelimit-limit-tokens": str(int(self.tpm)), "x-ratelimit-remaining-tokens": str(remaining)}
+
+    def _first_token_delay(self) -> float:
+        with self._lock:
+            if self.slow_rate and self._rng.random() < self.slow_rate:
+                return self.slow_ttft
+            return max(0.0, self.ttft * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+
+    def _count(self, status: int) -> None:
+        with self._lock:
+            self.requests[status] = self.requests.get(status, 0) + 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in {**fake.limit_headers(), **(headers or {})}.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+                fake._count(status)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._json(200, {"object": "list", "data": [
+                        {"id": "llama-3.1-8b-instant", "object": "model", "created": 0, "owned_by": "fake"}]})
+                else:
+                    self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                    return
+                try:
+                    req = json.loads(body or b"{}")
+                except ValueError:
+                    self._json(400, {"error": {"message": "invalid JSON body", "type": "invalid_request_error"}})
+                    return
+                model = req.get("model") or "llama-3.1-8b-instant"
+                messages = req.get("messages") or []
+                text = reply_for(messages)
+                limit = req.get("max_completion_tokens") or req.get("max_tokens")
+                pieces = TOKEN_RE.findall(text)[:-1] or [text]
+                if limit:
+                    pieces = pieces[:int(limit)]
+                usage = {"prompt_tokens": sum(_tokens(m.get("content") or "") for m in messages),
+                         "completion_tokens": len(pieces)}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+                wait = fake._charge(usage["total_tokens"]) if (fake.rpm or fake.tpm) else 0.0
+                if wait:
+                    self._json(429, {"error": {"message": "Rate limit reached (fake budget)", "type": "tokens",
+                                               "code": "rate_limit_exceeded"}},
+                               {"retry-after-ms": str(int(wait * 1000) + 1)})
+                    return
+                fault = 429 if model in fake.overloaded else fake._roll()
+                if fault == 429:
+                    self._json(429, {"error": {"message": "Rate limit reached (fake)", "type": "tokens",
+                                               "code": "rate_limit_exceeded"}},
+                               {"retry-after-ms": str(fake.retry_after_ms)})
+                    return
+                if fault == 500:
+                    self._json(500, {"error": {"message": "Internal server error (fake)", "type": "internal_server_error"}})
+                    return
+                time.sleep(fake._first_token_delay())
+                if req.get("stream"):
+                    self._stream(model, pieces, usage)
+                else:
+                    time.sleep(len(pieces) / fake.tps if fake.tps > 0 else 0)
+                    self._json(200, {
+                        "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                        "model": model, "usage": usage,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": "".join(pieces)}}]})
+
+            def _stream(self, model: str, pieces: List[str], usage: Dict[str, int]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                for k, v in fake.limit_headers().items():
+                    self.send_header(k, v)
+                self.end_headers()
+                fake._count(200)
+                base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": model}
+
+                def send(payload: str) -> None:
+                    data = f"data: {payload}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+
+                gap = 1.0 / fake.tps if fake.tps > 0 else 0.0
+                try:
+                    for n, piece in enumerate(pieces):
+                        delta = {"role": "assistant", "content": piece} if n == 0 else {"content": piece}
+                        send(json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}))
+                        if gap:
+                            time.sleep(gap)
+                    send(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                                     "x_groq": {"id": "req_fake", "usage": usage}}))
+                    send("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    with fake._lock:
+                        fake.disconnects += 1
+                    self.close_connection = True
+
+        return Handler
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    ap.add_argument("--tps", type=float, default=300.0, help="streamed tokens per second (0 = no delay)")
+    ap.add_argument("--jitter", type=float, default=0.25, help="± share of --ttft")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 500")
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="share of requests answered 429")
+    ap.add_argument("--retry-after-ms", type=int, default=200)
+    ap.add_argument("--rpm", type=float, default=0, help="requests/min budget (0 = unlimited)")
+    ap.add_argument("--tpm", type=float, default=0, help="tokens/min budget (0 = unlimited)")
+    ap.add_argument("--slow-rate", type=float, default=0.0, help="share of requests with --slow-ttft")
+    ap.add_argument("--slow-ttft", type=float, default=5.0)
+    ap.add_argument("--overloaded", action="append", default=[], metavar="MODEL", help="always 429 for MODEL")
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args(argv)
+    server = FakeGroq(args.host, args.port, args.ttft, args.tps, args.jitter, args.error_rate,
+                      args.rate_limit, args.retry_after_ms, args.seed, args.rpm, args.tpm,
+                      args.slow_rate, args.slow_ttft, args.overloaded)
+    print(f"fake Groq on {server.base_url}  (GROQ_BASE_URL={server.base_url})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# benchmarks/harness.py  (SHARED TIMING / REPORTING FOR THE OFFLINE BENCHMARKS)
+"""
+Helpers for bench_suite.py and load_hub.py: percentile summaries, fixed-width result
+tables, JSON results for comparing runs, and a context manager that points the
+shared Groq client (llm_client) at a local fake_groq server.
+"""
+from __future__ import annotations
+import os, sys, json, math, time, platform
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def percentile(sorted_samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0 when empty)."""
+    if not sorted_samples:
+        return 0.0
+    k = max(0, min(len(sorted_samples) - 1, math.ceil(q * len(sorted_samples)) - 1))
+    return sorted_samples[k]
+
+def summarize(name: str, samples: Sequence[float], elapsed: Optional[float] = None,
+              errors: int = 0, **extra: Any) -> Dict[str, Any]:
+    """
+    One result row. samples are per-operation seconds; throughput is operations per
+    second of wall time (elapsed), or per second of summed samples when run serially.
+    """
+    s = sorted(samples)
+    wall = elapsed if elapsed is not None else sum(s)
+    return {"name": name, "n": len(s), "errors": errors,
+            "ops_per_s": round(len(s) / wall, 2) if wall > 0 else 0.0,
+            "p50_ms": round(percentile(s, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(s, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(s, 0.99) * 1000, 3),
+            **extra}
+
+def time_calls(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> List[float]:
+    """Per-call wall times of fn() in seconds, after `warmup` untimed calls."""
+    for _ in range(warmup):
+        fn()
+    out = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t)
+    return out
+
+def print_table(rows: Sequence[Dict[str, Any]]) -> None:
+    print(f"{'benchmark':<42}{'n':>7}{'err':>6}{'ops/s':>11}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for r in rows:
+        if r.get("skipped"):
+            print(f"{r['name']:<42}  skipped: {r['skipped']}")
+            continue
+        print(f"{r['name']:<42}{r['n']:>7}{r['errors']:>6}{r['ops_per_s']:>11.2f}"
+              f"{r['p50_ms']:>11.3f}{r['p95_ms']:>11.3f}{r['p99_ms']:>11.3f}")
+
+def write_json(path: str, rows: Sequence[Dict[str, Any]], config: Dict[str, Any]) -> None:
+    """Results plus enough context (config, interpreter, host) to compare two runs."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"ts": time.time(), "python": platform.python_version(), "host": platform.node(),
+                   "config": config, "results": list(rows)}, f, indent=2)
+
+@contextmanager
+def fake_groq(**server_kwargs: Any) -> Iterator[Any]:
+    """
+    Start benchmarks/fake_groq.py in-process and point llm_client at it. The pooled
+    client is created on first use, so it is reset here and again on exit.
+    """
+    from fake_groq import FakeGroq
+    import llm_client
+
+    server = FakeGroq(**server_kwargs).start()
+    saved = {k: os.environ.get(k) for k in ("GROQ_BASE_URL", "GROQ_API_KEY")}
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    os.environ["GROQ_API_KEY"] = "fake-key"
+    llm_client._client = None
+    try:
+        yield server
+    finally:
+        llm_client._client = None
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        server.stop()
@@ -0,0 +1,211 @@
+# benchmarks/load_hub.py  (LOAD GENERATOR — N CONCURRENT HUB USERS)
+"""
+Simulates N people using the hub at once, against the local fake Groq server, and
+reports throughput and p50/p95/p99 latency per kind of request.
+
+    python benchmarks/load_hub.py --users 32 --duration 30 [--therapy-share 0.7]
+    python benchmarks/load_hub.py --users 64 --rate-limit 0.05 --error-rate 0.01
+    python benchmarks/load_hub.py --users 16 --batch 2 --rpm 300 --tpm 120000   # chat during bulk runs
+    python benchmarks/load_hub.py ... --no-scheduler                            # same, unscheduled
+    python benchmarks/load_hub.py --slow-rate 0.03 [--no-hedge]    # tail latency with/without hedging
+    python benchmarks/load_hub.py --base-url http://127.0.0.1:8765   # external fake_groq.py
+
+Each virtual user is a thread running the same code a Streamlit session runs per turn:
+  therapy    build_full_prompt over the user's own ConversationMemory, then
+             agent.stream_response until the reply ends (TTFT = first delta)
+  extractor  prodbot.extract on a generated listing (local fast path on, cache off)
+then waits an exponential think time (--think, mean seconds) and goes again.
+--batch K adds K bulk runs (prodbatch.iter_extract, model path only) that keep
+extracting until the deadline; their row is rows/s and the gap between finished rows.
+
+--rpm / --tpm give the fake server provider-style budgets (429 beyond them) and tell
+the rate-limit scheduler the same limits, so the run shows whether chat turns stay
+fast while bulk work soaks up the rest. --no-scheduler turns the scheduler off.
+
+All users share one process, hence one pooled client in llm_client — as the hub does.
+Retries come from llm_client's own counters (metrics.py); the server's status counts
+show what was injected.
+"""
+from __future__ import annotations
+import os, sys, time, random, argparse, threading
+from typing import Dict, List
+
+from harness import summarize, print_table, write_json, fake_groq, percentile
+
+os.environ["PRODBOT_CACHE"] = "off"
+os.environ.setdefault("GROQ_PREWARM", "0")
+
+QUESTIONS = (
+    "I feel anxious before every team meeting.", "How do I stop procrastinating on my thesis?",
+    "I keep waking up at 4am and can't fall asleep again.", "My friend cancelled on me again and I feel hurt.",
+    "Work has been so stressful that I snap at my family.", "I want to build a routine but keep failing.",
+)
+
+class Recorder:
+    """Thread-safe samples per kind: (latency, ttft or None, ok)."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[tuple]] = {}
+
+    def add(self, kind: str, latency: float, ttft=None, ok: bool = True) -> None:
+        with self.lock:
+            self.samples.setdefault(kind, []).append((latency, ttft, ok))
+
+def _therapy_turn(memory, rnd: random.Random, rec: Recorder) -> None:
+    from app3 import build_full_prompt
+    from agent import stream_response
+    question = rnd.choice(QUESTIONS)
+    t = time.perf_counter()
+    ttft, parts = None, []
+    try:
+        for delta in stream_response(build_full_prompt(memory, question, "Therapist (concise)")):
+            if ttft is None:
+                ttft = time.perf_counter() - t
+            parts.append(delta)
+    except Exception:
+        rec.add("therapy", time.perf_counter() - t, ttft, ok=False)
+        return
+    rec.add("therapy", time.perf_counter() - t, ttft)
+    memory.add("user", question)
+    memory.add("assistant", "".join(parts))
+
+def _extract_turn(descs, rnd: random.Random, rec: Recorder) -> None:
+    from prodbot import extract
+    t = time.perf_counter()
+    try:
+        extract(rnd.choice(descs) + f" SKU-{rnd.randrange(10**6)}")
+    except Exception:
+        rec.add("extractor", time.perf_counter() - t, ok=False)
+        return
+    rec.add("extractor", time.perf_counter() - t)
+
+def _batch_run(bid: int, args, descs, deadline: float, rec: Recorder) -> None:
+    from prodbatch import iter_extract
+
+    def listings():
+        i = 0
+        while time.perf_counter() < deadline:
+            yield f"{descs[i % len(descs)]} SKU-B{bid}-{i}"
+            i += 1
+
+    t = time.perf_counter()
+    for row in iter_extract(listings(), concurrency=args.batch_concurrency, fast_path=False,
+                            session=f"batch-{bid}"):
+        now = time.perf_counter()
+        rec.add("batch", now - t, ok=row[3] is None)
+        t = now
+
+def _user(uid: int, args, descs, deadline: float, rec: Recorder) -> None:
+    from chat_memory import ConversationMemory
+    from retrieval import new_index
+    rnd = random.Random(args.seed * 1000 + uid)
+    memory = ConversationMemory(budget_tokens=1500, index=new_index())
+    turns = 0
+    while time.perf_counter() < deadline and (not args.turns or turns < args.turns):
+        if rnd.random() < args.therapy_share:
+            _therapy_turn(memory, rnd, rec)
+        else:
+            _extract_turn(descs, rnd, rec)
+        turns += 1
+        if args.think > 0:
+            time.sleep(rnd.expovariate(1.0 / args.think))
+
+def run(args) -> List[dict]:
+    from bench_packing import make_descriptions
+    import metrics
+    descs = make_descriptions(200, seed=args.seed)
+    rec = Recorder()
+    metrics.REGISTRY.reset()
+    # Staggered arrivals (like people opening the page), spread over the first --ramp seconds
+    start = time.perf_counter()
+    deadline = start + args.ramp + args.duration
+    threads = []
+    for uid in range(args.users):
+        delay = args.ramp * uid / max(1, args.users)
+        th = threading.Thread(target=lambda u=uid, d=delay: (time.sleep(d), _user(u, args, descs, deadline, rec)),
+                              name=f"user-{uid}", daemon=True)
+        th.start()
+        threads.append(th)
+    for bid in range(args.batch):
+        th = threading.Thread(target=_batch_run, args=(bid, args, descs, deadline, rec), name=f"batch-{bid}",
+                              daemon=True)
+        th.start()
+        threads.append(th)
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - start
+
+    rows = []
+    for kind, samples in sorted(rec.samples.items()):
+        ok = [s for s in samples if s[2]]
+        ttfts = sorted(s[1] for s in ok if s[1] is not None)
+        extra = {}
+        if ttfts:
+            extra = {"ttft_p50_ms": round(percentile(ttfts, 0.5) * 1000, 1),
+                     "ttft_p95_ms": round(percentile(ttfts, 0.95) * 1000, 1),
+                     "ttft_p99_ms": round(percentile(ttfts, 0.99) * 1000, 1)}
+        rows.append(summarize(kind, [s[0] for s in ok], elapsed=elapsed,
+                              errors=len(samples) - len(ok), **extra))
+    waits = {r["priority"]: r for r in metrics.REGISTRY.summary() if r["metric"] == "llm_queue_wait_seconds"}
+    retries = sum(r["count"] for r in metrics.REGISTRY.summary() if r["metric"] == "llm_retries_total")
+    hedges = sum(r["count"] for r in metrics.REGISTRY.summary() if r["metric"] == "llm_hedges_total")
+    everything = [s for v in rec.samples.values() for s in v]
+    rows.append(summarize("total", [s[0] for s in everything if s[2]], elapsed=elapsed,
+                          errors=sum(1 for s in everything if not s[2]), retries=retries, hedges=hedges,
+                          queue_wait_p95_ms={p: round(r["p95"] * 1000, 1) for p, r in waits.items()}))
+    return rows
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds of steady load after the ramp")
+    ap.add_argument("--ramp", type=float, default=2.0, help="seconds over which users arrive")
+    ap.add_argument("--turns", type=int, default=0, help="stop each user after this many turns (0 = until deadline)")
+    ap.add_argument("--think", type=float, default=0.5, help="mean think time between a user's turns, seconds")
+    ap.add_argument("--therapy-share", type=float, default=0.7, help="share of turns that are therapy chats")
+    ap.add_argument("--batch", type=int, default=0, help="concurrent bulk extraction runs")
+    ap.add_argument("--batch-concurrency", type=int, default=4, help="workers per bulk run")
+    ap.add_argument("--rpm", type=float, default=0, help="provider requests/min budget (0 = unlimited)")
+    ap.add_argument("--tpm", type=float, default=0, help="provider tokens/min budget (0 = unlimited)")
+    ap.add_argument("--no-scheduler", action="store_true", help="send without the rate-limit scheduler")
+    ap.add_argument("--slow-rate", type=float, default=0.0, help="share of requests with a slow first token")
+    ap.add_argument("--slow-ttft", type=float, default=5.0)
+    ap.add_argument("--no-hedge", action="store_true", help="never send hedged duplicates (tiers.py)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--base-url", help="use an already running fake_groq.py instead of starting one")
+    ap.add_argument("--ttft", type=float, default=0.25)
+    ap.add_argument("--tps", type=float, default=300.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=float, default=0.0)
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args(argv)
+
+    server_kwargs = {"ttft": args.ttft, "tps": args.tps, "error_rate": args.error_rate,
+                     "rate_limit": args.rate_limit, "seed": args.seed, "rpm": args.rpm, "tpm": args.tpm,
+                     "slow_rate": args.slow_rate, "slow_ttft": args.slow_ttft}
+    # read once, on the first call
+    os.environ["GROQ_SCHEDULER"] = "off" if args.no_scheduler else "on"
+    os.environ["GROQ_RPM"] = str(args.rpm or 10**6)
+    os.environ["GROQ_TPM"] = str(args.tpm or 10**9)
+    os.environ["HUB_HEDGE"] = "off" if args.no_hedge else "on"
+    if args.base_url:
+        os.environ["GROQ_BASE_URL"] = args.base_url
+        os.environ.setdefault("GROQ_API_KEY", "fake-key")
+        rows = run(args)
+    else:
+        with fake_groq(**server_kwargs) as server:
+            rows = run(args)
+            print(f"server responses by status: {dict(sorted(server.requests.items()))}, "
+                  f"streams closed early by the client: {server.disconnects}")
+    print_table(rows)
+    print(f"llm_client retries: {rows[-1]['retries']}, hedged calls: {rows[-1]['hedges']}, "
+          f"scheduler queue wait p95 ms: {rows[-1]['queue_wait_p95_ms'] or '-'}")
+    for r in rows:
+        if "ttft_p50_ms" in r:
+            print(f"{r['name']} TTFT ms  p50 {r['ttft_p50_ms']}  p95 {r['ttft_p95_ms']}  p99 {r['ttft_p99_ms']}")
+    if args.json:
+        write_json(args.json, rows, {**vars(args), **server_kwargs})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# chat_memory.py  (TOKEN-BUDGETED CONVERSATION MEMORY)
+from __future__ import annotations
+import re
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def count_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English with Llama-style BPE).
+    Counted once per message, so the budget check never re-scans history.
+    """
+    return max(1, (len(text) + 3) // 4)
+
+def _speaker(role: str) -> str:
+    return "User" if role == "user" else "Assistant"
+
+def _compress(role: str, content: str, max_words: int = 30) -> str:
+    """One-line gist of a turn for the rolling summary: its first sentence, capped."""
+    text = " ".join(content.split())
+    first = _SENTENCE_END.split(text, 1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        first = " ".join(words[:max_words]) + "…"
+    return f"- {_speaker(role)}: {first}"
+
+class ConversationMemory:
+    """
+    Prompt history with a hard token budget.
+
+    Recent turns are kept verbatim. When they overflow `budget_tokens - summary_tokens`,
+    the oldest turns are folded into a rolling summary. Folded turns appear right away
+    as one-line gists; every `summarize_every` folds the summary is refreshed (with
+    `summarizer(previous_summary, new_lines)` if given, else by trimming the oldest gists)
+    so it stays within `summary_tokens`.
+
+    Each message is tokenized and serialized once when added; history_text() reuses the
+    cached strings, so a turn costs O(new message), not O(window).
+
+    With an `index` (retrieval.TurnIndex), history_text(query) sends the summary, the
+    last few turns, and in whatever is left of `budget_tokens`, the earlier turns most
+    relevant to the query, in place of the full recent window.
+    """
+    def __init__(self, budget_tokens: int = 1500, summary_tokens: int = 300, summarize_every: int = 6,
+                 summarizer: Optional[Callable[[str, List[str]], str]] = None, index=None):
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = min(summary_tokens, budget_tokens // 2)
+        self.recent_budget = budget_tokens - self.summary_tokens
+        self.summarize_every = max(1, summarize_every)
+        self.summarizer = summarizer
+        self.index = index
+        self.reset()
+
+    def reset(self) -> None:
+        self.turns = 0
+        self._recent: Deque[Tuple[str, int]] = deque()     # (serialized line, tokens)
+        self._recent_tokens = 0
+        self._recent_text = ""
+        self._summary = ""              # last refreshed summary
+        self._summary_tokens = 0
+        self._pending: Deque[Tuple[str, int]] = deque()    # gists folded since the refresh
+        self._pending_tokens = 0
+        self._history: Optional[str] = None                 # cached history_text()
+
+    # ---------- write ----------
+    def add(self, role: str, content: str) -> None:
+        if role not in ("user", "assistant"):
+            return
+        content = content or ""
+        line = f"{_speaker(role)}: {content}"
+        tokens = count_tokens(line)
+        if tokens > self.recent_budget:
+            # A single huge message is clipped so the budget stays hard
+            line = line[: self.recent_budget * 4 - 1] + "…"
+            tokens = count_tokens(line)
+
+        if self.index is not None:
+            self.index.add(line)
+        self._recent.append((line, tokens))
+        self._recent_tokens += tokens
+        self._recent_text = f"{self._recent_text}\n{line}" if self._recent_text else line
+        self.turns += 1
+
+        while self._recent_tokens > self.recent_budget and len(self._recent) > 1:
+            old_line, old_tokens = self._recent.popleft()
+            self._recent_tokens -= old_tokens
+            self._recent_text = self._recent_text[len(old_line) + 1:]
+            old_role, _, old_content = old_line.partition(": ")
+            self._fold("user" if old_role == "User" else "assistant", old_content)
+        self._history = None
+
+    def _fold(self, role: str, content: str) -> None:
+        gist = _compress(role, content)
+        tokens = count_tokens(gist)
+        self._pending.append((gist, tokens))
+        self._pending_tokens += tokens
+        if len(self._pending) >= self.summarize_every or \
+                self._summary_tokens + self._pending_tokens > self.summary_tokens:
+            self._refresh_summary()
+
+    def _refresh_summary(self) -> None:
+        new_lines = [g for g, _ in self._pending]
+        if self.summarizer is not None:
+            summary = self.summarizer(self._summary, new_lines) or ""
+        else:
+            summary = "\n".join(filter(None, [self._summary] + new_lines))
+        # Trim oldest summary lines until it fits
+        lines = summary.split("\n")
+        tokens = [count_tokens(l) for l in lines]
+        total = sum(tokens)
+        start = 0
+        while total > self.summary_tokens and start < len(lines) - 1:
+            total -= tokens[start]
+            start += 1
+        self._summary = "\n".join(lines[start:])
+        self._summary_tokens = count_tokens(self._summary) if self._summary else 0
+        if self._summary_tokens > self.summary_tokens:
+            self._summary = self._summary[: self.summary_tokens * 4 - 1] + "…"
+            self._summary_tokens = count_tokens(self._summary)
+        self._pending.clear()
+        self._pending_tokens = 0
+
+    # ---------- read ----------
+    def nbytes(self) -> int:
+        """Approximate memory held: the cached history text, summary and the index."""
+        return (len(self._recent_text) + len(self._summary) + self._pending_tokens * 4
+                + (self.index.nbytes() if self.index is not None else 0))
+
+    @property
+    def tokens(self) -> int:
+        return self._recent_tokens + self._summary_tokens + self._pending_tokens
+
+    def summary_text(self) -> str:
+        pending = "\n".join(g for g, _ in self._pending)
+        return "\n".join(filter(None, [self._summary, pending]))
+
+    def history_text(self, query: Optional[str] = None) -> str:
+        """
+        Serialized prompt history: rolling summary (if any) followed by recent turns verbatim.
+        Given a query and an index, once the conversation outgrows the recent window: the
+        summary, the relevant earlier turns, then the last few; within budget_tokens either way.
+        """
+        if query is not None and self.index is not None and self.turns > self.index.recent:
+            return self._retrieved_text(query)
+        if self._history is None:
+            summary = self.summary_text()
+            if summary and self._recent_text:
+                self._history = f"Summary of earlier conversation:\n{summary}\n\nRecent turns:\n{self._recent_text}"
+            else:
+                self._history = self._recent_text
+        return self._history
+
+    def _retrieved_text(self, query: str) -> str:
+        # the last few turns (fewer if they overflow the token budget) and the summary, then
+        # what's relevant before them in the tokens left
+        recent = list(self._recent)[-self.index.recent:]
+        left = self.budget_tokens - sum(t for _, t in recent) - self._summary_tokens - self._pending_tokens
+        relevant = self.index.relevant_lines(query, exclude_last=len(recent), max_tokens=left) if left > 0 else []
+        parts = []
+        summary = self.summary_text()
+        if summary:
+            parts.append(f"Summary of earlier conversation:\n{summary}")
+        if relevant:
+            parts.append("Relevant earlier turns:\n" + "\n".join(relevant))
+        recent_text = "\n".join(line for line, _ in recent)
+        return "\n\n".join(parts + [f"Recent turns:\n{recent_text}"]) if parts else recent_text
+
+    @classmethod
+    def from_messages(cls, messages, **kwargs) -> "ConversationMemory":
+        mem = cls(**kwargs)
+        for m in messages:
+            mem.add(m["role"], m.get("content") or "")
+        return mem
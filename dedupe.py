@@ -0,0 +1,155 @@
+# dedupe.py  (NEAR-DUPLICATE DESCRIPTION INDEX — MINHASH + LSH)
+from __future__ import annotations
+import re, unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+# Seller boilerplate that says nothing about the product (stripped before comparing)
+BOILERPLATE = (
+    r"free (?:and fast )?shipping", r"fast shipping", r"ships? (?:free|fast|today|within \d+ (?:business )?days?)",
+    r"buy now", r"order now", r"limited(?: time)? offer", r"best ?seller", r"hot deal", r"in stock",
+    r"brand new(?: in box)?", r"100% (?:authentic|genuine|original|satisfaction guaranteed)",
+    r"(?:sold|shipped) by [^.,;|]+", r"seller:? [^.,;|]+", r"money back guarantee",
+)
+BOILERPLATE_RE = re.compile(r"\b(?:" + "|".join(BOILERPLATE) + r")\b", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+NON_WORD_RE = re.compile(r"[^\w]+")
+
+SHINGLE = 4                      # bytes per shingle (read directly as one uint32)
+_PRIME = np.uint64(4294967311)   # smallest prime above 2**32
+
+def normalize(text: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    (comparison text, numbers). Case, punctuation, whitespace and boilerplate are dropped.
+    Numbers are kept apart: "128GB" and "256GB" listings look alike but are different products.
+    """
+    t = unicodedata.normalize("NFKC", text or "").lower()
+    t = BOILERPLATE_RE.sub(" ", t)
+    numbers = tuple(sorted({n.replace(",", "") for n in NUMBER_RE.findall(t)}))
+    return " ".join(NON_WORD_RE.sub(" ", t).split()), numbers
+
+def _shingles(text: str) -> np.ndarray:
+    """Distinct 4-byte windows of the UTF-8 text as uint32 (no hashing needed)."""
+    raw = text.encode("utf-8")
+    if len(raw) < SHINGLE:
+        raw = raw.ljust(SHINGLE, b" ")
+    b = np.frombuffer(raw, dtype=np.uint8).astype(np.uint32)
+    grams = (b[:-3] << 24) | (b[1:-2] << 16) | (b[2:-1] << 8) | b[3:]
+    return np.unique(grams).astype(np.uint64)
+
+def _bands_for(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows). LSH recall is tuned below `threshold` so true matches become
+    candidates; each candidate is then verified against the threshold itself.
+    """
+    target = max(0.3, threshold - 0.2)
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= target:
+            best = (bands, rows)
+    return best
+
+class DedupeIndex:
+    """
+    Streaming near-duplicate index over product descriptions.
+
+    - MinHash signatures (num_perm hashes over 4-byte shingles of the normalized text)
+      estimate Jaccard similarity; LSH banding finds candidates in O(bands) per row.
+    - A row matches a representative when estimated similarity ≥ threshold and both
+      mention the same numbers (price, storage, model numbers).
+    - At most max_representatives are kept, evicted least-recently-matched first,
+      so memory stays flat on arbitrarily long inputs (at the cost of missing a
+      duplicate whose representative was evicted; it then becomes a representative).
+    - Each merge is reported to `audit(row, representative, similarity)`.
+    """
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, max_representatives: int = 50_000,
+                 audit: Optional[Callable[[Any, Any, float], None]] = None, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.max_representatives = max(1, max_representatives)
+        self.audit = audit
+        self.bands, self.rows = _bands_for(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+        self._tables: List[Dict[bytes, Any]] = [{} for _ in range(self.bands)]
+        self._reps: "OrderedDict[Any, Tuple[np.ndarray, Tuple[str, ...], List[bytes]]]" = OrderedDict()
+        self._results: Dict[Any, Any] = {}
+        self.seen = self.merged = self.evicted = self.number_mismatches = 0
+
+    def signature(self, norm_text: str) -> np.ndarray:
+        h = _shingles(norm_text)
+        return (((self._a * h + self._b) % _PRIME).min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        r = self.rows
+        return [sig[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def add(self, key: Any, text: str) -> Tuple[Any, float]:
+        """
+        Index one row. Returns (representative key, similarity); the representative is
+        `key` itself (similarity 1.0) when the row starts a new cluster.
+        """
+        self.seen += 1
+        norm, numbers = normalize(text)
+        sig = self.signature(norm)
+        bands = self._band_keys(sig)
+
+        best, best_sim = None, 0.0
+        checked = set()     # a candidate usually shares several bands; compare it once
+        for table, band in zip(self._tables, bands):
+            cand = table.get(band)
+            if cand is None or cand in checked:
+                continue
+            checked.add(cand)
+            c_sig, c_numbers, _ = self._reps[cand]
+            sim = float(np.count_nonzero(c_sig == sig)) / self.num_perm
+            if sim >= self.threshold and sim > best_sim:
+                if c_numbers != numbers:
+                    self.number_mismatches += 1
+                    continue
+                best, best_sim = cand, sim
+        if best is not None:
+            self._reps.move_to_end(best)
+            self.merged += 1
+            if self.audit is not None:
+                self.audit(key, best, best_sim)
+            return best, best_sim
+
+        self._reps[key] = (sig, numbers, bands)
+        for table, band in zip(self._tables, bands):
+            table[band] = key
+        while len(self._reps) > self.max_representatives:
+            self._evict()
+        return key, 1.0
+
+    def _evict(self) -> None:
+        old, (_, _, bands) = self._reps.popitem(last=False)
+        for table, band in zip(self._tables, bands):
+            if table.get(band) == old:
+                del table[band]
+        self._results.pop(old, None)
+        self.evicted += 1
+
+    # ---------- representative results (dropped with the representative) ----------
+    def set_result(self, key: Any, result: Any) -> None:
+        if key in self._reps:
+            self._results[key] = result
+
+    def result(self, key: Any, default: Any = None) -> Any:
+        return self._results.get(key, default)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.seen,
+            "representatives": len(self._reps),
+            "merged": self.merged,
+            "merged_share": round(self.merged / self.seen, 3) if self.seen else 0.0,
+            "evicted": self.evicted,
+            "number_mismatches": self.number_mismatches,
+            "bands_x_rows": f"{self.bands}x{self.rows}",
+        }
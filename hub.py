@@ -1,7 +1,9 @@
 # the_hub/hub.py
 import os
+import threading
 import importlib
 import streamlit as st
+from hub_registry import APPS, get_app, load_render
 
 # ---------- Page ----------
 FAVICON = os.path.join("assets", "favicon.png")
@@ -16,28 +18,33 @@ except Exception:
     # Ignore duplicate set_page_config when sub-apps are imported
     pass
 
+# Open the pooled Groq connection in the background (once per process), so the
+# first chat/extract request doesn't pay DNS + TLS setup. The import happens on the
+# worker thread too: the landing page never waits on the Groq SDK.
+@st.cache_resource(show_spinner=False)
+def _start_prewarm():
+    t = threading.Thread(
+        target=lambda: importlib.import_module("llm_client").prewarm(background=False),
+        name="hub-prewarm", daemon=True,
+    )
+    t.start()
+    return t
+
+_start_prewarm()
+
+# Prometheus scrape endpoint (/metrics, /metrics.json) when HUB_METRICS_PORT is set
+@st.cache_resource(show_spinner=False)
+def _start_metrics_server():
+    return importlib.import_module("metrics").serve()
+
+_start_metrics_server()
+
 # ---------- Simple router ----------
 ROUTE = st.session_state.get("route", "hub")
 def goto(name: str):
     st.session_state["route"] = name
     st.rerun()
 
-def _import_first(mod_names):
-    """Import first module that exists from list of names."""
-    for name in mod_names:
-        try:
-            return importlib.import_module(name)
-        except Exception:
-            continue
-    return None
-
-def _call_render(mod, candidates):
-    """Call first render function that exists in module."""
-    for fn in candidates:
-        if hasattr(mod, fn):
-            return getattr(mod, fn)()
-    st.error(f"None of the render functions found: {candidates}")
-
 # ---------- Hub tiles ----------
 if ROUTE == "hub":
     st.markdown(
@@ -50,58 +57,36 @@ if ROUTE == "hub":
         unsafe_allow_html=True,
     )
 
-    c1, c2 = st.columns(2)
-
-    with c1:
-        st.markdown(
-            """
-            <div style="padding:18px;border:1px solid rgba(0,0,0,0.1);
-                        border-radius:16px;min-height:180px;">
-              <div style="font-size:22px;font-weight:700;">🧠 Chat Therapy</div>
-              <div style="color:#666;margin-top:6px;">
-                Therapist-style chat with export to PDF/Markdown.
-              </div>
-              <div style="margin-top:16px;">
-            """,
-            unsafe_allow_html=True,
-        )
-        if st.button("Open Therapy", type="primary", use_container_width=True):
-            goto("therapy")
-        st.markdown("</div></div>", unsafe_allow_html=True)
+    # Tiles come from the registry; no app module is imported until it is opened
+    for col, app in zip(st.columns(len(APPS)), APPS):
+        with col:
+            st.markdown(
+                f"""
+                <div style="padding:18px;border:1px solid rgba(0,0,0,0.1);
+                            border-radius:16px;min-height:180px;">
+                  <div style="font-size:22px;font-weight:700;">{app.title}</div>
+                  <div style="color:#666;margin-top:6px;">
+                    {app.blurb}
+                  </div>
+                  <div style="margin-top:16px;">
+                """,
+                unsafe_allow_html=True,
+            )
+            if st.button(app.button, type="primary", use_container_width=True, key=f"open_{app.key}"):
+                goto(app.key)
+            st.markdown("</div></div>", unsafe_allow_html=True)
 
-    with c2:
-        st.markdown(
-            """
-            <div style="padding:18px;border:1px solid rgba(0,0,0,0.1);
-                        border-radius:16px;min-height:180px;">
-              <div style="font-size:22px;font-weight:700;">🧩 Product → JSON Extractor</div>
-              <div style="color:#666;margin-top:6px;">
-                Paste a product description, get strict JSON and download it.
-              </div>
-              <div style="margin-top:16px;">
-            """,
-            unsafe_allow_html=True,
-        )
-        if st.button("Open Extractor", type="primary", use_container_width=True):
-            goto("extractor")
-        st.markdown("</div></div>", unsafe_allow_html=True)
-
-# ---------- Therapy app ----------
-elif ROUTE == "therapy":
+# ---------- Sub-apps ----------
+else:
     st.sidebar.button("⬅️ Back to Hub", use_container_width=True, on_click=lambda: goto("hub"))
-    # Prefer app3.py; fall back to app2.py
-    mod = _import_first(["app3", "app2"])
-    if not mod:
-        st.error("Could not import app3.py or app2.py. Ensure one of them is present in the_hub folder.")
+    app = get_app(ROUTE)
+    if app is None:
+        st.error(f"Unknown app: {ROUTE}")
     else:
-        _call_render(mod, ["render_therapy", "render"])
-
-# ---------- Product extractor ----------
-elif ROUTE == "extractor":
-    st.sidebar.button("⬅️ Back to Hub", use_container_width=True, on_click=lambda: goto("hub"))
-    # Prefer prodapp.py; fall back to prodapp2.py
-    mod = _import_first(["prodapp", "prodapp2"])
-    if not mod:
-        st.error("Could not import prodapp.py or prodapp2.py. Ensure one of them is present in the_hub folder.")
-    else:
-        _call_render(mod, ["render_extractor", "render"])
+        try:
+            # First navigation imports the app; afterwards this is a memoized lookup
+            render = load_render(app.key)
+        except ImportError as e:
+            st.error(str(e))
+        else:
+            render()
@@ -0,0 +1,61 @@
+# hub_registry.py  (APP REGISTRY FOR THE HUB)
+from __future__ import annotations
+import importlib
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional, Tuple
+
+class AppSpec(NamedTuple):
+    """Everything the hub needs to draw a tile and route to an app, without importing it."""
+    key: str                     # route name
+    title: str                   # tile heading
+    blurb: str                   # tile description
+    button: str                  # tile button label
+    modules: Tuple[str, ...]     # module candidates, first importable wins
+    renders: Tuple[str, ...]     # render function candidates, first found wins
+
+APPS: Tuple[AppSpec, ...] = (
+    AppSpec(
+        key="therapy",
+        title="🧠 Chat Therapy",
+        blurb="Therapist-style chat with export to PDF/Markdown.",
+        button="Open Therapy",
+        modules=("app3", "app2"),            # Prefer app3.py; fall back to app2.py
+        renders=("render_therapy", "render"),
+    ),
+    AppSpec(
+        key="extractor",
+        title="🧩 Product → JSON Extractor",
+        blurb="Paste a product description, get strict JSON and download it.",
+        button="Open Extractor",
+        modules=("prodapp", "prodapp2"),     # Prefer prodapp.py; fall back to prodapp2.py
+        renders=("render_extractor", "render"),
+    ),
+)
+
+_BY_KEY = {app.key: app for app in APPS}
+
+def get_app(key: str) -> Optional[AppSpec]:
+    return _BY_KEY.get(key)
+
+@lru_cache(maxsize=None)
+def load_render(key: str) -> Callable[[], None]:
+    """
+    Import the app's module on first use and return its render function.
+    The result is memoized for the life of the process, so later reruns and other
+    sessions skip the import probing entirely. Failures are not cached.
+    """
+    spec = _BY_KEY[key]
+    errors = []
+    for name in spec.modules:
+        try:
+            mod = importlib.import_module(name)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            continue
+        for fn in spec.renders:
+            if hasattr(mod, fn):
+                return getattr(mod, fn)
+        raise ImportError(f"None of the render functions found in {name}: {list(spec.renders)}")
+    files = " or ".join(f"{m}.py" for m in spec.modules)
+    raise ImportError(f"Could not import {files}. Ensure one of them is present in the_hub folder. "
+                      f"({'; '.join(errors)})")
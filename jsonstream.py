@@ -0,0 +1,127 @@
+# jsonstream.py  (INCREMENTAL JSON PARSER FOR STREAMED MODEL OUTPUT)
+from __future__ import annotations
+import json
+from typing import Any, Iterable, List, Optional
+
+class JSONStreamError(ValueError):
+    """Streamed text cannot become the JSON we asked for. Raised as early as possible."""
+
+class JSONStreamParser:
+    """
+    Feed model output chunk by chunk; know the moment the top-level JSON value is complete.
+
+    - Leading junk before the first "{" / "[" (e.g. a ```json fence) is skipped, up to
+      `max_prefix` characters; anything longer fails fast.
+    - Brackets are tracked outside of strings, so feed() returns True on the exact chunk
+      that closes the root value. The caller can stop the stream there.
+    - With `allowed_keys`, every key of a record object (the root object, or objects
+      directly inside a root array) is checked as soon as it is parsed. An unknown key
+      raises JSONStreamError right away.
+    One pass over each character; the text is never re-scanned.
+    """
+    def __init__(self, allowed_keys: Optional[Iterable[str]] = None, max_prefix: Optional[int] = 200,
+                 root: str = "{["):
+        self.allowed_keys = frozenset(allowed_keys) if allowed_keys is not None else None
+        self.max_prefix = max_prefix
+        self.root_chars = root
+        self._chunks: List[str] = []
+        self._pos = 0               # characters consumed so far
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key: List[bool] = []   # per open container: next string is an object key
+        self._key: Optional[List[str]] = None
+        self._record_depth = 1
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, chunk: str) -> bool:
+        if self.end is not None or not chunk:
+            return self.end is not None
+        self._chunks.append(chunk)
+        for i, ch in enumerate(chunk):
+            if self._step(ch, self._pos + i):
+                self._pos += i + 1
+                return True
+        self._pos += len(chunk)
+        if self.start is None and self.max_prefix is not None and self._pos > self.max_prefix:
+            raise JSONStreamError(f"No JSON {self.root_chars!r} within the first {self.max_prefix} characters.")
+        return False
+
+    def _step(self, ch: str, pos: int) -> bool:
+        if self._in_string:
+            if self._key is not None and not (ch == '"' and not self._escape):
+                self._key.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._key is not None:
+                    self._check_key("".join(self._key))
+                    self._key = None
+            return False
+
+        if self.start is None:
+            if ch in self.root_chars:
+                self.start = pos
+                self._record_depth = 1 if ch == "{" else 2
+                self._open(ch)
+            return False
+
+        if ch == '"':
+            self._in_string = True
+            if self._stack[-1] == "{" and self._expect_key[-1]:
+                self._expect_key[-1] = False
+                if self.allowed_keys is not None and len(self._stack) == self._record_depth:
+                    self._key = []
+        elif ch in "{[":
+            self._open(ch)
+        elif ch in "}]":
+            opener = self._stack.pop() if self._stack else None
+            self._expect_key.pop() if self._expect_key else None
+            if opener != ("{" if ch == "}" else "["):
+                raise JSONStreamError(f"Unbalanced {ch!r} at character {pos}.")
+            if not self._stack:
+                self.end = pos + 1
+                return True
+        elif ch == ",":
+            if self._stack[-1] == "{":
+                self._expect_key[-1] = True
+        return False
+
+    def _open(self, ch: str) -> None:
+        self._stack.append(ch)
+        self._expect_key.append(ch == "{")
+
+    def _check_key(self, key: str) -> None:
+        if key not in self.allowed_keys:
+            raise JSONStreamError(f"Unexpected key {key!r} (allowed: {', '.join(sorted(self.allowed_keys))}).")
+
+    # ---------- results ----------
+    def text(self) -> str:
+        """Everything fed so far."""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def document(self) -> str:
+        """The root JSON value's text if complete, else everything fed so far."""
+        text = self.text()
+        return text[self.start:self.end] if self.end is not None else text
+
+    def value(self) -> Any:
+        if self.end is None:
+            raise JSONStreamError("JSON value is incomplete.")
+        return json.loads(self.document())
+
+def extract_json(text: str, allowed_keys: Optional[Iterable[str]] = None, root: str = "{") -> Any:
+    """First complete JSON value in text (any prefix allowed), in one pass. Raises ValueError."""
+    parser = JSONStreamParser(allowed_keys=allowed_keys, max_prefix=None, root=root)
+    parser.feed(text)
+    return parser.value()
@@ -0,0 +1,335 @@
+# llm_client.py  (SHARED GROQ CLIENT LAYER)
+from __future__ import annotations
+import os, time, random, asyncio, threading, weakref
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from groq import Groq, AsyncGroq, APIConnectionError, APIStatusError
+
+import metrics
+import scheduler
+from chat_memory import count_tokens
+
+load_dotenv()
+
+# ==============================================================================
+# CONFIG (env overrides)
+# ==============================================================================
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+TIMEOUT = httpx.Timeout(
+    connect=_env_float("GROQ_CONNECT_TIMEOUT", 5.0),
+    read=_env_float("GROQ_READ_TIMEOUT", 60.0),   # max gap between streamed chunks
+    write=_env_float("GROQ_WRITE_TIMEOUT", 10.0),
+    pool=_env_float("GROQ_POOL_TIMEOUT", 10.0),
+)
+LIMITS = httpx.Limits(
+    max_connections=int(_env_float("GROQ_MAX_CONNECTIONS", 32)),
+    max_keepalive_connections=int(_env_float("GROQ_MAX_KEEPALIVE", 16)),
+    keepalive_expiry=_env_float("GROQ_KEEPALIVE_EXPIRY", 120.0),
+)
+MAX_RETRIES = int(_env_float("GROQ_MAX_RETRIES", 4))
+BACKOFF_BASE = _env_float("GROQ_BACKOFF_BASE", 0.5)    # seconds
+BACKOFF_MAX = _env_float("GROQ_BACKOFF_MAX", 20.0)     # seconds, also caps Retry-After
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# ==============================================================================
+# CLIENTS — one pooled client per process, created on first use
+# ==============================================================================
+_lock = threading.Lock()
+_client: Optional[Groq] = None
+_async_clients = weakref.WeakKeyDictionary()   # event loop -> AsyncGroq (async pools are loop-bound)
+_prewarmed = False
+
+def get_client() -> Groq:
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = Groq(
+                    api_key=os.getenv("GROQ_API_KEY"),
+                    http_client=httpx.Client(limits=LIMITS, timeout=TIMEOUT),
+                    max_retries=0,       # retries are handled below, with jitter
+                    timeout=TIMEOUT,
+                )
+    return _client
+
+def get_async_client() -> AsyncGroq:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            http_client=httpx.AsyncClient(limits=LIMITS, timeout=TIMEOUT),
+            max_retries=0,
+            timeout=TIMEOUT,
+        )
+    return client
+
+# ==============================================================================
+# RETRY POLICY
+# ==============================================================================
+def is_retryable(err: BaseException) -> bool:
+    if isinstance(err, APIStatusError):
+        return err.status_code in RETRY_STATUS
+    return isinstance(err, APIConnectionError)   # includes timeouts
+
+def _retry_after(err: BaseException) -> Optional[float]:
+    """Seconds requested by the server via retry-after-ms / Retry-After, if any."""
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def retry_delay(attempt: int, err: BaseException) -> float:
+    """Retry-After when the server sends one, else full-jitter exponential backoff."""
+    hinted = _retry_after(err)
+    if hinted is not None:
+        return min(BACKOFF_MAX, hinted) + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def _retry_reason(err: BaseException) -> str:
+    return str(getattr(err, "status_code", "")) or err.__class__.__name__
+
+def _on_failure(sched, model: str, err: BaseException) -> None:
+    """A 429 holds back every caller of that model in the process, not just the one that got it."""
+    if getattr(err, "status_code", None) == 429:
+        sched.penalize(_retry_after(err) or BACKOFF_BASE, model)
+
+# ==============================================================================
+# METERING — TTFT, latency, tokens in/out per call (metrics.py)
+# ==============================================================================
+def _prompt_tokens(kwargs: Dict[str, Any]) -> int:
+    return sum(count_tokens(m.get("content") or "") for m in kwargs.get("messages", ()))
+
+DEFAULT_COMPLETION_BUDGET = 1024   # token estimate when a call sets no max_completion_tokens
+
+def _token_estimate(kwargs: Dict[str, Any]) -> int:
+    """What the scheduler reserves per call: prompt + the completion budget."""
+    budget = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or DEFAULT_COMPLETION_BUDGET
+    return _prompt_tokens(kwargs) + int(budget)
+
+def _lane(app: str, priority: Optional[int], session: Optional[str]):
+    """Explicit arguments win over an enclosing scheduler.lane(); the app is the fallback session."""
+    lane_priority, lane_session = scheduler.current_lane()
+    return (lane_priority if priority is None else priority), (session or lane_session or app)
+
+def _admit(app: str, model: str, estimate: int, priority: int, session: str):
+    sched = scheduler.get_scheduler()
+    time.sleep(sched.paused_for(model))     # a rate-limited model waits out its Retry-After first
+    grant = sched.acquire(estimate, priority, session)
+    metrics.record_queue_wait(app, scheduler.PRIORITY_NAMES[priority], grant.waited)
+    return grant
+
+def _usage(obj: Any) -> Any:
+    """Server-reported usage: on the response, or on the last chunk of a Groq stream."""
+    return getattr(obj, "usage", None) or getattr(getattr(obj, "x_groq", None), "usage", None)
+
+class _MeteredStream:
+    """
+    Wraps a streamed completion. The first content delta marks TTFT; the call is recorded
+    once, when the stream is exhausted, closed early (e.g. prodbot stops at "}") or fails.
+    Token counts use the server's usage chunk when it arrives, else a chars/4 estimate.
+    """
+    def __init__(self, stream, app: str, model: str, started: float, tokens_in: int, grant=None):
+        self._stream = stream
+        self._grant = grant
+        self._app, self._model, self._started, self._tokens_in = app, model, started, tokens_in
+        self._ttft: Optional[float] = None
+        self._chars = 0
+        self._usage = None
+        self._done = False
+
+    def _observe(self, chunk: Any) -> None:
+        choices = getattr(chunk, "choices", None)
+        delta = getattr(choices[0].delta, "content", None) if choices else None
+        if delta:
+            if self._ttft is None:
+                self._ttft = time.perf_counter() - self._started
+            self._chars += len(delta)
+        self._usage = _usage(chunk) or self._usage
+
+    def __iter__(self):
+        ok = False
+        try:
+            for chunk in self._stream:
+                self._observe(chunk)
+                yield chunk
+            ok = True
+        finally:
+            self._finish(ok or self._ttft is not None)
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._finish(True)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+    def _finish(self, ok: bool) -> None:
+        if self._done:
+            return
+        self._done = True
+        usage = self._usage
+        tokens_in = getattr(usage, "prompt_tokens", None) or self._tokens_in
+        tokens_out = getattr(usage, "completion_tokens", None) or (self._chars + 3) // 4
+        metrics.record_llm_call(self._app, self._model, time.perf_counter() - self._started, self._ttft,
+                                tokens_in=tokens_in, tokens_out=tokens_out, ok=ok)
+        if self._grant is not None:
+            self._grant.settle(tokens_in + tokens_out)
+
+class _AsyncMeteredStream(_MeteredStream):
+    """_MeteredStream for AsyncGroq streams: `async for` over chunks, `await close()`."""
+    async def __aiter__(self):
+        ok = False
+        try:
+            async for chunk in self._stream:
+                self._observe(chunk)
+                yield chunk
+            ok = True
+        finally:
+            self._finish(ok or self._ttft is not None)
+
+    async def close(self) -> None:
+        try:
+            await self._stream.close()
+        finally:
+            self._finish(True)
+
+# ==============================================================================
+# PUBLIC API
+# ==============================================================================
+def chat_completion(app: str = "default", priority: Optional[int] = None, session: Optional[str] = None,
+                    retries: Optional[int] = None, on_admit: Optional[Callable[[], Any]] = None, **kwargs: Any):
+    """
+    client.chat.completions.create(**kwargs) with retries on 429/5xx/connection errors.
+    For stream=True only opening the stream is retried; a stream that fails midway raises.
+    Every attempt first waits for the process-wide rate-limit scheduler (scheduler.py);
+    priority/session default to the enclosing scheduler.lane(), else interactive / `app`.
+    `app` labels this call's metrics (latency, TTFT, tokens, retries, queue wait). Latency
+    and TTFT count from when the request is sent; queue wait and retry sleeps are separate.
+    retries overrides GROQ_MAX_RETRIES (tiers.py passes 0 when it can fail over instead).
+    on_admit() runs after each admission, just before the request is sent; if it raises,
+    the grant is refunded and the call ends there (tiers.py times TTFT from it).
+    """
+    model = kwargs.get("model", "")
+    priority, session = _lane(app, priority, session)
+    estimate = _token_estimate(kwargs)
+    sched = scheduler.get_scheduler()
+    attempt = 0
+    while True:
+        grant = _admit(app, model, estimate, priority, session)
+        if on_admit is not None:
+            try:
+                on_admit()
+            except BaseException:
+                grant.settle(0)
+                raise
+        started = time.perf_counter()   # after admission: queue wait is metered on its own
+        try:
+            raw = get_client().chat.completions.with_raw_response.create(**kwargs)
+            sched.sync(raw.headers)
+            response = raw.parse()
+            break
+        except Exception as e:
+            grant.settle(0)
+            _on_failure(sched, model, e)
+            if attempt >= (MAX_RETRIES if retries is None else retries) or not is_retryable(e):
+                metrics.record_llm_call(app, model, time.perf_counter() - started, ok=False)
+                raise
+            metrics.record_retry(app, _retry_reason(e))
+            time.sleep(retry_delay(attempt, e))
+            attempt += 1
+    if kwargs.get("stream"):
+        return _MeteredStream(response, app, model, started, _prompt_tokens(kwargs), grant)
+    usage = _usage(response)
+    tokens_in = getattr(usage, "prompt_tokens", 0) or _prompt_tokens(kwargs)
+    tokens_out = getattr(usage, "completion_tokens", 0) or 0
+    metrics.record_llm_call(app, model, time.perf_counter() - started, tokens_in=tokens_in, tokens_out=tokens_out)
+    grant.settle(tokens_in + tokens_out if usage is not None else None)
+    return response
+
+async def achat_completion(app: str = "default", priority: Optional[int] = None, session: Optional[str] = None,
+                           retries: Optional[int] = None, **kwargs: Any):
+    """
+    Async twin of chat_completion (AsyncGroq, same retry policy and scheduler; admission
+    waits in a worker thread). Streams are metered and settle their grant when they end
+    or are closed, like chat_completion's.
+    """
+    model = kwargs.get("model", "")
+    priority, session = _lane(app, priority, session)
+    estimate = _token_estimate(kwargs)
+    sched = scheduler.get_scheduler()
+    attempt = 0
+    while True:
+        grant = await asyncio.to_thread(_admit, app, model, estimate, priority, session)
+        started = time.perf_counter()
+        try:
+            raw = await get_async_client().chat.completions.with_raw_response.create(**kwargs)
+            sched.sync(raw.headers)
+            response = await raw.parse()
+            break
+        except Exception as e:
+            grant.settle(0)
+            _on_failure(sched, model, e)
+            if attempt >= (MAX_RETRIES if retries is None else retries) or not is_retryable(e):
+                metrics.record_llm_call(app, model, time.perf_counter() - started, ok=False)
+                raise
+            metrics.record_retry(app, _retry_reason(e))
+            await asyncio.sleep(retry_delay(attempt, e))
+            attempt += 1
+    if kwargs.get("stream"):
+        return _AsyncMeteredStream(response, app, model, started, _prompt_tokens(kwargs), grant)
+    usage = _usage(response)
+    tokens_in = getattr(usage, "prompt_tokens", 0) or _prompt_tokens(kwargs)
+    tokens_out = getattr(usage, "completion_tokens", 0) or 0
+    metrics.record_llm_call(app, model, time.perf_counter() - started, tokens_in=tokens_in, tokens_out=tokens_out)
+    grant.settle(tokens_in + tokens_out if usage is not None else None)
+    return response
+
+def prewarm(background: bool = True) -> None:
+    """
+    Open a pooled keep-alive connection (DNS + TLS) ahead of the first real request.
+    Idempotent; failures are ignored since the real request will report them.
+    Disabled with GROQ_PREWARM=0.
+    """
+    global _prewarmed
+    if _prewarmed or os.getenv("GROQ_PREWARM", "1").lower() in ("0", "false", "off"):
+        return
+    _prewarmed = True
+
+    def _warm():
+        try:
+            get_client().models.list()
+        except Exception:
+            pass
+
+    if background:
+        threading.Thread(target=_warm, name="groq-prewarm", daemon=True).start()
+    else:
+        _warm()
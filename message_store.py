@@ -0,0 +1,267 @@
+# message_store.py  (COMPACT, BOUNDED IN-MEMORY CHAT HISTORY)
+from __future__ import annotations
+import os, sys, time, zlib, hashlib, threading
+from collections import OrderedDict
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional
+
+# ==============================================================================
+# CONFIG (env overrides)
+# ==============================================================================
+KEEP_PLAIN = int(os.getenv("HUB_MESSAGES_KEEP_PLAIN", "20"))          # newest messages kept uncompressed
+COMPRESS_MIN = int(os.getenv("HUB_MESSAGES_COMPRESS_MIN", "256"))     # bytes; shorter texts don't shrink
+SESSION_MAX_BYTES = int(os.getenv("HUB_SESSION_MAX_BYTES", str(256 * 1024)))   # per session, in memory
+TOTAL_MAX_BYTES = int(os.getenv("HUB_MESSAGES_MAX_BYTES", str(64 * 1024 * 1024)))  # all sessions, in memory
+IDLE_SECONDS = float(os.getenv("HUB_SESSION_IDLE_SECONDS", "1800"))   # untouched this long → evicted
+RESUME_PAGE = 50    # messages loaded from disk when a session (re)enters memory
+
+# ==============================================================================
+# INTERNED ROLE / AVATAR
+# ==============================================================================
+class Role(IntEnum):
+    USER = 0
+    ASSISTANT = 1
+
+class Avatar(IntEnum):
+    NONE = 0
+    THERAPIST = 1
+    SOLUTION = 2
+    OUT_OF_SCOPE = 3
+
+AVATAR_PATHS = {Avatar.NONE: None, Avatar.THERAPIST: "assets/favicon.png",
+                Avatar.SOLUTION: "assets/green.png", Avatar.OUT_OF_SCOPE: "assets/red.png"}
+_AVATAR_CODES = {path: code for code, path in AVATAR_PATHS.items() if path}
+
+def avatar_code(path: Optional[str]) -> Avatar:
+    """Avatar for an icon path (records on disk store the path); unknown paths show the default."""
+    return _AVATAR_CODES.get(path, Avatar.NONE) if path else Avatar.NONE
+
+# ==============================================================================
+# RECORDS
+# ==============================================================================
+class Message:
+    """
+    One chat message. Role and avatar are small ints; the text is a str, or zlib-compressed
+    UTF-8 once it falls out of the newest KEEP_PLAIN messages (decompressed on access).
+    """
+    __slots__ = ("role", "avatar", "_text")
+
+    def __init__(self, role: Role, text: str, avatar: Avatar = Avatar.NONE):
+        self.role, self.avatar, self._text = role, avatar, text
+
+    @property
+    def content(self) -> str:
+        text = self._text
+        return text if isinstance(text, str) else zlib.decompress(text).decode("utf-8")
+
+    @property
+    def role_name(self) -> str:
+        return "user" if self.role == Role.USER else "assistant"
+
+    @property
+    def avatar_path(self) -> Optional[str]:
+        return AVATAR_PATHS[self.avatar]
+
+    @property
+    def compressed(self) -> bool:
+        return not isinstance(self._text, str)
+
+    def compress(self) -> int:
+        """Compress the text if that saves space. Returns bytes saved."""
+        text = self._text
+        if not isinstance(text, str) or len(text) < COMPRESS_MIN:
+            return 0
+        packed = zlib.compress(text.encode("utf-8"), 6)
+        saved = sys.getsizeof(text) - sys.getsizeof(packed)
+        if saved <= 0:
+            return 0
+        self._text = packed
+        return saved
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self._text)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain record, as session_store persists it and the exporters expect it."""
+        record = {"role": self.role_name, "content": self.content}
+        if self.role == Role.ASSISTANT and self.avatar:
+            record["avatar"] = self.avatar_path
+        return record
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "Message":
+        role = Role.USER if record.get("role") == "user" else Role.ASSISTANT
+        return cls(role, record.get("content") or "", avatar_code(record.get("avatar")))
+
+class SessionMessages:
+    """
+    The in-memory tail of one session's history, oldest first.
+
+    Only the newest messages stay in memory: past `max_bytes` the oldest are dropped. They
+    are already in session_store, and `first_seq` (the store seq of the first message held)
+    lets "load earlier" page them back in. Messages are appended in store order, so the
+    message at index i has seq first_seq + i.
+
+    `memory` is state an app derives from these messages (app3: its ConversationMemory and
+    retrieval index). It lives and is evicted with the history, and its nbytes() counts
+    toward the registry's total cap.
+    """
+    __slots__ = ("sid", "first_seq", "max_bytes", "nbytes", "last_used", "memory", "_items", "_lock")
+
+    def __init__(self, sid: str, first_seq: int = 1, max_bytes: int = SESSION_MAX_BYTES):
+        self.sid = sid
+        self.first_seq = first_seq
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.last_used = time.monotonic()
+        self.memory: Any = None
+        self._items: List[Message] = []
+        self._lock = threading.Lock()
+
+    # ---------- write ----------
+    def append(self, role: str, content: str, avatar: Optional[str] = None) -> Message:
+        msg = Message(Role.USER if role == "user" else Role.ASSISTANT, content or "", avatar_code(avatar))
+        with self._lock:
+            self._items.append(msg)
+            self.nbytes += msg.nbytes()
+            if len(self._items) > KEEP_PLAIN:
+                self.nbytes -= self._items[-KEEP_PLAIN - 1].compress()
+            while self.nbytes > self.max_bytes and len(self._items) > 1:
+                self.nbytes -= self._items.pop(0).nbytes()
+                self.first_seq += 1
+        self.last_used = time.monotonic()
+        return msg
+
+    def prepend(self, records: List[Dict[str, Any]]) -> None:
+        """Older records paged in from session_store (oldest first, each with its "seq")."""
+        if not records:
+            return
+        older = [Message.from_dict(r) for r in records]
+        with self._lock:
+            self._items[:0] = older
+            plain_from = len(self._items) - KEEP_PLAIN
+            for i, msg in enumerate(older):
+                self.nbytes += msg.nbytes() - (msg.compress() if i < plain_from else 0)
+            self.first_seq = records[0].get("seq", self.first_seq - len(older))
+        self.last_used = time.monotonic()
+
+    # ---------- read ----------
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __iter__(self) -> Iterator[Message]:
+        self.last_used = time.monotonic()
+        return iter(list(self._items))
+
+    def recent(self, n: Optional[int] = None) -> List[Message]:
+        """The last n messages (all when n is None), oldest first."""
+        self.last_used = time.monotonic()
+        items = self._items
+        return list(items if n is None else items[-n:]) if n != 0 else []
+
+    def held_bytes(self) -> int:
+        """nbytes plus the attached memory's."""
+        return self.nbytes + (self.memory.nbytes() if self.memory is not None else 0)
+
+    def export(self) -> List[Dict[str, Any]]:
+        """Plain dict snapshot of the messages in memory (safe to hand to a thread). Only the
+        tail: full-conversation exports read session_store."""
+        return [m.to_dict() for m in self.recent()]
+
+    def version(self) -> str:
+        """Identifies what is held: the seq range (first_seq, count) plus the last message."""
+        items = self._items
+        if not items:
+            return "empty"
+        last = items[-1]
+        key = f"{self.first_seq}\x00{len(items)}\x00{last.role}\x00{last.content}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+# ==============================================================================
+# PROCESS-WIDE REGISTRY — idle eviction + a total memory cap
+# ==============================================================================
+class MessageRegistry:
+    """
+    All sessions' in-memory histories in this process, least recently used first.
+
+    Every turn is already written to session_store, so evicting a session only flushes
+    the store and drops the in-memory copy (and its attached memory); the next access
+    reloads its last RESUME_PAGE messages from disk. Sessions idle for IDLE_SECONDS (e.g. abandoned tabs) are evicted,
+    and so are the least recently used ones while the total is over TOTAL_MAX_BYTES.
+    """
+    def __init__(self, max_bytes: int = TOTAL_MAX_BYTES, idle_seconds: float = IDLE_SECONDS):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, SessionMessages]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, sid: str, resume: bool = True) -> SessionMessages:
+        """The session's history; loaded from session_store on first use (resume=False: start empty)."""
+        with self._lock:
+            history = self._sessions.get(sid)
+            if history is not None:
+                self._sessions.move_to_end(sid)
+                history.last_used = time.monotonic()
+        if history is None:
+            history = self._load(sid) if resume else SessionMessages(sid, _store().count(sid) + 1)
+            with self._lock:
+                history = self._sessions.setdefault(sid, history)
+        self.evict()
+        return history
+
+    def _load(self, sid: str) -> SessionMessages:
+        store = _store()
+        records = store.load_recent(sid, RESUME_PAGE)
+        history = SessionMessages(sid, records[0]["seq"] if records else store.count(sid) + 1)
+        history.prepend(records)
+        return history
+
+    def drop(self, sid: str) -> None:
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def evict(self) -> int:
+        """Drop idle sessions, then LRU ones while over the total cap. Returns how many."""
+        now = time.monotonic()
+        dropped = 0
+        with self._lock:
+            total = sum(h.held_bytes() for h in self._sessions.values())
+            for sid in list(self._sessions):
+                history = self._sessions[sid]
+                idle = now - history.last_used > self.idle_seconds
+                if not idle and total <= self.max_bytes:
+                    continue
+                if len(self._sessions) - dropped <= 1 and not idle:
+                    break       # never evict the session being served
+                del self._sessions[sid]
+                total -= history.held_bytes()
+                dropped += 1
+        if dropped:
+            _store().flush()
+            self.evicted += dropped
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {"sessions": len(sessions), "messages": sum(len(h) for h in sessions),
+                "bytes": sum(h.held_bytes() for h in sessions), "evicted": self.evicted}
+
+def _store():
+    from session_store import get_store
+    return get_store()
+
+_registry: Optional[MessageRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> MessageRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MessageRegistry()
+    return _registry
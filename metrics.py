@@ -0,0 +1,262 @@
+# metrics.py  (IN-PROCESS LLM / RERUN INSTRUMENTATION)
+from __future__ import annotations
+import os, json, time, bisect, threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# ==============================================================================
+# BUCKETS
+# ==============================================================================
+SECONDS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+TOKENS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+RATE = (10, 25, 50, 100, 200, 400, 800, 1600, 3200)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus semantics: cumulative `le` buckets, sum, count)."""
+    __slots__ = ("bounds", "counts", "sum", "count", "max")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)   # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, lo + (hi - lo) * (rank - seen) / c)
+            seen += c
+        return self.max
+
+class Registry:
+    """
+    Named counters and histograms, each split by label values. One lock guards all
+    updates; an observation is a bisect plus a few integer adds.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Tuple[Sequence[float], Dict[Labels, Histogram]]] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = SECONDS, **labels: Any) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            bounds, series = self._histograms.setdefault(name, (tuple(buckets), {}))
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(bounds)
+            hist.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ---------- views ----------
+    def summary(self, **match: Any) -> List[Dict[str, Any]]:
+        """One row per series whose labels include `match` (for a sidebar table)."""
+        want = {(k, str(v)) for k, v in match.items()}
+        rows = []
+        with self._lock:
+            for name, (_, series) in sorted(self._histograms.items()):
+                for key, h in series.items():
+                    if want <= set(key):
+                        rows.append({"metric": name, **dict(key), "count": h.count,
+                                     "mean": round(h.sum / h.count, 4) if h.count else 0.0,
+                                     "p50": round(h.quantile(0.5), 4), "p95": round(h.quantile(0.95), 4),
+                                     "max": round(h.max, 4)})
+            for name, series in sorted(self._counters.items()):
+                for key, v in series.items():
+                    if want <= set(key):
+                        rows.append({"metric": name, **dict(key), "count": v})
+        return rows
+
+    def to_json(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"ts": time.time(), "counters": {}, "histograms": {}}
+        with self._lock:
+            for name, series in self._counters.items():
+                out["counters"][name] = [{"labels": dict(k), "value": v} for k, v in series.items()]
+            for name, (bounds, series) in self._histograms.items():
+                out["histograms"][name] = [
+                    {"labels": dict(k), "count": h.count, "sum": h.sum, "max": h.max,
+                     "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                     "buckets": dict(zip([*map(str, bounds), "+Inf"], h.counts))}
+                    for k, h in series.items()]
+        return out
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+
+        def fmt(key: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+            pairs = list(key) + ([extra] if extra else [])
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                lines += [f"{name}{fmt(k)} {v:g}" for k, v in series.items()]
+            for name, (bounds, series) in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for k, h in series.items():
+                    cumulative = 0
+                    for bound, c in zip([*map(lambda b: f"{b:g}", bounds), "+Inf"], h.counts):
+                        cumulative += c
+                        lines.append(f"{name}_bucket{fmt(k, ('le', bound))} {cumulative}")
+                    lines.append(f"{name}_sum{fmt(k)} {h.sum:g}")
+                    lines.append(f"{name}_count{fmt(k)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REGISTRY = Registry()
+for _name, _help in (
+    ("llm_ttft_seconds", "Time from request start to the first streamed token"),
+    ("llm_latency_seconds", "Time from request start to the end of the response"),
+    ("llm_tokens_in", "Prompt tokens per request"),
+    ("llm_tokens_out", "Completion tokens per request"),
+    ("llm_tokens_per_second", "Completion tokens per second after the first token"),
+    ("llm_requests_total", "Chat completion requests by outcome"),
+    ("llm_retries_total", "Retried chat completion attempts"),
+    ("llm_parse_failures_total", "Model outputs that failed JSON parsing or alignment"),
+    ("llm_queue_wait_seconds", "Time a call waited in the rate-limit scheduler before being sent"),
+    ("llm_hedges_total", "Hedged calls by which attempt produced the first token"),
+    ("llm_failovers_total", "Calls moved to another model tier after an error or rate limit"),
+    ("hub_phase_seconds", "Wall time of a rerun phase"),
+):
+    REGISTRY.describe(_name, _help)
+
+# ==============================================================================
+# RECORDING HELPERS
+# ==============================================================================
+def record_llm_call(app: str, model: str, latency: float, ttft: Optional[float] = None,
+                    tokens_in: int = 0, tokens_out: int = 0, ok: bool = True) -> None:
+    """One finished chat completion (streamed or not)."""
+    r = REGISTRY
+    r.inc("llm_requests_total", app=app, model=model, status="ok" if ok else "error")
+    r.observe("llm_latency_seconds", latency, SECONDS, app=app, model=model)
+    if ttft is not None:
+        r.observe("llm_ttft_seconds", ttft, SECONDS, app=app, model=model)
+    if tokens_in:
+        r.observe("llm_tokens_in", tokens_in, TOKENS, app=app, model=model)
+    if tokens_out:
+        r.observe("llm_tokens_out", tokens_out, TOKENS, app=app, model=model)
+        gen_time = latency - (ttft or 0.0)
+        if gen_time > 0:
+            r.observe("llm_tokens_per_second", tokens_out / gen_time, RATE, app=app, model=model)
+
+def record_retry(app: str, reason: str) -> None:
+    REGISTRY.inc("llm_retries_total", app=app, reason=reason)
+
+def record_parse_failure(app: str, n: int = 1) -> None:
+    REGISTRY.inc("llm_parse_failures_total", n, app=app)
+
+def record_hedge(app: str, winner: str) -> None:
+    REGISTRY.inc("llm_hedges_total", app=app, winner=winner)
+
+def record_failover(app: str, from_model: str, to_model: str, reason: str) -> None:
+    REGISTRY.inc("llm_failovers_total", app=app, from_model=from_model, to_model=to_model, reason=reason)
+
+def record_queue_wait(app: str, priority: str, seconds: float) -> None:
+    REGISTRY.observe("llm_queue_wait_seconds", seconds, SECONDS, app=app, priority=priority)
+
+@contextmanager
+def phase(app: str, name: str) -> Iterator[None]:
+    """Time a block of a rerun (prompt build, LLM, render, export) into hub_phase_seconds."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe("hub_phase_seconds", time.perf_counter() - t, SECONDS, app=app, phase=name)
+
+# ==============================================================================
+# EXPORT — sidebar panel and optional scrape endpoint
+# ==============================================================================
+def render_panel(st, app: str) -> None:
+    """
+    Sidebar section: this app's series plus Prometheus/JSON downloads (st = streamlit).
+    The downloads serialize the whole registry, so they are built only while the
+    "Export" toggle is on; ordinary reruns skip that work.
+    """
+    st.subheader("⏱️ Metrics")
+    rows = REGISTRY.summary(app=app)
+    if rows:
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    else:
+        st.caption("No LLM calls yet.")
+    if not st.toggle("Export", key=f"metrics_export_{app}"):
+        return
+    st.download_button("Prometheus text", REGISTRY.to_prometheus().encode("utf-8"),
+                       file_name="metrics.prom", mime="text/plain", key=f"metrics_prom_{app}")
+    st.download_button("JSON", json.dumps(REGISTRY.to_json(), indent=2).encode("utf-8"),
+                       file_name="metrics.json", mime="application/json", key=f"metrics_json_{app}")
+
+_server_started = False
+
+def serve(port: Optional[int] = None) -> bool:
+    """
+    Serve /metrics (Prometheus) and /metrics.json on a daemon thread when
+    HUB_METRICS_PORT (or `port`) is set. Idempotent; returns True if serving.
+    """
+    global _server_started
+    port = port or int(os.getenv("HUB_METRICS_PORT", "0") or 0)
+    if _server_started or not port:
+        return _server_started
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, ctype = json.dumps(REGISTRY.to_json()).encode("utf-8"), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, ctype = REGISTRY.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    except OSError:
+        return False    # another Streamlit process on this host already serves it
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    _server_started = True
+    return True
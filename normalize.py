@@ -0,0 +1,222 @@
+# normalize.py  (TYPED, COLUMNAR EXTRACTOR OUTPUT)
+from __future__ import annotations
+import re, csv, json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# ==============================================================================
+# COLUMNS
+# ==============================================================================
+TEXT_FIELDS = ("product_name", "brand", "category", "model", "color", "material", "size", "description")
+RAW_FIELDS = ("price", "storage", "weight", "dimensions")        # kept verbatim next to the typed values
+TYPED_FIELDS = ("price_amount", "price_currency", "storage_gb", "weight_g", "dimensions_mm", "features")
+RECORD_COLUMNS = TEXT_FIELDS + RAW_FIELDS + TYPED_FIELDS
+BATCH_COLUMNS = ("row", "input", "error") + RECORD_COLUMNS       # one line per BatchRow
+LIST_COLUMNS = ("dimensions_mm", "features")
+FLOAT_COLUMNS = ("price_amount", "storage_gb", "weight_g")
+
+FORMATS = ("csv", "ndjson", "parquet")
+
+# ==============================================================================
+# FIELD PARSERS — memoized: catalog values repeat ("256GB", "$19.99"), so each
+# distinct string is parsed once per process, not once per row
+# ==============================================================================
+# keys are lowercase: _currency() looks tokens up lowercased
+CURRENCY_SYMBOLS = {"$": "USD", "us$": "USD", "€": "EUR", "£": "GBP", "₹": "INR", "¥": "JPY",
+                    "rs": "INR", "rs.": "INR", "dollars": "USD", "euros": "EUR"}
+_CUR = r"US\$|[$€£₹¥]|\b(?:USD|EUR|GBP|INR|JPY|CAD|AUD|dollars|euros)\b|\bRs\b\.?"
+_AMOUNT = r"\d[\d.,\s]*\d|\d"
+PRICE_RE = re.compile(rf"(?P<c1>{_CUR})?\s*(?P<amount>{_AMOUNT})\s*(?P<c2>{_CUR})?", re.IGNORECASE)
+STORAGE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(TB|GB|MB)\b", re.IGNORECASE)
+WEIGHT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(kg|kilograms?|g|grams?|lbs?|pounds?|oz|ounces?)\b", re.IGNORECASE)
+DIM_SPLIT_RE = re.compile(r"\s*(?:x|×|\*|\bby\b)\s*", re.IGNORECASE)
+DIM_PART_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(mm|cm|m|in(?:ch(?:es)?)?|\"|″)?(?![a-z])", re.IGNORECASE)
+
+STORAGE_GB = {"tb": 1000.0, "gb": 1.0, "mb": 0.001}             # vendor (decimal) units
+WEIGHT_G = {"kg": 1000.0, "kilogram": 1000.0, "kilograms": 1000.0, "g": 1.0, "gram": 1.0, "grams": 1.0,
+            "lb": 453.59237, "lbs": 453.59237, "pound": 453.59237, "pounds": 453.59237,
+            "oz": 28.349523125, "ounce": 28.349523125, "ounces": 28.349523125}
+LENGTH_MM = {"mm": 1.0, "cm": 10.0, "m": 1000.0, "in": 25.4, "inch": 25.4, "inches": 25.4, '"': 25.4, "″": 25.4}
+
+def _number(text: str) -> Optional[float]:
+    """'1,199.00' / '1.199,00' / '1 199' → 1199.0; the last separator followed by 1-2 digits is decimal."""
+    t = text.replace(" ", "").replace("\u00a0", "")
+    last = max(t.rfind(","), t.rfind("."))
+    if last >= 0 and 1 <= len(t) - last - 1 <= 2:
+        whole, frac = t[:last], t[last + 1:]
+    else:
+        whole, frac = t, ""
+    whole = whole.replace(",", "").replace(".", "")
+    try:
+        return float(f"{whole}.{frac}" if frac else whole)
+    except ValueError:
+        return None
+
+def _currency(token: Optional[str]) -> str:
+    if not token:
+        return ""
+    return CURRENCY_SYMBOLS.get(token.lower(), token.upper())
+
+@lru_cache(maxsize=65536)
+def parse_price(text: str) -> Tuple[Optional[float], str]:
+    """'$1,199.99' → (1199.99, 'USD'); currency is '' when the text names none."""
+    m = PRICE_RE.search(text or "")
+    if not m:
+        return None, ""
+    return _number(m.group("amount")), _currency(m.group("c1") or m.group("c2"))
+
+@lru_cache(maxsize=65536)
+def parse_storage_gb(text: str) -> Optional[float]:
+    m = STORAGE_RE.search(text or "")
+    return _number(m.group(1)) * STORAGE_GB[m.group(2).lower()] if m else None
+
+@lru_cache(maxsize=65536)
+def parse_weight_g(text: str) -> Optional[float]:
+    m = WEIGHT_RE.search(text or "")
+    if not m:
+        return None
+    return round(_number(m.group(1)) * WEIGHT_G[m.group(2).lower()], 3)
+
+@lru_cache(maxsize=65536)
+def parse_dimensions_mm(text: str) -> Tuple[float, ...]:
+    """'146.6 x 70.6 x 8.25 mm' → (146.6, 70.6, 8.25). A unit applies to the numbers before it."""
+    found = []
+    for part in DIM_SPLIT_RE.split(text or "")[:3]:
+        m = DIM_PART_RE.search(part)
+        if m:
+            found.append(m.groups())
+    if not found:
+        return ()
+    out, unit = [], "mm"
+    for num, u in reversed(found):
+        if u:
+            unit = u.lower()
+        out.append(round(_number(num) * LENGTH_MM.get(unit, 1.0), 3))
+    return tuple(reversed(out))
+
+def _features(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(v) for v in value if str(v).strip()]
+    if isinstance(value, str) and value.strip():
+        return [p.strip() for p in re.split(r"[;\n]", value) if p.strip()]
+    return []
+
+def _text(value: Any) -> str:
+    return value if isinstance(value, str) else "" if value is None else str(value)
+
+# ==============================================================================
+# BATCH NORMALIZATION (column at a time)
+# ==============================================================================
+def normalize_batch(records: Sequence[Optional[Dict[str, Any]]]) -> Dict[str, List[Any]]:
+    """
+    Extractor dicts (None for failed rows) → columns. Each column is built in one pass,
+    with each distinct raw value parsed once by the memoized parsers above.
+    """
+    recs = [r or {} for r in records]
+    cols: Dict[str, List[Any]] = {k: [_text(r.get(k)) for r in recs] for k in TEXT_FIELDS + RAW_FIELDS}
+    prices = [parse_price(v) for v in cols["price"]]
+    cols["price_amount"] = [p[0] for p in prices]
+    cols["price_currency"] = [p[1] for p in prices]
+    cols["storage_gb"] = [parse_storage_gb(v) for v in cols["storage"]]
+    cols["weight_g"] = [parse_weight_g(v) for v in cols["weight"]]
+    cols["dimensions_mm"] = [list(parse_dimensions_mm(v)) for v in cols["dimensions"]]
+    cols["features"] = [_features(r.get("features")) for r in recs]
+    return cols
+
+def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """One extractor dict → typed dict (same columns as a batch)."""
+    cols = normalize_batch([record])
+    return {k: cols[k][0] for k in RECORD_COLUMNS}
+
+def normalize_rows(rows: Sequence[tuple]) -> Dict[str, List[Any]]:
+    """BatchRow tuples (idx, input, data, error) → BATCH_COLUMNS."""
+    cols = normalize_batch([r[2] for r in rows])
+    cols["row"] = [r[0] for r in rows]
+    cols["input"] = [r[1] for r in rows]
+    cols["error"] = [r[3] or "" for r in rows]
+    return cols
+
+# ==============================================================================
+# STREAMING COLUMNAR WRITERS
+# ==============================================================================
+def have_parquet() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class CsvSink:
+    """Text CSV; list columns are JSON-encoded cells. header=False when appending."""
+    def __init__(self, fh, columns: Sequence[str] = BATCH_COLUMNS, header: bool = True):
+        self.fh, self.columns = fh, tuple(columns)
+        self._writer = csv.writer(fh)
+        if header:
+            self._writer.writerow(self.columns)
+
+    def write(self, cols: Dict[str, List[Any]]) -> None:
+        data = [[json.dumps(v, ensure_ascii=False) for v in cols[c]] if c in LIST_COLUMNS
+                else ["" if v is None else v for v in cols[c]] for c in self.columns]
+        self._writer.writerows(zip(*data))
+
+    def close(self) -> None:
+        self.fh.flush()
+
+class NdjsonSink:
+    """One JSON object per row; numbers stay numbers, lists stay lists."""
+    def __init__(self, fh, columns: Sequence[str] = BATCH_COLUMNS):
+        self.fh, self.columns = fh, tuple(columns)
+
+    def write(self, cols: Dict[str, List[Any]]) -> None:
+        keys = self.columns
+        self.fh.writelines(json.dumps(dict(zip(keys, values)), ensure_ascii=False) + "\n"
+                           for values in zip(*(cols[k] for k in keys)))
+
+    def close(self) -> None:
+        self.fh.flush()
+
+class ParquetSink:
+    """One Parquet row group per write() (binary file handle or path); requires pyarrow."""
+    def __init__(self, fh, columns: Sequence[str] = BATCH_COLUMNS):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa, self.columns = pa, tuple(columns)
+        types = {"row": pa.int64(), "dimensions_mm": pa.list_(pa.float64()), "features": pa.list_(pa.string())}
+        types.update({c: pa.float64() for c in FLOAT_COLUMNS})
+        self.schema = pa.schema([(c, types.get(c, pa.string())) for c in self.columns])
+        self._writer = pq.ParquetWriter(fh, self.schema, compression="zstd")
+
+    def write(self, cols: Dict[str, List[Any]]) -> None:
+        self._writer.write_table(self.pa.table({c: cols[c] for c in self.columns}, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+def open_sink(fh, fmt: str, columns: Sequence[str] = BATCH_COLUMNS, header: bool = True):
+    """Writer for fmt ('csv' | 'ndjson' | 'parquet'); parquet needs a binary handle."""
+    if fmt == "parquet":
+        return ParquetSink(fh, columns)
+    if fmt == "csv":
+        return CsvSink(fh, columns, header=header)
+    if fmt == "ndjson":
+        return NdjsonSink(fh, columns)
+    raise ValueError(f"Unknown output format {fmt!r} (expected one of {', '.join(FORMATS)}).")
+
+def iter_batches(rows: Iterable[tuple], batch_size: int = 1000) -> Iterator[Dict[str, List[Any]]]:
+    """Normalized column batches from a stream of BatchRows; only one batch is held at a time."""
+    batch: List[tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield normalize_rows(batch)
+            batch = []
+    if batch:
+        yield normalize_rows(batch)
+
+def write_rows(rows: Iterable[tuple], sink, batch_size: int = 1000) -> int:
+    """Stream BatchRows through normalization into a sink. Returns the row count."""
+    n = 0
+    for cols in iter_batches(rows, batch_size):
+        sink.write(cols)
+        n += len(cols["row"])
+    return n
@@ -1,36 +1,220 @@
 # prodapp.py  (PRODUCT → JSON EXTRACTOR)
 from __future__ import annotations
-import os, re, json
-from typing import Dict, Any
+import os, io, csv, json, time
+from typing import Dict, Any, List, Tuple
 import streamlit as st
 from dotenv import load_dotenv
 
-# Import your Groq-backed extractor
-# prodbot.py must expose: get_response(user_input: str) -> str
-from prodbot import get_response  # uses your SYSTEM_PROMPT for JSON-only output
+# Model calls go through the backend: in-process prodbot, or service.py when HUB_BACKEND_URL is set
+from backend import get_backend
+from prodbot import PACK_MAX
+from prodbot import coerce_json  # noqa: F401  (re-export: it lived here before prodbot)
+from prodbatch import (BatchRow, DEFAULT_CONCURRENCY, MAX_CONCURRENCY, extract_one,
+                       iter_descriptions, iter_extract)
+from prodbot import cache as response_cache
+from prodrules import STATS as fast_path_stats
+from session_store import get_store, resume_or_create
+import normalize
+import metrics
 
-RAW_JSON_PATTERN = re.compile(r"\{[\s\S]*\}$", re.MULTILINE)  # greedy JSON object at end
+def _result_view(parsed: Dict[str, Any]) -> Tuple[str, bytes, Dict[str, Any]]:
+    """
+    (pretty JSON, its UTF-8 bytes, typed fields) for the current result, built once per
+    result: st.json, st.code and the download all reuse the same serialization.
+    """
+    view = st.session_state.get("last_json_view")
+    if view is None or view[0] is not parsed:
+        text = json.dumps(parsed, ensure_ascii=False, indent=2)
+        view = st.session_state["last_json_view"] = (parsed, text, text.encode("utf-8"),
+                                                     normalize.normalize_record(parsed))
+    return view[1:]
+
+@st.fragment
+def _result_panel():
+    """The single-extraction result. A fragment: downloading reruns only this panel."""
+    parsed = st.session_state.get("last_json")
+    if parsed is None:
+        return
+    with metrics.phase("extractor", "render_result"):
+        text, data, typed = _result_view(parsed)
+
+        st.subheader("Result")
+        st.json(text, expanded=True)     # a str is taken as already-serialized JSON
+
+        st.caption("Raw JSON string")
+        st.code(text, language="json")
+
+        st.download_button(
+            "⬇️ Download JSON",
+            data=data,
+            file_name="product.json",   # file contains ONLY the JSON
+            mime="application/json",
+            use_container_width=True,
+        )
+
+        with st.expander("Typed fields (price amount/currency, storage GB, weight g, dimensions mm)"):
+            st.json(typed, expanded=True)
+
+# ────────────────────────────────────────────────────────────────────────────
+# BATCH HELPERS (reading + extraction live in prodbatch, shared with prodcli)
+# ────────────────────────────────────────────────────────────────────────────
+def batch_download_bytes(rows: List[BatchRow]) -> bytes:
+    """All batch rows as JSONL, in input order, one object per row."""
+    lines = []
+    for idx, desc, data, err in sorted(rows, key=lambda r: r[0]):
+        lines.append(json.dumps({"row": idx, "input": desc, "result": data, "error": err},
+                                ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+EXPORT_FORMATS = {   # label -> (normalize format or None for raw JSONL, file name, mime)
+    "JSONL (raw)": (None, "products.jsonl", "application/x-ndjson"),
+    "CSV (typed columns)": ("csv", "products.csv", "text/csv"),
+    "NDJSON (typed columns)": ("ndjson", "products.ndjson", "application/x-ndjson"),
+    "Parquet (typed columns)": ("parquet", "products.parquet", "application/vnd.apache.parquet"),
+}
+
+def normalized_download_bytes(rows: List[BatchRow], fmt: str) -> bytes:
+    """Batch rows normalized (typed price/storage/weight/dimensions) as csv, ndjson or parquet."""
+    ordered = sorted(rows, key=lambda r: r[0])
+    if fmt == "parquet":
+        buf = io.BytesIO()
+        sink = normalize.open_sink(buf, fmt)
+        normalize.write_rows(ordered, sink)
+        sink.close()
+        return buf.getvalue()
+    text = io.StringIO(newline="")
+    sink = normalize.open_sink(text, fmt)
+    normalize.write_rows(ordered, sink)
+    sink.close()
+    return text.getvalue().encode("utf-8")
+
+def merge_report_bytes(merges: List[Dict[str, Any]]) -> bytes:
+    """Audit of merged rows as CSV: row, duplicate_of, similarity."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=["row", "duplicate_of", "similarity"])
+    writer.writeheader()
+    writer.writerows(sorted(merges, key=lambda m: m["row"]))
+    return buf.getvalue().encode("utf-8")
+
+def _batch_table(rows: List[BatchRow]) -> List[Dict[str, Any]]:
+    table = []
+    for idx, desc, data, err in sorted(rows, key=lambda r: r[0]):
+        data = data or {}
+        table.append({
+            "row": idx,
+            "status": "error" if err else "ok",
+            "product_name": data.get("product_name", ""),
+            "brand": data.get("brand", ""),
+            "price": data.get("price", ""),
+            "input": desc[:80],
+            "error": err or "",
+        })
+    return table
+
+def _render_batch(fast_path: bool = True):
+    st.caption("Upload a CSV (with a `description` column) or JSONL file. Rows are extracted concurrently.")
+    uploaded = st.file_uploader("Descriptions file", type=["csv", "jsonl", "json", "txt"], key="batch_file")
+    concurrency = st.slider("Concurrent requests", 1, MAX_CONCURRENCY, DEFAULT_CONCURRENCY, key="batch_concurrency")
+    pack = st.checkbox(f"Pack up to {PACK_MAX} descriptions per request", value=True, key="batch_pack",
+                       help="Sends the system prompt once per pack instead of once per row; "
+                            "rows the model garbles are retried one by one.")
+    col_dd, col_thr = st.columns([1, 1])
+    dedupe_on = col_dd.checkbox("Merge near-duplicates", value=True, key="batch_dedupe",
+                                help="Extract one row per cluster of near-identical descriptions "
+                                     "(whitespace, punctuation, seller boilerplate) and reuse its result.")
+    threshold = col_thr.slider("Similarity threshold", 0.70, 1.00, 0.85, 0.01, key="batch_dedupe_threshold",
+                               disabled=not dedupe_on)
+
+    col_run, col_clear = st.columns([1, 1])
+    run = col_run.button("Extract batch", type="primary", use_container_width=True, disabled=uploaded is None)
+    if col_clear.button("Clear batch", use_container_width=True):
+        for key in ("batch_rows", "batch_merges", "batch_view"):
+            st.session_state.pop(key, None)
+        st.rerun()
+
+    if run and uploaded is not None:
+        fmt = "csv" if uploaded.name.lower().endswith(".csv") else "jsonl"
+        try:
+            descriptions = list(iter_descriptions(io.StringIO(uploaded.getvalue().decode("utf-8-sig")), fmt))
+        except Exception as e:
+            st.error(f"Could not read {uploaded.name}: {e}")
+            return
+        if not descriptions:
+            st.error("No descriptions found in the file.")
+            return
+
+        merges: List[Dict[str, Any]] = []
+        index = None
+        if dedupe_on:
+            from dedupe import DedupeIndex   # numpy; only needed when merging
+            index = DedupeIndex(threshold=threshold, audit=lambda row, rep, sim: merges.append(
+                {"row": row, "duplicate_of": rep, "similarity": round(sim, 3)}))
+
+        rows: List[BatchRow] = []
+        total = len(descriptions)
+        progress = st.progress(0.0, text=f"0 / {total}")
+        table = st.empty()
+        last_draw = 0.0
+        with metrics.phase("extractor", "batch"):
+            for row in iter_extract(descriptions, concurrency=concurrency, fast_path=fast_path, pack=pack,
+                                    dedupe=index, session=st.session_state.get("session_id")):
+                rows.append(row)
+                done = len(rows)
+                progress.progress(done / total, text=f"{done} / {total}")
+                # Redraw the table at most a few times per second; it is O(rows) each time
+                now = time.monotonic()
+                if now - last_draw > 0.5 or done == total:
+                    table.dataframe(_batch_table(rows), use_container_width=True, hide_index=True)
+                    last_draw = now
+        st.session_state["batch_rows"] = rows
+        st.session_state["batch_merges"] = merges
+        st.session_state.pop("batch_view", None)
+        table.empty()
+        progress.empty()
 
-def coerce_json(text: str) -> Dict[str, Any]:
+    _batch_results()
+
+@st.fragment
+def _batch_results():
     """
-    Try strict JSON parse. If vendor added stray text, attempt to extract the last
-    JSON object from response. Raises ValueError on failure.
+    Table + downloads of the last batch. A fragment, so picking a format or downloading
+    reruns only this panel; the table and each export are built once per batch (batch_view).
     """
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-    m = RAW_JSON_PATTERN.search(text.strip())
-    if m:
-        return json.loads(m.group(0))
-    s = text.strip()
-    first = s.find("{"); last = s.rfind("}")
-    if first != -1 and last != -1 and last > first:
-        return json.loads(s[first:last + 1])
-    raise ValueError("Model did not return valid JSON.")
-
-def download_bytes(obj: Dict[str, Any]) -> bytes:
-    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    rows = st.session_state.get("batch_rows")
+    if not rows:
+        return
+    view = st.session_state.setdefault("batch_view", {})    # "table" / format label -> built value
+    if "table" not in view:
+        view["table"] = _batch_table(rows)
+    failed = sum(1 for r in rows if r[3])
+    st.subheader("Batch results")
+    st.caption(f"{len(rows)} rows · {len(rows) - failed} ok · {failed} failed")
+    st.dataframe(view["table"], use_container_width=True, hide_index=True)
+    labels = [k for k, v in EXPORT_FORMATS.items() if v[0] != "parquet" or normalize.have_parquet()]
+    label = st.selectbox("Download format", labels, key="batch_export_format")
+    fmt, file_name, mime = EXPORT_FORMATS[label]
+    if label not in view:
+        view[label] = batch_download_bytes(rows) if fmt is None else normalized_download_bytes(rows, fmt)
+    st.download_button(
+        f"⬇️ Download results ({label.split(' ')[0]})",
+        data=view[label],
+        file_name=file_name,
+        mime=mime,
+        use_container_width=True,
+    )
+    merges = st.session_state.get("batch_merges") or []
+    if merges:
+        with st.expander(f"Merged near-duplicates ({len(merges)} rows reused a result)"):
+            st.dataframe(merges, use_container_width=True, hide_index=True)
+            if "merges" not in view:
+                view["merges"] = merge_report_bytes(merges)
+            st.download_button(
+                "⬇️ Download merge report (CSV)",
+                data=view["merges"],
+                file_name="merged_rows.csv",
+                mime="text/csv",
+                use_container_width=True,
+            )
 
 # ======= PUBLIC RENDER FUNCTION =======
 def render_extractor():
@@ -49,6 +233,17 @@ def render_extractor():
     except Exception:
         pass
 
+    # ────────────────────────────────────────────────────────────────────────────
+    # SESSION (persisted; the id lives in the URL so reloads/replicas resume it)
+    # ────────────────────────────────────────────────────────────────────────────
+    store = get_store()
+    if "session_id" not in st.session_state:
+        sid, resumed = resume_or_create("extractor", st.query_params)
+        st.session_state.session_id = sid
+        last = store.load_recent(sid, 1) if resumed else []
+        if last and last[0].get("kind") == "result":
+            st.session_state["last_json"] = last[0]["result"]
+
     # ────────────────────────────────────────────────────────────────────────────
     # SIDEBAR (debug)
     # ────────────────────────────────────────────────────────────────────────────
@@ -58,6 +253,12 @@ def render_extractor():
         st.write("CWD:", os.getcwd())
         st.write("GROQ_API_KEY present:", bool(os.getenv("GROQ_API_KEY")))
         st.caption("Ensure prodbot.py defines SYSTEM_PROMPT and get_response().")
+        st.write("Backend:", get_backend().name)
+        fast_path = st.checkbox("Local fast path", value=True, key="fast_path",
+                                help="Fill brand/price/storage/… with local rules; call the model only for uncertain fields.")
+        st.write("Fast path:", fast_path_stats.snapshot())
+        if response_cache is not None:
+            st.write("Response cache:", response_cache.stats())
 
     # ────────────────────────────────────────────────────────────────────────────
     # HEADER
@@ -75,55 +276,54 @@ def render_extractor():
     )
     st.divider()
 
-    # ────────────────────────────────────────────────────────────────────────────
-    # INPUT AREA
-    # ────────────────────────────────────────────────────────────────────────────
-    sample = "Apple iPhone 15 Pro Max – 256GB, Titanium, 48MP camera, A17 Pro chip. Price: $1199."
-    desc = st.text_area("Product description", value="", height=180, placeholder=sample)
+    tab_single, tab_batch = st.tabs(["Single", "Batch (CSV / JSONL)"])
 
-    col_run, col_clear = st.columns([1, 1])
-    run = col_run.button("Extract JSON", type="primary", use_container_width=True)
-    if col_clear.button("Clear", use_container_width=True):
-        st.session_state.pop("last_json", None)
-        st.rerun()
+    with tab_single:
+        # ────────────────────────────────────────────────────────────────────────────
+        # INPUT AREA
+        # ────────────────────────────────────────────────────────────────────────────
+        sample = "Apple iPhone 15 Pro Max – 256GB, Titanium, 48MP camera, A17 Pro chip. Price: $1199."
+        desc = st.text_area("Product description", value="", height=180, placeholder=sample)
 
-    st.divider()
+        col_run, col_clear = st.columns([1, 1])
+        run = col_run.button("Extract JSON", type="primary", use_container_width=True)
+        if col_clear.button("Clear", use_container_width=True):
+            st.session_state.pop("last_json", None)
+            st.session_state.pop("last_json_view", None)
+            store.append(st.session_state.session_id, {"kind": "clear"})
+            store.flush()
+            st.rerun()
 
-    # ────────────────────────────────────────────────────────────────────────────
-    # PROCESS
-    # ────────────────────────────────────────────────────────────────────────────
-    if run:
-        if not desc.strip():
-            st.error("Please paste a product description.")
-        else:
-            with st.spinner("Extracting…"):
-                try:
-                    raw = get_response(desc)   # model returns text; expected JSON per SYSTEM_PROMPT
-                    data = coerce_json(raw)
-                    st.session_state["last_json"] = data
-                except Exception as e:
-                    st.error(f"Failed to parse JSON: {e}")
-                    st.stop()
+        st.divider()
 
-    # ────────────────────────────────────────────────────────────────────────────
-    # OUTPUT
-    # ────────────────────────────────────────────────────────────────────────────
-    if "last_json" in st.session_state:
-        parsed = st.session_state["last_json"]
+        # ────────────────────────────────────────────────────────────────────────────
+        # PROCESS
+        # ────────────────────────────────────────────────────────────────────────────
+        if run:
+            if not desc.strip():
+                st.error("Please paste a product description.")
+            else:
+                with st.spinner("Extracting…"), metrics.phase("extractor", "extract"):
+                    try:
+                        data = extract_one(desc, fast_path, st.session_state.session_id)
+                        st.session_state["last_json"] = data
+                        store.append(st.session_state.session_id, {"kind": "result", "input": desc, "result": data})
+                        store.flush()
+                    except Exception as e:
+                        st.session_state.pop("last_json", None)
+                        st.error(f"Failed to parse JSON: {e}")
 
-        st.subheader("Result")
-        st.json(parsed, expanded=True)
+        # ────────────────────────────────────────────────────────────────────────────
+        # OUTPUT
+        # ────────────────────────────────────────────────────────────────────────────
+        _result_panel()
 
-        st.caption("Raw JSON string")
-        st.code(json.dumps(parsed, ensure_ascii=False, indent=2), language="json")
+    with tab_batch:
+        _render_batch(fast_path)
 
-        st.download_button(
-            "⬇️ Download JSON",
-            data=download_bytes(parsed),
-            file_name="product.json",   # file contains ONLY the JSON
-            mime="application/json",
-            use_container_width=True,
-        )
+    # Drawn last so it includes this rerun's timings
+    with st.sidebar:
+        metrics.render_panel(st, "extractor")
 
     # ────────────────────────────────────────────────────────────────────────────
     # FOOTER
@@ -0,0 +1,173 @@
+# prodbatch.py  (BATCH EXTRACTION — NO UI; SHARED BY prodapp2 AND prodcli)
+from __future__ import annotations
+import csv, json
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+# Model calls go through the backend: in-process prodbot, or service.py when HUB_BACKEND_URL is set
+from backend import get_backend
+from prodbot import iter_packs, PACK_MAX
+
+DESCRIPTION_COLUMNS = ("description", "product_description", "desc", "text")
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+
+# (row index, input description, parsed JSON or None, error message or None)
+BatchRow = Tuple[int, str, Optional[Dict[str, Any]], Optional[str]]
+
+def extract_one(desc: str, fast_path: bool = True, session: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One description → parsed JSON dict. Raises on API or parse errors.
+    fast_path: fill easy fields locally (prodrules) and ask the model only for the rest.
+    """
+    return get_backend().extract(desc, fast_path=fast_path, session=session)
+
+def description_column(header: List[str]) -> Optional[int]:
+    """Index of the first DESCRIPTION_COLUMNS name in a CSV header row, or None (no header)."""
+    lowered = [h.strip().lower() for h in header]
+    return next((lowered.index(c) for c in DESCRIPTION_COLUMNS if c in lowered), None)
+
+def iter_descriptions(fh, fmt: str) -> Iterator[str]:
+    """
+    Yield descriptions from a text file handle, one row at a time.
+    fmt="csv": uses the first matching DESCRIPTION_COLUMNS header, else the first column.
+    fmt="jsonl": each line is a JSON string or an object with a description key.
+    fmt="lines": each non-blank line is one description.
+    Blank rows are skipped.
+    """
+    if fmt == "csv":
+        reader = csv.reader(fh)
+        header = next(reader, None)
+        if header is None:
+            return
+        col = description_column(header)
+        if col is None:
+            # No known header: treat the first row as data, first column as description
+            col = 0
+            if header and header[0].strip():
+                yield header[0].strip()
+        for row in reader:
+            if len(row) > col and row[col].strip():
+                yield row[col].strip()
+        return
+
+    for line in fh:
+        line = line.strip()
+        if not line:
+            continue
+        if fmt == "lines":
+            yield line
+            continue
+        obj = json.loads(line)
+        if isinstance(obj, dict):
+            obj = next((obj[k] for k in DESCRIPTION_COLUMNS if k in obj), "")
+        if isinstance(obj, str) and obj.strip():
+            yield obj.strip()
+
+def _error_text(e: BaseException) -> str:
+    return str(e) or e.__class__.__name__
+
+def _extract_unit(descs: List[str], fast_path: bool, pack: bool, session: Optional[str]) -> List[Any]:
+    """One work unit: a single row, or a pack sent as one request (per-item results)."""
+    return get_backend().extract_batch(descs, fast_path=fast_path, pack=pack, session=session)
+
+def _unit_rows(unit: List[Tuple[int, str]], fut) -> List[BatchRow]:
+    try:
+        results = fut.result()
+    except Exception as e:
+        return [(idx, desc, None, _error_text(e)) for idx, desc in unit]
+    return [(idx, desc, None, _error_text(r)) if isinstance(r, Exception) else (idx, desc, r, None)
+            for (idx, desc), r in zip(unit, results)]
+
+def _follower_row(idx: int, desc: str, rep: BatchRow) -> BatchRow:
+    """A near-duplicate reuses its representative's result (or error)."""
+    return idx, desc, dict(rep[2]) if rep[2] is not None else None, rep[3]
+
+def iter_extract(descriptions: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY,
+                 ordered: bool = False, fast_path: bool = True, pack: bool = False,
+                 dedupe=None, session: Optional[str] = None) -> Iterator[BatchRow]:
+    """
+    Run extract_one over descriptions on a bounded thread pool.
+    pack=True sends K descriptions per request instead (prodbot.extract_many; K adapts
+    to description length, up to PACK_MAX).
+    dedupe: a dedupe.DedupeIndex; only one row per near-duplicate cluster is extracted
+    and the others reuse its result (merges are reported to the index's audit hook).
+    Yields BatchRow tuples as rows finish (or in input order when ordered=True).
+    At most 2×concurrency work units are held at once, so descriptions may be a lazy stream.
+    Per-row failures are reported in the error slot instead of aborting the batch.
+    Model calls run in the scheduler's batch lane under `session`: they yield to chat
+    turns, and when the rate limit is reached the workers block, so this generator stops
+    reading input (backpressure) instead of queueing unbounded work. With a remote backend
+    each work unit is one /v1/extract/batch request and the service applies the same lanes.
+    """
+    concurrency = max(1, int(concurrency))
+    window = concurrency * 2 * (PACK_MAX if pack else 1)   # rows
+    source = enumerate(descriptions)
+    # (idx, desc, representative idx); rows with rep == idx are the ones to extract
+    if dedupe is not None:
+        items = ((idx, desc, dedupe.add(idx, desc)[0]) for idx, desc in source)
+    else:
+        items = ((idx, desc, idx) for idx, desc in source)
+    units = (iter_packs(items, text=lambda it: it[1] if it[2] == it[0] else "") if pack
+             else ([it] for it in items))
+    pending = {}        # future -> [(idx, desc), ...] representatives being extracted
+    in_flight = 0       # rows in pending
+    waiting = {}        # representative idx -> [(idx, desc), ...] duplicates parked on it
+    parked = 0
+    finished = {}       # ordered mode only: idx -> BatchRow waiting for its turn
+    ready: List[BatchRow] = []
+    next_idx = 0
+    exhausted = False
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="extract")
+    try:
+        while True:
+            while not exhausted and in_flight + parked + len(finished) < window:
+                try:
+                    unit = next(units)
+                except StopIteration:
+                    exhausted = True
+                    break
+                reps = [(idx, desc) for idx, desc, rep in unit if rep == idx]
+                for idx, _ in reps:
+                    waiting[idx] = []
+                for idx, desc, rep in unit:
+                    if rep == idx:
+                        continue
+                    if rep in waiting:
+                        waiting[rep].append((idx, desc))
+                        parked += 1
+                    else:
+                        done_rep = dedupe.result(rep)
+                        ready.append(_follower_row(idx, desc, done_rep) if done_rep is not None else
+                                     (idx, desc, None, f"duplicate of row {rep}, whose result was evicted"))
+                if reps:
+                    pending[pool.submit(_extract_unit, [d for _, d in reps], fast_path, pack, session)] = reps
+                    in_flight += len(reps)
+            if not pending and not finished and not ready:
+                break
+
+            if pending and not ready:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    reps = pending.pop(fut)
+                    in_flight -= len(reps)
+                    for row in _unit_rows(reps, fut):
+                        ready.append(row)
+                        if dedupe is not None:
+                            dedupe.set_result(row[0], row)
+                        followers = waiting.pop(row[0], ())
+                        parked -= len(followers)
+                        ready.extend(_follower_row(idx, desc, row) for idx, desc in followers)
+
+            for row in ready:
+                if ordered:
+                    finished[row[0]] = row
+                else:
+                    yield row
+            ready = []
+            while next_idx in finished:
+                yield finished.pop(next_idx)
+                next_idx += 1
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,160 @@
+# prodcache.py  (DISK CACHE FOR EXTRACTOR RESPONSES)
+from __future__ import annotations
+import os, time, json, sqlite3, hashlib, threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_PATH = os.path.join(".cache", "prodbot.sqlite3")
+
+def cache_key(*parts: Any) -> str:
+    """Stable content hash of the given parts (strings, numbers, dicts)."""
+    blob = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite-backed key → text cache with LRU eviction.
+
+    - Entries older than `ttl` seconds (by creation) are treated as misses and purged.
+    - When the table exceeds `max_entries` rows or `max_bytes` of values, the least
+      recently read entries are evicted.
+    - get_or_compute() is single-flight: concurrent callers for the same key (e.g. two
+      Streamlit sessions) wait for one upstream call instead of each making their own.
+    The file is opened in WAL mode, so several processes on one host can share it.
+    """
+    def __init__(self, path: str = DEFAULT_PATH, max_entries: int = 50_000,
+                 max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = 30 * 86400,
+                 evict_every: int = 100):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evict_every = max(1, evict_every)
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0         # callers served by another caller's in-flight request
+        self.evictions = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+
+    # ---------- basic ops ----------
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._get_locked(key, time.time())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def _get_locked(self, key: str, now: float) -> Optional[str]:
+        row = self._db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            row = None
+        if row is None:
+            return None
+        self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                self._evict_locked(now)
+
+    def _evict_locked(self, now: float) -> None:
+        db = self._db
+        if self.ttl is not None:
+            self.evictions += db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,)).rowcount
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count > self.max_entries:
+            self.evictions += db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            ).rowcount
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.max_bytes:
+            # Drop the coldest 5% (at least one row) until we are under the byte cap
+            n = max(1, db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] // 20)
+            self.evictions += db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)", (n,)
+            ).rowcount
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    # ---------- single-flight ----------
+    def get_or_compute(self, key: str, compute: Callable[[], str],
+                       cacheable: Callable[[str], bool] = bool) -> str:
+        """
+        Return the cached value for key, or call compute() once and cache the result.
+        Exceptions are propagated to every waiting caller and never cached; results
+        for which cacheable(result) is False are returned but not stored.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                # A leader may have stored the value and left _inflight since our get() missed
+                cached = self._get_locked(key, time.time())
+                if cached is not None:
+                    self.shared += 1
+                    return cached
+                fut = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return fut.result()
+
+        try:
+            value = compute()
+            if cacheable(value):
+                self.put(key, value)
+            fut.set_result(value)
+            return value
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    # ---------- introspection ----------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "shared_inflight": self.shared,
+            "evictions": self.evictions,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
@@ -0,0 +1,254 @@
+# prodcli.py  (HEADLESS PRODUCT → JSON EXTRACTION)
+"""
+Stream product descriptions through prodbot.extract (local fast path, then the model
+for whatever it could not settle) and write one JSON object per line, or typed
+columns (--to csv / ndjson / parquet, written in batches).
+
+    python prodcli.py catalog.csv --checkpoint catalog.ckpt >> products.jsonl
+    cat descriptions.txt | python prodcli.py - --format lines > products.jsonl
+    python prodcli.py catalog.csv --pack -o products.jsonl   # K descriptions per request
+    python prodcli.py catalog.csv --dedupe 0.85 --dedupe-report merged.csv -o products.jsonl
+    python prodcli.py catalog.csv --to parquet -o products.parquet
+
+Input is read row by row and at most 2×concurrency rows are in flight, so memory
+stays flat regardless of input size. With --checkpoint, the byte offset of the last
+written row is saved periodically; re-running the same command resumes from there.
+Rows written after the last checkpoint may be emitted again on resume (at-least-once).
+With --dedupe, near-duplicate rows reuse the result of the first row of their cluster
+(bounded index; it starts empty again on resume).
+"""
+from __future__ import annotations
+import os, sys, csv, json, time, argparse
+from typing import Dict, Any, Iterator, List, Optional
+
+from prodbatch import iter_descriptions, iter_extract, description_column, DEFAULT_CONCURRENCY, BatchRow
+from prodrules import STATS as fast_path_stats
+
+FORMATS = ("csv", "jsonl", "lines")
+
+class _OffsetLines:
+    """
+    Iterate decoded lines of a binary stream while tracking the byte offset
+    just past the last line handed out. `prefix` lines are replayed first
+    without moving the offset (used to re-feed a CSV header on resume).
+    """
+    def __init__(self, raw, start: int = 0, prefix: Optional[list] = None):
+        self.raw = raw
+        self.offset = start
+        self.prefix = list(prefix or [])
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.prefix:
+            return self.prefix.pop(0)
+        line = self.raw.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode("utf-8-sig" if self.offset == len(line) else "utf-8")
+
+def _guess_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    return "lines"
+
+def load_checkpoint(path: Optional[str], source: str) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return {"source": source, "offset": 0, "rows": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        ckpt = json.load(f)
+    if ckpt.get("source") != source:
+        raise SystemExit(f"Checkpoint {path} belongs to {ckpt.get('source')!r}, not {source!r}.")
+    return ckpt
+
+def save_checkpoint(path: str, ckpt: Dict[str, Any]) -> None:
+    """Atomic write: a crash mid-save leaves the previous checkpoint intact."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ckpt, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _header_prefix(first_line: bytes) -> list:
+    """
+    On resume, a CSV's first line is replayed only when it is a real header (names a
+    description column); in a headerless CSV it is a data row that was already written.
+    """
+    text = first_line.decode("utf-8-sig")
+    row = next(csv.reader([text]), [])
+    return [text] if description_column(row) is not None else []
+
+def _open_source(source: str, fmt: str, offset: int) -> _OffsetLines:
+    if source == "-":
+        raw = sys.stdin.buffer
+        prefix = []
+        if offset:
+            # stdin cannot seek: read and discard what was already processed
+            if fmt == "csv":
+                header = raw.readline()
+                prefix = _header_prefix(header)
+                remaining = offset - len(header)
+            else:
+                remaining = offset
+            while remaining > 0:
+                chunk = raw.read(min(remaining, 1 << 20))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        return _OffsetLines(raw, offset, prefix)
+
+    raw = open(source, "rb")
+    prefix = []
+    if offset:
+        if fmt == "csv":
+            prefix = _header_prefix(raw.readline())
+        raw.seek(offset)
+    return _OffsetLines(raw, offset, prefix)
+
+def run(source: str, fmt: str, out, checkpoint: Optional[str] = None,
+        concurrency: int = DEFAULT_CONCURRENCY, checkpoint_every: int = 100,
+        checkpoint_secs: float = 30.0, fast_path: bool = True, pack: bool = False,
+        dedupe_threshold: Optional[float] = None, merge_report=None, to: str = "jsonl",
+        batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Process `source` into `out`. Returns counts for the summary line.
+    to="jsonl" writes the raw extractor records; "csv" / "ndjson" / "parquet" write typed
+    columns (normalize.py) in batches of `batch_size` rows (one Parquet row group each).
+    dedupe_threshold: merge near-duplicates at this similarity; each merge is written
+    to `merge_report` (CSV: row, duplicate_of, similarity) when given.
+    """
+    ckpt = load_checkpoint(checkpoint, source)
+    lines = _open_source(source, fmt, ckpt["offset"])
+    base_row = ckpt["rows"]
+    offsets: Dict[int, int] = {}   # batch index -> input offset just past that row
+
+    def descriptions() -> Iterator[str]:
+        for i, desc in enumerate(iter_descriptions(lines, fmt)):
+            offsets[i] = lines.offset
+            yield desc
+
+    stats = {"rows": 0, "errors": 0, "resumed_at": base_row, "merged": 0}
+    index = None
+    if dedupe_threshold is not None:
+        from dedupe import DedupeIndex   # numpy; only needed with --dedupe
+
+        def audit(row: int, rep: int, sim: float) -> None:
+            stats["merged"] += 1
+            if merge_report is not None:
+                merge_report.write(f"{base_row + row},{base_row + rep},{sim:.3f}\n")
+        index = DedupeIndex(threshold=dedupe_threshold, audit=audit)
+    last_save = time.monotonic()
+
+    sink = None
+    batch: List[BatchRow] = []
+    if to != "jsonl":
+        import normalize
+        fresh = base_row == 0 and not (out.seekable() and out.tell() > 0)
+        sink = normalize.open_sink(out, to, header=fresh)
+
+    def write(row: BatchRow) -> None:
+        if sink is None:
+            out.write(json.dumps({"row": row[0], "input": row[1], "result": row[2], "error": row[3]},
+                                 ensure_ascii=False) + "\n")
+            return
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush_batch()
+
+    def flush_batch() -> None:
+        if batch:
+            sink.write(normalize.normalize_rows(batch))
+            batch.clear()
+
+    def commit(offset: int) -> None:
+        if sink is not None:
+            flush_batch()
+        out.flush()
+        if out is not sys.stdout and hasattr(out, "fileno"):
+            os.fsync(out.fileno())
+        save_checkpoint(checkpoint, {"source": source, "offset": offset,
+                                     "rows": base_row + stats["rows"], "format": fmt})
+
+    offset = ckpt["offset"]
+    try:
+        for idx, desc, data, err in iter_extract(descriptions(), concurrency=concurrency, ordered=True,
+                                                 fast_path=fast_path, pack=pack, dedupe=index):
+            write((base_row + idx, desc, data, err))
+            offset = offsets.pop(idx)
+            stats["rows"] += 1
+            stats["errors"] += bool(err)
+            if checkpoint and (stats["rows"] % checkpoint_every == 0
+                               or time.monotonic() - last_save > checkpoint_secs):
+                commit(offset)
+                last_save = time.monotonic()
+    finally:
+        if checkpoint:
+            commit(offset)
+        if sink is not None:
+            flush_batch()
+            sink.close()
+        if source != "-":
+            lines.raw.close()
+    return stats
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Extract product JSON from descriptions (JSONL out).")
+    ap.add_argument("input", nargs="?", default="-", help="input file, or - for stdin (default)")
+    ap.add_argument("--format", choices=FORMATS, help="input format (default: from file extension; stdin = lines)")
+    ap.add_argument("-o", "--output", help="append results here instead of stdout")
+    ap.add_argument("--to", choices=("jsonl", "csv", "ndjson", "parquet"), default="jsonl",
+                    help="jsonl: raw records (default); csv/ndjson/parquet: typed columns "
+                         "(price amount+currency, storage GB, weight g, dimensions mm, features list)")
+    ap.add_argument("--checkpoint", help="checkpoint file; resumes from it when present")
+    ap.add_argument("--checkpoint-every", type=int, default=100, help="rows between checkpoints (default 100)")
+    ap.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    ap.add_argument("--pack", action="store_true",
+                    help="send several descriptions per request (one system prompt per pack)")
+    ap.add_argument("--dedupe", nargs="?", type=float, const=0.85, metavar="THRESHOLD",
+                    help="merge near-duplicate descriptions (similarity threshold, default 0.85)")
+    ap.add_argument("--dedupe-report", help="append merged rows here as CSV (row,duplicate_of,similarity)")
+    ap.add_argument("--no-fast-path", action="store_true", help="send every field to the model (skip local rules)")
+    args = ap.parse_args(argv)
+
+    if args.dedupe_report and args.dedupe is None:
+        args.dedupe = 0.85   # asking for a merge report implies merging
+    if args.to == "parquet" and not args.output:
+        ap.error("--to parquet needs -o/--output")
+    if args.to == "parquet" and args.checkpoint:
+        ap.error("Parquet files cannot be appended to, so --to parquet cannot resume; use csv or ndjson")
+    fmt = args.format or ("lines" if args.input == "-" else _guess_format(args.input))
+    source = args.input if args.input == "-" else os.path.abspath(args.input)
+    if args.to == "parquet":
+        out = open(args.output, "wb")
+    else:
+        out = open(args.output, "a", encoding="utf-8", newline="" if args.to == "csv" else None) \
+            if args.output else sys.stdout
+    report = open(args.dedupe_report, "a", encoding="utf-8") if args.dedupe_report else None
+    try:
+        stats = run(source, fmt, out, checkpoint=args.checkpoint, concurrency=args.concurrency,
+                    checkpoint_every=max(1, args.checkpoint_every), fast_path=not args.no_fast_path, pack=args.pack,
+                    dedupe_threshold=args.dedupe,
+                    merge_report=report, to=args.to)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if report is not None:
+            report.close()
+    print(f"[prodcli] {stats['rows']} rows ({stats['errors']} errors), resumed at row {stats['resumed_at']}",
+          file=sys.stderr)
+    if stats["merged"]:
+        print(f"[prodcli] {stats['merged']} near-duplicate rows reused a representative's result", file=sys.stderr)
+    if not args.no_fast_path:
+        fp = fast_path_stats.snapshot()
+        print(f"[prodcli] fast path: {fp['rows_local_share']:.0%} of rows and "
+              f"{fp['fields_local_share']:.0%} of fields resolved without the model", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
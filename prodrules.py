@@ -0,0 +1,250 @@
+# prodrules.py  (LOCAL RULE-BASED PRE-EXTRACTOR)
+from __future__ import annotations
+import re, threading
+from typing import Any, Dict, List, Tuple
+
+# ==============================================================================
+# LEXICONS
+# ==============================================================================
+BRANDS = {
+    # brand: category hint used when the title names no category
+    "Apple": "", "Samsung": "", "Google": "", "Sony": "", "Microsoft": "", "LG": "",
+    "OnePlus": "Smartphone", "Xiaomi": "", "Motorola": "Smartphone", "Nokia": "Smartphone",
+    "Dell": "Laptop", "HP": "Laptop", "Lenovo": "Laptop", "Asus": "Laptop", "Acer": "Laptop",
+    "Bose": "Headphones", "JBL": "Speaker", "Sennheiser": "Headphones", "Beats": "Headphones",
+    "Canon": "Camera", "Nikon": "Camera", "Fujifilm": "Camera", "GoPro": "Camera",
+    "Nike": "Shoes", "Adidas": "Shoes", "Puma": "Shoes", "Reebok": "Shoes", "New Balance": "Shoes",
+    "Asics": "Shoes", "Levi's": "Apparel", "Logitech": "Computer Accessory", "Dyson": "Home Appliance",
+    "Philips": "", "Garmin": "Smartwatch", "Fitbit": "Smartwatch", "Nintendo": "Gaming Console",
+}
+CATEGORIES = (
+    # (title keyword regex, category) — first match in the title wins
+    (r"iphone|smartphone|galaxy [sazn]\d*|pixel \d|phone", "Smartphone"),
+    (r"ipad|tablet|galaxy tab", "Tablet"),
+    (r"macbook|laptop|notebook|chromebook|thinkpad", "Laptop"),
+    (r"airpods|earbuds|headphones?|headset", "Headphones"),
+    (r"apple watch|smartwatch|watch", "Smartwatch"),
+    (r"speaker|soundbar", "Speaker"),
+    (r"\btv\b|television|monitor", "Display"),
+    (r"camera|dslr|mirrorless", "Camera"),
+    (r"sneakers?|shoes?|boots?|sandals?", "Shoes"),
+    (r"t-shirt|shirt|jeans|jacket|hoodie|dress", "Apparel"),
+    (r"playstation|xbox|switch|console", "Gaming Console"),
+    (r"mouse|keyboard", "Computer Accessory"),
+)
+COLORS = (
+    "space gray", "space grey", "midnight", "starlight", "rose gold", "black", "white", "silver",
+    "gold", "gray", "grey", "blue", "navy", "red", "green", "yellow", "orange", "purple", "pink",
+    "brown", "beige", "graphite", "charcoal", "titanium", "natural titanium", "blue titanium",
+)
+MATERIALS = (
+    "stainless steel", "aluminum", "aluminium", "leather", "cotton", "polyester", "wool", "silk",
+    "nylon", "plastic", "wood", "glass", "ceramic", "rubber", "mesh", "denim", "carbon fiber",
+)
+
+# ==============================================================================
+# COMPILED RULES
+# ==============================================================================
+_NUM = r"\d+(?:[.,]\d+)?"
+PRICE_RE = re.compile(
+    r"(?:[$€£₹]\s?\d+(?:,\d{3})*(?:\.\d{1,2})?|\b\d+(?:,\d{3})*(?:\.\d{1,2})?\s?(?:USD|EUR|GBP|INR|dollars)\b"
+    r"|\b(?:USD|EUR|GBP|INR|Rs\.?)\s?\d+(?:,\d{3})*(?:\.\d{1,2})?)", re.IGNORECASE)
+STORAGE_RE = re.compile(rf"\b{_NUM}\s?(?:GB|TB)\b(?!\s*(?:of\s+)?(?:RAM|memory|LPDDR|DDR|unified))", re.IGNORECASE)
+WEIGHT_RE = re.compile(rf"\b{_NUM}\s?(?:kg|g|grams?|lbs?|pounds?|oz|ounces?)\b", re.IGNORECASE)
+DIMENSIONS_RE = re.compile(
+    rf"\b{_NUM}\s?(?:x|×)\s?{_NUM}(?:\s?(?:x|×)\s?{_NUM})?\s?(?:mm|cm|in(?:ches)?|m|\"|″)?", re.IGNORECASE)
+SIZE_RE = re.compile(r"\bsize[:\s]+([A-Za-z0-9./]+)|\b(XXS|XS|S|M|L|XL|XXL|XXXL)\b(?=\s*(?:$|[,;|]))"
+                     r"|\b(\d+(?:\.\d+)?\s?(?:-?inch|\"|″))", re.IGNORECASE)
+MODEL_RE = re.compile(r"\bmodel(?:\s*(?:no\.?|number|#))?[:\s]+([A-Za-z0-9][A-Za-z0-9\-_/]{1,30})", re.IGNORECASE)
+LABEL_RE = re.compile(r"\b(?:price|color|colour|weight|size|storage|capacity|dimensions?|model|material)\b\s*:?",
+                      re.IGNORECASE)
+SEGMENT_RE = re.compile(r"\s*(?:[,;|\n]|\s[–—-]\s|(?<=[a-z0-9)])\.\s+|\.$)\s*", re.IGNORECASE)
+COLOR_RE = re.compile(r"\b(" + "|".join(sorted(map(re.escape, COLORS), key=len, reverse=True)) + r")\b", re.IGNORECASE)
+MATERIAL_RE = re.compile(r"\b(" + "|".join(sorted(map(re.escape, MATERIALS), key=len, reverse=True)) + r")\b",
+                         re.IGNORECASE)
+BRAND_RE = re.compile(r"\b(" + "|".join(sorted(map(re.escape, BRANDS), key=len, reverse=True)) + r")\b",
+                      re.IGNORECASE)
+CATEGORY_RES = tuple((re.compile(rf"\b(?:{pat})", re.IGNORECASE), cat) for pat, cat in CATEGORIES)
+_BRAND_CASE = {b.lower(): b for b in BRANDS}
+
+FIELDS = ("product_name", "brand", "category", "model", "color", "material", "storage",
+          "size", "dimensions", "weight", "price", "description", "features")
+
+# Confidence for a field left empty: high when every part of a short listing was
+# accounted for (nothing left that could hold the value), low for free-form prose.
+EMPTY_CONF_FORMULAIC = 0.85
+EMPTY_CONF_PROSE = 0.3
+
+class LocalExtraction:
+    """Schema-shaped values plus a 0..1 confidence per field."""
+    __slots__ = ("values", "confidence")
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {k: "" for k in FIELDS}
+        self.values["features"] = []
+        self.confidence: Dict[str, float] = {k: 0.0 for k in FIELDS}
+
+    def set(self, field: str, value: Any, conf: float) -> None:
+        self.values[field] = value
+        self.confidence[field] = conf
+
+    def low_confidence(self, threshold: float) -> List[str]:
+        return [k for k in FIELDS if self.confidence[k] < threshold]
+
+    def to_json(self) -> Dict[str, Any]:
+        """Schema order; "features" only when non-empty, as SYSTEM_PROMPT requires."""
+        out = {k: self.values[k] for k in FIELDS if k != "features"}
+        if self.values["features"]:
+            out["features"] = list(self.values["features"])
+        return out
+
+def _one(regex, text: str) -> Tuple[str, float, List[Tuple[int, int]]]:
+    """(value, confidence, spans): a single distinct match is trusted, several are ambiguous."""
+    matches = list(regex.finditer(text))
+    if not matches:
+        return "", 0.0, []
+    distinct = {m.group(0).strip().lower() for m in matches}
+    spans = [m.span() for m in matches]
+    return matches[0].group(0).strip(), (0.95 if len(distinct) == 1 else 0.5), spans
+
+def _cut(text: str, spans: List[Tuple[int, int]]) -> str:
+    """text without the (start, end) spans; leftover runs of spaces and dangling dashes/commas tidied."""
+    keep, pos = [], 0
+    for a, b in sorted(spans):
+        if a > pos:
+            keep.append(text[pos:a])
+        pos = max(pos, b)
+    keep.append(text[pos:])
+    return re.sub(r"\s{2,}", " ", "".join(keep)).strip(" -–,")
+
+def pre_extract(text: str) -> LocalExtraction:
+    """Deterministic extraction of easy fields from a (normalized) description."""
+    out = LocalExtraction()
+    text = text.strip()
+    segments = [s for s in SEGMENT_RE.split(text) if s and s.strip()]
+    # A short listing: a few terse segments, anchored by a known brand or a price
+    formulaic = (len(text) <= 400 and len(segments) >= 2 and all(len(s.split()) <= 8 for s in segments)
+                 and bool(BRAND_RE.search(text) or PRICE_RE.search(text)))
+    empty_conf = EMPTY_CONF_FORMULAIC if formulaic else EMPTY_CONF_PROSE
+    claimed: List[Tuple[int, int]] = []
+
+    for field, regex in (("price", PRICE_RE), ("storage", STORAGE_RE), ("weight", WEIGHT_RE),
+                         ("dimensions", DIMENSIONS_RE)):
+        value, conf, spans = _one(regex, text)
+        out.set(field, value, conf if value else empty_conf)
+        claimed += spans
+
+    m = MODEL_RE.search(text)
+    if m:
+        out.set("model", m.group(1), 0.95)
+        claimed.append(m.span())
+
+    m = SIZE_RE.search(text)
+    if m:
+        out.set("size", next(g for g in m.groups() if g).strip(), 0.9 if m.group(1) else 0.6)
+        claimed.append(m.span())
+    else:
+        out.set("size", "", empty_conf)
+
+    colors = COLOR_RE.findall(text)
+    materials = MATERIAL_RE.findall(text)
+    # "Titanium" etc. can be either; trust a color only when no material word overlaps it
+    color = next((c for c in colors if c.lower() not in {x.lower() for x in materials}), colors[0] if colors else "")
+    color_ambiguous = bool(color) and any(color.lower() in x.lower() or x.lower() in color.lower() for x in materials)
+    out.set("color", color.title() if color.islower() else color,
+            (0.6 if color_ambiguous or len({c.lower() for c in colors}) > 1 else 0.85) if color else empty_conf)
+    out.set("material", materials[0] if materials else "",
+            (0.6 if color_ambiguous else 0.8) if materials else empty_conf)
+    claimed += [mm.span() for mm in COLOR_RE.finditer(text)] + [mm.span() for mm in MATERIAL_RE.finditer(text)]
+
+    # Title = first segment; brand / category / product name come from it
+    title = segments[0].strip() if segments else ""
+    bm = BRAND_RE.search(text)
+    brand = _BRAND_CASE.get(bm.group(1).lower(), bm.group(1)) if bm else ""
+    out.set("brand", brand, (0.95 if title.lower().startswith(brand.lower()) else 0.75) if brand else empty_conf * 0.8)
+
+    category = next((cat for rx, cat in CATEGORY_RES if rx.search(title)), "") or BRANDS.get(brand, "")
+    out.set("category", category, 0.8 if category else 0.2)
+
+    # A title that also carries specs ("Galaxy S24 128GB black") needs the model to trim it;
+    # the local model and description use the title with those specs cut out
+    t_start = text.find(title)
+    t_end = t_start + len(title)
+    title_specs = [(max(a, t_start) - t_start, min(b, t_end) - t_start) for a, b in claimed if a < t_end and b > t_start]
+    title_has_specs = bool(title_specs)
+    core = _cut(title, title_specs) if title_has_specs else title
+    if title and (brand or category) and len(title.split()) <= 10:
+        out.set("product_name", title, 0.5 if title_has_specs else 0.85)
+        if not out.values["model"] and brand and core.lower().startswith(brand.lower()):
+            rest = core[len(brand):].strip(" -–")
+            # "Pegasus 40 running shoes": a trailing category noun is not part of the model
+            # (a leading one is the product line itself, e.g. "iPhone 15")
+            generic = [m.span() for rx, _ in CATEGORY_RES for m in rx.finditer(rest) if m.start() >= 1]
+            rest = _cut(rest, generic)
+            if rest:
+                out.set("model", rest, 0.5 if title_has_specs or generic else 0.7)
+    else:
+        out.set("product_name", title, 0.3)
+    if not out.values["model"] and out.confidence["model"] == 0.0:
+        out.set("model", "", empty_conf * 0.8)
+
+    # Anything in a short listing no rule claimed is an explicit feature/spec
+    features = []
+    pos = 0
+    for seg in segments:
+        start = text.find(seg, pos)
+        end = start + len(seg)
+        pos = max(pos, end)
+        if seg is segments[0]:
+            continue
+        leftover = seg
+        for a, b in claimed:
+            if a < end and b > start:
+                lo, hi = max(a, start) - start, min(b, end) - start
+                leftover = leftover[:lo] + " " * (hi - lo) + leftover[hi:]
+        leftover = LABEL_RE.sub(" ", leftover)
+        if re.search(r"[A-Za-z0-9]", leftover):
+            features.append(seg.strip())
+    out.set("features", features, 0.8 if formulaic else 0.3)
+
+    # Template summary: only restates fields already extracted, never adds facts
+    if out.values["product_name"]:
+        # the title minus its storage/colour/etc., which the clauses below restate
+        bits, used = [core or out.values["product_name"]], ["product_name"]
+        if out.values["storage"]:
+            bits.append(f"with {out.values['storage']} storage")
+            used.append("storage")
+        if out.values["color"]:
+            bits.append(f"in {out.values['color']}")
+            used.append("color")
+        # No more certain than the weakest field it restates
+        conf = min([0.75 if formulaic else 0.3] + [out.confidence[k] for k in used])
+        out.set("description", " ".join(bits) + ".", conf)
+    return out
+
+# ==============================================================================
+# STATS
+# ==============================================================================
+class FastPathStats:
+    """Share of rows/fields resolved locally (process-wide, thread-safe)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = self.rows_local = self.fields = self.fields_local = 0
+
+    def record(self, local_fields: int, total_fields: int) -> None:
+        with self._lock:
+            self.rows += 1
+            self.rows_local += local_fields == total_fields
+            self.fields += total_fields
+            self.fields_local += local_fields
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rows": self.rows,
+                "rows_local": self.rows_local,
+                "rows_local_share": round(self.rows_local / self.rows, 3) if self.rows else 0.0,
+                "fields_local_share": round(self.fields_local / self.fields, 3) if self.fields else 0.0,
+            }
+
+STATS = FastPathStats()
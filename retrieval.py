@@ -0,0 +1,146 @@
+# retrieval.py  (PER-SESSION TURN RETRIEVAL — LOCAL HASHED TF-IDF)
+from __future__ import annotations
+import os, re, zlib
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from chat_memory import count_tokens
+
+# ==============================================================================
+# CONFIG (env overrides)
+# ==============================================================================
+RETRIEVAL = os.getenv("HUB_RETRIEVAL", "on").lower() not in ("0", "off", "false")
+N_FEATURES = int(os.getenv("HUB_RETRIEVAL_FEATURES", "1024"))   # hashed vocabulary size (power of two)
+TOP_K = int(os.getenv("HUB_RETRIEVAL_TOP_K", "4"))              # earlier turns pulled into the prompt
+RECENT = int(os.getenv("HUB_RETRIEVAL_RECENT", "6"))            # newest turns always included
+MIN_SCORE = float(os.getenv("HUB_RETRIEVAL_MIN_SCORE", "0.12"))  # cosine; below this a turn isn't relevant
+MAX_TURNS = int(os.getenv("HUB_RETRIEVAL_MAX_TURNS", "512"))    # per session; oldest quarter dropped past it
+MAX_CHARS = 600     # an indexed turn is clipped to this when it is pulled back into a prompt
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_STOP = frozenset(
+    "a an and are as at be but by can do for from have how i i'm if in is it it's just me my "
+    "of on or so that the this to was we what when with you your".split())
+
+@lru_cache(maxsize=50_000)
+def _bucket(token: str, n_features: int) -> int:
+    # crc32, not hash(): stable across processes, so indexes built anywhere agree
+    return zlib.crc32(token.encode("utf-8")) & (n_features - 1)
+
+def _features(text: str, n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(buckets, weights): the text's words hashed into n_features buckets (sorted, unique)
+    and their sublinear term frequencies (1 + log tf)."""
+    idx = [_bucket(t, n_features) for t in _TOKEN.findall(text.lower()) if t not in _STOP and len(t) > 1]
+    buckets, counts = np.unique(np.asarray(idx, dtype=np.int32), return_counts=True)
+    return buckets, (1.0 + np.log(counts)).astype(np.float32)
+
+def _grown(arr: np.ndarray, size: int) -> np.ndarray:
+    out = np.zeros(size, dtype=arr.dtype)
+    out[: len(arr)] = arr
+    return out
+
+class TurnIndex:
+    """
+    The session's earlier turns, vectorized as they arrive (hashing vectorizer, no
+    vocabulary to fit, nothing leaves the process).
+
+    Turns are stored sparse, CSR-style: one flat array of bucket ids and one of term
+    frequencies (both grow by doubling) plus each turn's start offset, so a turn costs
+    8 bytes per distinct word rather than a dense n_features row. Document frequencies
+    are running counts, so add() costs O(turn) and IDF weights are always current.
+    search() scores every turn with two bincounts over the stored entries.
+    `recent` is how many of the newest turns the prompt always carries verbatim.
+    """
+    def __init__(self, n_features: int = N_FEATURES, max_turns: int = MAX_TURNS, recent: int = RECENT):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of two")
+        self.n_features = n_features
+        self.max_turns = max(4, max_turns)
+        self.recent = recent
+        self._idx = np.zeros(256, dtype=np.int32)      # bucket ids, turn after turn
+        self._tf = np.zeros(256, dtype=np.float32)     # their term frequencies
+        self._ptr: List[int] = [0]                     # turn i is entries _ptr[i]:_ptr[i + 1]
+        self._df = np.zeros(n_features, dtype=np.float32)
+        self._lines: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def nbytes(self) -> int:
+        """Approximate memory held (arrays and stored lines), for the message_store caps."""
+        return (self._idx.nbytes + self._tf.nbytes + self._df.nbytes + 8 * len(self._ptr)
+                + sum(len(line) for line in self._lines))
+
+    def add(self, line: str) -> None:
+        """Index one serialized turn ("User: ..." / "Assistant: ...")."""
+        if len(self._lines) >= self.max_turns:
+            self._drop_oldest(self.max_turns // 4)
+        buckets, weights = _features(line, self.n_features)
+        start = self._ptr[-1]
+        end = start + len(buckets)
+        if end > len(self._idx):
+            size = max(end, 2 * len(self._idx))
+            self._idx, self._tf = _grown(self._idx, size), _grown(self._tf, size)
+        self._idx[start:end] = buckets
+        self._tf[start:end] = weights
+        self._ptr.append(end)
+        self._df[buckets] += 1          # buckets are unique within a turn
+        self._lines.append(line if len(line) <= MAX_CHARS else line[: MAX_CHARS - 1] + "…")
+
+    def _drop_oldest(self, k: int) -> None:
+        cut, end = self._ptr[k], self._ptr[-1]
+        self._df -= np.bincount(self._idx[:cut], minlength=self.n_features)
+        self._idx[: end - cut] = self._idx[cut:end]
+        self._tf[: end - cut] = self._tf[cut:end]
+        self._ptr = [p - cut for p in self._ptr[k:]]
+        del self._lines[:k]
+
+    def search(self, query: str, k: int = TOP_K, exclude_last: int = 0,
+               min_score: float = MIN_SCORE) -> List[Tuple[int, float]]:
+        """
+        Up to k (position, cosine) pairs among the turns before the last `exclude_last`,
+        best first; only scores >= min_score.
+        """
+        m = len(self._lines) - exclude_last
+        if m <= 0 or k <= 0:
+            return []
+        n = len(self._lines)
+        idf = np.log((1.0 + n) / (1.0 + self._df)) + 1.0
+        q_buckets, q_weights = _features(query, self.n_features)
+        q = np.zeros(self.n_features, dtype=np.float32)
+        q[q_buckets] = q_weights * idf[q_buckets]
+        q_norm = float(np.linalg.norm(q))
+        if q_norm == 0.0:
+            return []
+        end = self._ptr[m]
+        idx = self._idx[:end]
+        weights = self._tf[:end] * idf[idx]
+        rows = np.repeat(np.arange(m), np.diff(self._ptr[: m + 1]))
+        dots = np.bincount(rows, weights=weights * q[idx], minlength=m)
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=m))
+        scores = dots / np.maximum(norms * q_norm, 1e-9)
+        top = np.argpartition(-scores, k - 1)[:k] if m > k else np.arange(m)
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def relevant_lines(self, query: str, k: int = TOP_K, exclude_last: Optional[int] = None,
+                       max_tokens: Optional[int] = None) -> List[str]:
+        """
+        The top-k relevant turns outside the recent window, in conversation order. With
+        max_tokens, only the best ones that fit in it together (a turn that doesn't fit is skipped).
+        """
+        picked = []
+        for pos, _ in self.search(query, k, self.recent if exclude_last is None else exclude_last):
+            if max_tokens is not None:
+                tokens = count_tokens(self._lines[pos])
+                if tokens > max_tokens:
+                    continue
+                max_tokens -= tokens
+            picked.append(pos)
+        return [self._lines[pos] for pos in sorted(picked)]
+
+def new_index() -> Optional[TurnIndex]:
+    """A fresh index for a session, or None when HUB_RETRIEVAL=off."""
+    return TurnIndex() if RETRIEVAL else None
@@ -0,0 +1,88 @@
+# rules.py  (KEYWORD / SAFETY RULES ENGINE)
+from __future__ import annotations
+import os, json
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+RULES_PATH = os.getenv("HUB_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+
+class RuleSet:
+    """
+    Keyword/phrase sets loaded from config, pre-lowered and deduplicated once.
+
+    A scan lowers the text once and runs each phrase through CPython's substring search
+    (C speed, memchr-accelerated). On these rule sets that beats a single combined regex
+    (alternation: 20x+ slower, prefix trie: 2-3x slower), because `re` tries the pattern
+    at every position; see benchmarks/bench_rules.py.
+    Matching is substring-based, same as the `any(k in text.lower() ...)` checks it replaces.
+    """
+    def __init__(self, rules: Dict[str, Iterable[str]]):
+        self.rules: Dict[str, Tuple[str, ...]] = {}
+        for cat, phrases in rules.items():
+            lowered = tuple(sorted({p.lower() for p in phrases if p}, key=len))
+            if lowered:
+                self.rules[cat] = lowered
+        self.categories = list(self.rules)
+        self.max_len = max((len(p) for ps in self.rules.values() for p in ps), default=1)
+
+    @classmethod
+    def load(cls, path: str = RULES_PATH) -> "RuleSet":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _scan_lowered(self, t: str, categories: Iterable[str], stop: Set[str]) -> Set[str]:
+        found: Set[str] = set()
+        for cat in categories:
+            if any(p in t for p in self.rules[cat]):
+                found.add(cat)
+                if cat in stop:
+                    break
+        return found
+
+    def scan(self, text: str, stop_at: Optional[Iterable[str]] = None,
+             categories: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Categories present in text, checked in order (`categories`, default: config order).
+        Stops early once a category in stop_at is found (the rest are not checked).
+        """
+        cats = self.categories if categories is None else [c for c in categories if c in self.rules]
+        return self._scan_lowered((text or "").lower(), cats, set(stop_at or ()))
+
+    def matches(self, text: str, category: str) -> bool:
+        t = (text or "").lower()
+        return any(p in t for p in self.rules.get(category, ()))
+
+    def stream(self) -> "StreamMatcher":
+        return StreamMatcher(self)
+
+class StreamMatcher:
+    """
+    Incremental matching over text that arrives in chunks (streamed replies, typed input).
+
+    Only the last max_len-1 characters are carried between chunks, so a phrase split
+    across a chunk boundary is still found, and each feed costs O(chunk). Categories
+    already seen are not checked again. After the stream ends, `seen` holds the same
+    categories a full scan of the whole text would report, so there is no second pass.
+    """
+    def __init__(self, rules: RuleSet):
+        self.rules = rules
+        self.seen: Set[str] = set()
+        self._tail = ""
+
+    def feed(self, chunk: str) -> Set[str]:
+        """Returns the categories that matched for the first time in this chunk."""
+        buf = self._tail + (chunk or "").lower()
+        pending = [c for c in self.rules.categories if c not in self.seen]
+        new = self.rules._scan_lowered(buf, pending, set()) if pending else set()
+        keep = self.rules.max_len - 1
+        self._tail = buf[-keep:] if keep > 0 else ""
+        self.seen |= new
+        return new
+
+_default: Optional[RuleSet] = None
+
+def get_rules() -> RuleSet:
+    """Process-wide RuleSet built from rules.json (HUB_RULES_PATH overrides the path)."""
+    global _default
+    if _default is None:
+        _default = RuleSet.load()
+    return _default
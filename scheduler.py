@@ -0,0 +1,257 @@
+# scheduler.py  (PROCESS-WIDE GROQ RATE-LIMIT SCHEDULER)
+from __future__ import annotations
+import os, time, threading, contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+# ==============================================================================
+# PRIORITY LANES
+# ==============================================================================
+INTERACTIVE, BATCH = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# (priority, session) for calls made inside `with lane(...)`; chat_completion reads it
+_lane: contextvars.ContextVar[Optional[Tuple[int, Optional[str]]]] = contextvars.ContextVar("llm_lane", default=None)
+
+@contextmanager
+def lane(priority: int, session: Optional[str] = None) -> Iterator[None]:
+    """Run LLM calls in this block at `priority`, queued under `session` for fairness."""
+    token = _lane.set((priority, session))
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+def in_lane(priority: int, session: Optional[str], fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """fn(*args, **kwargs) inside lane(); for thread pools, whose workers don't inherit context."""
+    with lane(priority, session):
+        return fn(*args, **kwargs)
+
+def current_lane() -> Tuple[int, Optional[str]]:
+    return _lane.get() or (INTERACTIVE, None)
+
+# ==============================================================================
+# TOKEN BUCKETS
+# ==============================================================================
+class TokenBucket:
+    """`per_minute` units, refilled continuously; level may go negative after a refund-less overrun."""
+    __slots__ = ("capacity", "rate", "level", "stamp")
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, n: float, floor: float = 0.0) -> float:
+        """Seconds until `n` can be taken while leaving at least `floor` in the bucket."""
+        short = n + floor - self.level
+        return 0.0 if short <= 0 else short / self.rate
+
+    def resize(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = min(self.level, self.capacity)
+
+class Grant:
+    """One admitted request. settle() with the real token count returns the unused estimate."""
+    __slots__ = ("scheduler", "tokens", "priority", "session", "waited", "_settled")
+
+    def __init__(self, scheduler: Optional["Scheduler"], tokens: int, priority: int, session: str, waited: float):
+        self.scheduler, self.tokens, self.priority, self.session = scheduler, tokens, priority, session
+        self.waited = waited
+        self._settled = False
+
+    def settle(self, tokens_used: Optional[int] = None) -> None:
+        """tokens_used=None keeps the estimate; 0 refunds it all (the request never ran)."""
+        if self._settled or self.scheduler is None or tokens_used is None:
+            return
+        self._settled = True
+        self.scheduler._refund(self.tokens - tokens_used)
+
+# ==============================================================================
+# SCHEDULER
+# ==============================================================================
+class Scheduler:
+    """
+    Admission control in front of every Groq call in the process.
+
+    - Two token buckets: requests/min and tokens/min. A request's tokens are estimated
+      up front (prompt + max_completion_tokens) and the unused part is refunded when
+      the response reports its usage.
+    - Interactive callers are always served before batch ones, and batch calls may not
+      dip into the last `batch_reserve` share of either bucket, so a chat turn arriving
+      during a bulk run finds capacity right away.
+    - Within a priority, sessions take turns (round-robin), so one session with many
+      queued calls can't starve another.
+    - Callers block in acquire() until admitted. Batch workers therefore stall, and
+      bounded producers (prodbatch.iter_extract) stop reading input: backpressure.
+    - A 429 pauses that model for its Retry-After (Groq limits are per model); callers
+      check paused_for(model) before queueing, so a paused model doesn't hold up the
+      queue for the others. x-ratelimit-*-tokens response headers correct the token
+      bucket to the provider's view. (Groq's request headers are per day, so
+      requests/min stays local.)
+    Limits are scaled by `headroom` to stay just under the provider's.
+    """
+    def __init__(self, rpm: float, tpm: float, headroom: float = 0.9, batch_reserve: float = 0.2):
+        self.headroom = headroom
+        self.batch_reserve = batch_reserve
+        self.requests = TokenBucket(rpm * headroom)
+        self.tokens = TokenBucket(tpm * headroom)
+        self._cond = threading.Condition()
+        self._queues: Dict[int, "OrderedDict[str, Deque[object]]"] = {INTERACTIVE: OrderedDict(), BATCH: OrderedDict()}
+        self._paused: Dict[str, float] = {}    # model -> monotonic time its 429 pause ends
+        self.granted = {INTERACTIVE: 0, BATCH: 0}
+
+    # ---------- admission ----------
+    def acquire(self, tokens: int, priority: int = INTERACTIVE, session: str = "default") -> Grant:
+        """Block until one request of ~`tokens` may be sent. Returns its Grant."""
+        tokens = int(min(max(tokens, 1), self.tokens.capacity))   # an oversized prompt still runs, alone
+        me = object()
+        started = time.monotonic()
+        with self._cond:
+            queue = self._queues[priority].setdefault(session, deque())
+            queue.append(me)
+            self._cond.notify_all()     # a new interactive head must preempt a waiting batch head
+            try:
+                while True:
+                    if self._head() is me:
+                        delay = self._delay(time.monotonic(), tokens, priority)
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._remove(priority, session, me)
+                raise
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            self.granted[priority] += 1
+            self._remove(priority, session, me)
+            self._cond.notify_all()
+        return Grant(self, tokens, priority, session, time.monotonic() - started)
+
+    def _head(self) -> Optional[object]:
+        for priority in (INTERACTIVE, BATCH):
+            for queue in self._queues[priority].values():
+                return queue[0]
+        return None
+
+    def _remove(self, priority: int, session: str, me: object) -> None:
+        sessions = self._queues[priority]
+        queue = sessions.get(session)
+        if queue is None:
+            return
+        was_head = bool(queue) and queue[0] is me
+        try:
+            queue.remove(me)
+        except ValueError:
+            pass
+        if not queue:
+            del sessions[session]
+        elif was_head:
+            sessions.move_to_end(session)   # round-robin: this session's next call waits its turn
+
+    def _delay(self, now: float, tokens: int, priority: int) -> float:
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        if priority == BATCH:
+            floor_r = min(self.batch_reserve * self.requests.capacity, self.requests.capacity - 1)
+            floor_t = min(self.batch_reserve * self.tokens.capacity, self.tokens.capacity - tokens)
+        else:
+            floor_r = floor_t = 0.0
+        return max(self.requests.wait_time(1, floor_r),
+                   self.tokens.wait_time(tokens, floor_t))
+
+    def _refund(self, tokens: float) -> None:
+        with self._cond:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + tokens)
+            self._cond.notify_all()
+
+    # ---------- provider feedback ----------
+    def penalize(self, seconds: float, model: str = "") -> None:
+        """A 429 arrived for `model`: don't send to it for `seconds`."""
+        with self._cond:
+            self._paused[model] = max(self._paused.get(model, 0.0), time.monotonic() + seconds)
+
+    def paused_for(self, model: str = "") -> float:
+        until = self._paused.get(model)
+        return max(0.0, until - time.monotonic()) if until else 0.0
+
+    def sync(self, headers: Any) -> None:
+        """Adopt the provider's tokens/min limit and never believe we have more left than it says."""
+        if not headers:
+            return
+        limit = _header_float(headers, "x-ratelimit-limit-tokens")
+        remaining = _header_float(headers, "x-ratelimit-remaining-tokens")
+        with self._cond:
+            if limit and abs(limit * self.headroom - self.tokens.capacity) >= 1:
+                self.tokens.resize(limit * self.headroom)
+            if remaining is not None:
+                self.tokens.refill(time.monotonic())
+                self.tokens.level = min(self.tokens.level, remaining * self.headroom)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "waiting": {PRIORITY_NAMES[p]: sum(len(q) for q in s.values()) for p, s in self._queues.items()},
+                "granted": {PRIORITY_NAMES[p]: n for p, n in self.granted.items()},
+                "requests_left": round(self.requests.level, 1), "rpm": round(self.requests.capacity, 1),
+                "tokens_left": round(self.tokens.level), "tpm": round(self.tokens.capacity),
+                "paused": {m: round(until - now, 2) for m, until in self._paused.items() if until > now},
+            }
+
+class NullScheduler:
+    """GROQ_SCHEDULER=off: admits everything at once."""
+    def acquire(self, tokens: int, priority: int = INTERACTIVE, session: str = "default") -> Grant:
+        return Grant(None, tokens, priority, session, 0.0)
+
+    def penalize(self, seconds: float, model: str = "") -> None:
+        pass
+
+    def paused_for(self, model: str = "") -> float:
+        return 0.0
+
+    def sync(self, headers: Any) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": False}
+
+def _header_float(headers: Any, name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+# ==============================================================================
+# PROCESS SINGLETON — limits from env (defaults: Groq free tier, llama-3.1-8b-instant)
+# ==============================================================================
+_lock = threading.Lock()
+_scheduler = None
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _lock:
+            if _scheduler is None:
+                rpm = float(os.getenv("GROQ_RPM", "30"))
+                tpm = float(os.getenv("GROQ_TPM", "6000"))
+                if os.getenv("GROQ_SCHEDULER", "on").lower() in ("0", "off", "false") or rpm <= 0 or tpm <= 0:
+                    _scheduler = NullScheduler()
+                else:
+                    _scheduler = Scheduler(rpm, tpm,
+                                           headroom=float(os.getenv("GROQ_LIMIT_HEADROOM", "0.9")),
+                                           batch_reserve=float(os.getenv("GROQ_BATCH_RESERVE", "0.2")))
+    return _scheduler
@@ -0,0 +1,200 @@
+# service.py  (HEADLESS ASGI SERVICE — BOTH AGENTS OVER HTTP)
+"""
+Runs the therapy agent and the product extractor behind HTTP, so the Streamlit UIs
+become thin clients (HUB_BACKEND_URL=http://host:8000) and inference I/O scales
+separately from UI sessions.
+
+    python service.py --port 8000 --workers 4
+    uvicorn service:app --port 8000 --workers 4
+
+POST /v1/chat/stream     {"prompt", "session"}  → text/event-stream
+                         data: {"delta": "..."}  …  event: done | event: error
+POST /v1/chat            {"prompt", "session"}  → {"reply": "..."}
+POST /v1/extract         {"description", "fast_path", "session"} → {"result": {...}}
+POST /v1/extract/batch   {"descriptions": [...], "fast_path", "pack", "session"}
+                         → {"results": [{"result": {...}} | {"error": "..."}, ...]} (input order)
+GET  /healthz, /metrics (Prometheus), /metrics.json
+
+Each worker process keeps one pooled Groq client, one rate-limit scheduler and the
+shared SQLite response cache, for all the UI sessions it serves. The scheduler limits
+are per process: with N workers, set GROQ_RPM / GROQ_TPM to the plan's limits ÷ N.
+Model calls are blocking (sync SDK + scheduler waits), so they run on the threadpool;
+the event loop only moves bytes. Batch work gets its own, smaller thread limit
+(HUB_SERVICE_BATCH_THREADS): batch workers parked in the scheduler's batch lane can
+never take the threads that chat streams and single extractions run on.
+"""
+from __future__ import annotations
+import os, sys, json, asyncio, argparse, functools
+from typing import Any, Dict, Iterator, Optional
+
+import anyio.to_thread
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+import metrics
+from backend import LocalBackend
+from prodbot import iter_packs
+
+MAX_BATCH = int(os.getenv("HUB_SERVICE_MAX_BATCH", "256"))             # descriptions per batch request
+BATCH_CONCURRENCY = int(os.getenv("HUB_SERVICE_BATCH_CONCURRENCY", "8"))  # work units in flight per request
+BATCH_THREADS = int(os.getenv("HUB_SERVICE_BATCH_THREADS", "16"))  # batch threads per worker, all requests
+
+backend = LocalBackend()
+
+_batch_limiter: Optional[anyio.CapacityLimiter] = None
+
+def _batch_threads() -> anyio.CapacityLimiter:
+    """Process-wide limiter for batch threads (created on the event loop, on first use)."""
+    global _batch_limiter
+    if _batch_limiter is None:
+        _batch_limiter = anyio.CapacityLimiter(max(1, BATCH_THREADS))
+    return _batch_limiter
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status)
+
+async def _body(request: Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ValueError("Request body must be JSON.") from None
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object.")
+    return body
+
+def _text(body: Dict[str, Any], key: str) -> str:
+    value = body.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f'"{key}" must be a non-empty string.')
+    return value
+
+def _session(body: Dict[str, Any]) -> Optional[str]:
+    session = body.get("session")
+    return str(session) if session else None
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# ==============================================================================
+# CHAT
+# ==============================================================================
+async def chat_stream(request: Request):
+    try:
+        body = await _body(request)
+        prompt, session = _text(body, "prompt"), _session(body)
+    except ValueError as e:
+        return _error(400, str(e))
+
+    def events() -> Iterator[str]:
+        # Sync generator: Starlette pulls it on the threadpool. If the client disconnects,
+        # the generator is closed and agent.stream_response releases the Groq connection.
+        try:
+            for delta in backend.stream_chat(prompt, session):
+                yield _sse({"delta": delta})
+        except Exception as e:
+            yield _sse({"error": str(e) or e.__class__.__name__}, "error")
+            return
+        yield _sse({}, "done")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def chat(request: Request):
+    try:
+        body = await _body(request)
+        prompt, session = _text(body, "prompt"), _session(body)
+    except ValueError as e:
+        return _error(400, str(e))
+    try:
+        reply = await run_in_threadpool(lambda: "".join(backend.stream_chat(prompt, session)))
+    except Exception as e:
+        return _error(502, str(e) or e.__class__.__name__)
+    return JSONResponse({"reply": reply})
+
+# ==============================================================================
+# EXTRACTION
+# ==============================================================================
+async def extract(request: Request):
+    try:
+        body = await _body(request)
+        desc, session = _text(body, "description"), _session(body)
+    except ValueError as e:
+        return _error(400, str(e))
+    try:
+        result = await run_in_threadpool(backend.extract, desc, bool(body.get("fast_path", True)), session)
+    except ValueError as e:       # the model's output did not parse
+        return _error(422, str(e))
+    except Exception as e:
+        return _error(502, str(e) or e.__class__.__name__)
+    return JSONResponse({"result": result})
+
+async def extract_batch(request: Request):
+    try:
+        body = await _body(request)
+        descs = body.get("descriptions")
+        if not isinstance(descs, list) or not all(isinstance(d, str) for d in descs):
+            raise ValueError('"descriptions" must be a list of strings.')
+        if len(descs) > MAX_BATCH:
+            raise ValueError(f"At most {MAX_BATCH} descriptions per request.")
+    except ValueError as e:
+        return _error(400, str(e))
+    fast_path, pack, session = bool(body.get("fast_path", True)), bool(body.get("pack", False)), _session(body)
+
+    # Work units (one request each): adaptive packs, or single rows. They run concurrently,
+    # in the scheduler's batch lane and on the batch thread limiter (not the default pool),
+    # so a big batch never crowds out chat on this worker.
+    units = list(iter_packs(descs)) if pack else [[d] for d in descs]
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(unit):
+        async with limit:
+            try:
+                return await anyio.to_thread.run_sync(
+                    functools.partial(backend.extract_batch, unit, fast_path, pack, session),
+                    limiter=_batch_threads())
+            except Exception as e:
+                return [e] * len(unit)
+
+    results = [r for unit_results in await asyncio.gather(*(run(u) for u in units)) for r in unit_results]
+    return JSONResponse({"results": [
+        {"error": str(r) or r.__class__.__name__} if isinstance(r, Exception) else {"result": r}
+        for r in results]})
+
+# ==============================================================================
+# OPS
+# ==============================================================================
+async def healthz(request: Request):
+    return JSONResponse({"ok": True, "pid": os.getpid()})
+
+async def prometheus(request: Request):
+    return PlainTextResponse(metrics.REGISTRY.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+async def metrics_json(request: Request):
+    return JSONResponse(metrics.REGISTRY.to_json())
+
+app = Starlette(routes=[
+    Route("/v1/chat/stream", chat_stream, methods=["POST"]),
+    Route("/v1/chat", chat, methods=["POST"]),
+    Route("/v1/extract", extract, methods=["POST"]),
+    Route("/v1/extract/batch", extract_batch, methods=["POST"]),
+    Route("/healthz", healthz),
+    Route("/metrics", prometheus),
+    Route("/metrics.json", metrics_json),
+])
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=1, help="worker processes (each with its own pool)")
+    args = ap.parse_args(argv)
+    import uvicorn
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers, log_level="info")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# session_store.py  (PERSISTENT SESSIONS SHARED ACROSS PROCESSES)
+from __future__ import annotations
+import os, time, json, uuid, atexit, sqlite3, threading
+from typing import Any, Dict, List, Optional, Tuple
+
+SESSIONS_DIR = os.getenv("HUB_SESSIONS_DIR", "sessions")
+DEFAULT_PATH = os.path.join(SESSIONS_DIR, "sessions.db")
+
+class SessionStore:
+    """
+    Append-only session log in SQLite (WAL mode).
+
+    - `events` is the log: (session_id, seq) → JSON record, never updated in place.
+    - `sessions` is the index: app, created/updated timestamps and record count.
+    - append() only buffers; flush() writes the buffer in one transaction. Apps flush
+      once per user action, and WAL + synchronous=NORMAL defers fsync to checkpoints,
+      so a chat turn costs one commit, not one fsync per message.
+    - seq numbers are assigned inside a write transaction, so several Streamlit
+      processes on the same host can append to the same database safely.
+    - load_recent()/load_before() page through history, so resuming a long session
+      reads only the last N records.
+    """
+    def __init__(self, path: str = DEFAULT_PATH, flush_every: int = 32):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self._lock = threading.Lock()
+        self._buffer: List[tuple] = []      # (session_id, ts, payload json)
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY, app TEXT NOT NULL,
+                created REAL NOT NULL, updated REAL NOT NULL, n INTEGER NOT NULL DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS sessions_app_updated ON sessions(app, updated);
+            CREATE TABLE IF NOT EXISTS events (
+                session_id TEXT NOT NULL, seq INTEGER NOT NULL, ts REAL NOT NULL, payload TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)) WITHOUT ROWID;
+            """
+        )
+        atexit.register(self.flush)
+
+    # ---------- sessions ----------
+    def new_session(self, app: str) -> str:
+        sid = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT INTO sessions (id, app, created, updated, n) VALUES (?, ?, ?, ?, 0)",
+                             (sid, app, now, now))
+        return sid
+
+    def exists(self, sid: str, app: Optional[str] = None) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT app FROM sessions WHERE id = ?", (sid,)).fetchone()
+        return row is not None and (app is None or row[0] == app)
+
+    def count(self, sid: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT n FROM sessions WHERE id = ?", (sid,)).fetchone()
+        return row[0] if row else 0
+
+    def list_sessions(self, app: str, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, created, updated, n FROM sessions WHERE app = ? ORDER BY updated DESC LIMIT ?",
+                (app, limit)).fetchall()
+        return [{"id": r[0], "created": r[1], "updated": r[2], "n": r[3]} for r in rows]
+
+    # ---------- log ----------
+    def append(self, sid: str, record: Dict[str, Any]) -> None:
+        """Buffer one record; written on flush() (or automatically every `flush_every` records)."""
+        with self._lock:
+            self._buffer.append((sid, time.time(), json.dumps(record, ensure_ascii=False)))
+            full = len(self._buffer) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            db = self._db
+            try:
+                # inside the try: a busy/locked database must not lose the swapped-out batch
+                db.execute("BEGIN IMMEDIATE")
+                for sid, ts, payload in batch:
+                    db.execute(
+                        "INSERT INTO events (session_id, seq, ts, payload) "
+                        "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM events WHERE session_id = ?",
+                        (sid, ts, payload, sid))
+                    db.execute("UPDATE sessions SET updated = ?, n = n + 1 WHERE id = ?", (ts, sid))
+                db.execute("COMMIT")
+            except BaseException:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                self._buffer[:0] = batch
+                raise
+
+    def load_recent(self, sid: str, n: int) -> List[Dict[str, Any]]:
+        """Last n records in chronological order; each carries its "seq"."""
+        return self._load(sid, None, n)
+
+    def load_before(self, sid: str, before_seq: int, n: int) -> List[Dict[str, Any]]:
+        """Up to n records older than before_seq, in chronological order."""
+        return self._load(sid, before_seq, n)
+
+    def _load(self, sid: str, before_seq: Optional[int], n: int) -> List[Dict[str, Any]]:
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, payload FROM events WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (sid, before_seq if before_seq is not None else 1 << 62, n)).fetchall()
+        out = []
+        for seq, payload in reversed(rows):
+            record = json.loads(payload)
+            record["seq"] = seq
+            out.append(record)
+        return out
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> SessionStore:
+    """Process-wide store (one SQLite connection shared by all Streamlit sessions)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
+
+def resume_or_create(app: str, params) -> Tuple[str, bool]:
+    """
+    Session id for `app` from URL query params (e.g. st.query_params), so a reload or a
+    different replica picks the same session up. Returns (session_id, resumed).
+    """
+    key = f"{app}_sid"
+    sid = params.get(key)
+    store = get_store()
+    if sid and store.exists(sid, app):
+        return sid, True
+    sid = store.new_session(app)
+    params[key] = sid
+    return sid, False
@@ -0,0 +1,61 @@
+# tests/test_dedupe.py  (NEAR-DUPLICATE DESCRIPTION INDEX)
+from __future__ import annotations
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dedupe import DedupeIndex, normalize, _bands_for  # noqa: E402
+
+BASE = ("Apple iPhone 15 Pro Max smartphone, 256GB, Natural Titanium, 6.7-inch Super Retina XDR "
+        "display, A17 Pro chip, 48MP main camera, USB-C.")
+
+def test_normalize_drops_case_punctuation_and_boilerplate_but_keeps_numbers():
+    text, numbers = normalize("BRAND NEW!! Wireless Mouse, 2.4GHz -- FREE SHIPPING. Sold by ACME Store")
+    assert text == "wireless mouse 2 4ghz"
+    assert numbers == ("2.4",)
+
+def test_near_duplicates_merge_into_the_first_row():
+    merges = []
+    index = DedupeIndex(audit=lambda row, rep, sim: merges.append((row, rep)))
+    assert index.add(0, BASE) == (0, 1.0)
+    rep, sim = index.add(1, "Free shipping! " + BASE.upper() + " Buy now")
+    assert rep == 0 and sim >= index.threshold
+    assert merges == [(1, 0)]
+    assert index.stats()["merged"] == 1
+
+def test_same_text_with_different_numbers_is_a_different_product():
+    index = DedupeIndex()
+    index.add(0, BASE)
+    assert index.add(1, BASE.replace("256GB", "512GB")) == (1, 1.0)
+    assert index.number_mismatches == 1
+
+def test_unrelated_rows_start_their_own_clusters():
+    index = DedupeIndex()
+    index.add(0, BASE)
+    assert index.add(1, "Nike Pegasus 40 running shoes, breathable mesh upper, size 10, blue.") == (1, 1.0)
+
+def test_representatives_are_capped_least_recently_matched_first():
+    index = DedupeIndex(max_representatives=2)
+    texts = {k: f"{name} with a long enough description to shingle properly"
+             for k, name in enumerate(("Walnut salad bowl", "Steel water bottle", "Cotton beach towel"))}
+    index.add(0, texts[0])
+    index.add(1, texts[1])
+    index.set_result(0, {"brand": "A"})
+    assert index.add(10, texts[0])[0] == 0           # touching 0 makes 1 the coldest
+    index.add(2, texts[2])                           # evicts 1
+    assert index.evicted == 1
+    assert index.result(0) == {"brand": "A"}
+    assert index.add(11, texts[1]) == (11, 1.0)      # its representative is gone
+
+def test_results_are_dropped_with_their_representative():
+    index = DedupeIndex(max_representatives=1)
+    index.add(0, BASE)
+    index.set_result(0, "r0")
+    index.add(1, "Nike Pegasus 40 running shoes, breathable mesh upper, size 10, blue.")
+    assert index.result(0) is None
+    index.set_result(0, "late")                      # no longer a representative: ignored
+    assert index.result(0) is None
+
+def test_lsh_bands_cover_the_signature():
+    for threshold in (0.7, 0.85, 0.95):
+        bands, rows = _bands_for(threshold, 64)
+        assert bands * rows == 64
@@ -0,0 +1,89 @@
+# tests/test_jsonstream.py  (INCREMENTAL JSON PARSER FOR STREAMED MODEL OUTPUT)
+from __future__ import annotations
+import os, sys, json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jsonstream import JSONStreamParser, JSONStreamError, extract_json  # noqa: E402
+
+RECORD = {"product_name": "Mug", "brand": "", "features": ["Dishwasher safe", "350 ml"],
+          "description": "A mug with \"quotes\", {braces} and [brackets]."}
+KEYS = ("product_name", "brand", "features", "description")
+
+def _chunks(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+# ==============================================================================
+# SPLIT CHUNKS
+# ==============================================================================
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_completes_on_the_chunk_that_closes_the_root(size):
+    text = "```json\n" + json.dumps(RECORD) + "\n```\nHope this helps!"
+    parser = JSONStreamParser(allowed_keys=KEYS)
+    closing = None
+    for n, chunk in enumerate(_chunks(text, size)):
+        if parser.feed(chunk):
+            closing = n
+            break
+    end = text.index("\n```\nHope")
+    assert closing == (end - 1) // size
+    assert parser.value() == RECORD
+    assert parser.feed("more") is True        # later chunks are ignored
+
+def test_brackets_and_escapes_inside_strings_do_not_count():
+    parser = JSONStreamParser()
+    for chunk in ['{"a": "x}\\"', ']{[ \\\\', '", "b": 1', '}']:
+        done = parser.feed(chunk)
+    assert done and parser.value() == {"a": 'x}"]{[ \\', "b": 1}
+
+def test_root_array_of_records():
+    rows = [{"brand": "A"}, {"brand": "B", "features": []}]
+    parser = JSONStreamParser(allowed_keys=KEYS, root="[")
+    assert any(parser.feed(c) for c in _chunks(json.dumps(rows), 5))
+    assert parser.value() == rows
+
+# ==============================================================================
+# EARLY FAILURE
+# ==============================================================================
+def test_unknown_key_fails_as_soon_as_it_is_parsed():
+    parser = JSONStreamParser(allowed_keys=KEYS)
+    parser.feed('{"brand": "A", "pric')
+    with pytest.raises(JSONStreamError, match="price"):
+        parser.feed('e": "$5", "description": "never read"}')
+
+def test_nested_keys_are_not_record_keys():
+    parser = JSONStreamParser(allowed_keys=KEYS)
+    assert parser.feed('{"brand": "A", "features": [{"anything": 1}]}')
+
+def test_unknown_key_in_a_root_array_record():
+    parser = JSONStreamParser(allowed_keys=KEYS, root="[")
+    with pytest.raises(JSONStreamError):
+        parser.feed('[{"brand": "A"}, {"colour": "red"}]')
+
+def test_prose_without_json_fails_past_max_prefix():
+    parser = JSONStreamParser(max_prefix=20)
+    assert parser.feed("Sure! Here is ") is False
+    with pytest.raises(JSONStreamError):
+        parser.feed("the product you asked about...")
+
+def test_unbalanced_close_fails():
+    with pytest.raises(JSONStreamError, match="Unbalanced"):
+        JSONStreamParser().feed('{"a": [1, 2}')
+
+# ==============================================================================
+# PARTIAL RECORDS
+# ==============================================================================
+def test_partial_record_is_incomplete():
+    parser = JSONStreamParser(allowed_keys=KEYS)
+    assert parser.feed('noise {"brand": "A", "features": ["x"') is False
+    assert not parser.complete
+    assert parser.document() == 'noise {"brand": "A", "features": ["x"'
+    with pytest.raises(JSONStreamError, match="incomplete"):
+        parser.value()
+
+def test_extract_json_takes_the_first_value_after_any_prefix():
+    text = "x" * 500 + json.dumps(RECORD) + ' {"second": 1}'
+    assert extract_json(text, allowed_keys=KEYS) == RECORD
+    with pytest.raises(ValueError):
+        extract_json('{"brand": "A"')
@@ -0,0 +1,105 @@
+# tests/test_normalize.py  (TYPED FIELD PARSERS, BATCH NORMALIZATION, SINKS)
+from __future__ import annotations
+import io, os, sys, json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import normalize  # noqa: E402
+from normalize import (parse_price, parse_storage_gb, parse_weight_g, parse_dimensions_mm,  # noqa: E402
+                       normalize_record, normalize_rows, open_sink, write_rows, CURRENCY_SYMBOLS)
+
+# ==============================================================================
+# PRICE
+# ==============================================================================
+@pytest.mark.parametrize("text, expected", [
+    ("$1,199.99", (1199.99, "USD")),
+    ("US$ 20", (20.0, "USD")),
+    ("us$20", (20.0, "USD")),
+    ("€ 1.199,00", (1199.0, "EUR")),
+    ("Rs. 45,000", (45000.0, "INR")),
+    ("1 299 dollars", (1299.0, "USD")),
+    ("99 CAD", (99.0, "CAD")),
+    ("1199", (1199.0, "")),
+    ("", (None, "")),
+])
+def test_parse_price(text, expected):
+    assert parse_price(text) == expected
+
+def test_currency_table_keys_match_the_lowercased_lookup():
+    assert all(key == key.lower() for key in CURRENCY_SYMBOLS)
+    assert all(len(code) == 3 and code.isupper() for code in CURRENCY_SYMBOLS.values())
+
+# ==============================================================================
+# STORAGE / WEIGHT / DIMENSIONS
+# ==============================================================================
+def test_parse_storage_gb_uses_decimal_units():
+    assert parse_storage_gb("256GB") == 256.0
+    assert parse_storage_gb("1 TB") == 1000.0
+    assert parse_storage_gb("512 mb") == pytest.approx(0.512)
+    assert parse_storage_gb("n/a") is None
+
+def test_parse_weight_g():
+    assert parse_weight_g("221 g") == 221.0
+    assert parse_weight_g("1.5 kg") == 1500.0
+    assert parse_weight_g("2 lbs") == pytest.approx(907.185, abs=1e-3)
+    assert parse_weight_g("light") is None
+
+def test_parse_dimensions_unit_applies_to_numbers_before_it():
+    assert parse_dimensions_mm("146.6 x 70.6 x 8.25 mm") == (146.6, 70.6, 8.25)
+    assert parse_dimensions_mm("10 x 20 cm") == (100.0, 200.0)
+    assert parse_dimensions_mm("2 in x 30 mm") == (50.8, 30.0)
+    assert parse_dimensions_mm("") == ()
+
+# ==============================================================================
+# BATCH NORMALIZATION + SINKS
+# ==============================================================================
+RECORD = {"product_name": "Phone", "price": "US$ 999", "storage": "128GB", "weight": "200 g",
+          "dimensions": "150 x 70 x 8 mm", "features": "5G; USB-C\nNFC"}
+
+def test_normalize_record_types_and_keeps_raw_values():
+    out = normalize_record(RECORD)
+    assert out["price"] == "US$ 999"
+    assert (out["price_amount"], out["price_currency"]) == (999.0, "USD")
+    assert out["storage_gb"] == 128.0 and out["weight_g"] == 200.0
+    assert out["dimensions_mm"] == [150.0, 70.0, 8.0]
+    assert out["features"] == ["5G", "USB-C", "NFC"]
+    assert out["brand"] == ""
+
+def test_failed_rows_normalize_to_empty_columns():
+    cols = normalize_rows([(0, "desc a", RECORD, None), (1, "desc b", None, "bad JSON")])
+    assert cols["row"] == [0, 1]
+    assert cols["error"] == ["", "bad JSON"]
+    assert cols["price_amount"] == [999.0, None]
+    assert cols["features"][1] == []
+
+def test_ndjson_sink_streams_in_batches():
+    rows = [(i, f"d{i}", RECORD, None) for i in range(5)]
+    fh = io.StringIO()
+    sink = open_sink(fh, "ndjson")
+    assert write_rows(rows, sink, batch_size=2) == 5
+    lines = [json.loads(line) for line in fh.getvalue().splitlines()]
+    assert [r["row"] for r in lines] == list(range(5))
+    assert lines[0]["dimensions_mm"] == [150.0, 70.0, 8.0]
+
+def test_csv_sink_json_encodes_list_cells_and_can_skip_the_header():
+    fh = io.StringIO()
+    write_rows([(0, "d", RECORD, None)], open_sink(fh, "csv", header=False))
+    text = fh.getvalue()
+    assert not text.startswith("row,")
+    assert '"[""5G"", ""USB-C"", ""NFC""]"' in text
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        open_sink(io.StringIO(), "xlsx")
+
+@pytest.mark.skipif(not normalize.have_parquet(), reason="pyarrow not installed")
+def test_parquet_sink_round_trips_typed_columns():
+    import pyarrow.parquet as pq
+    fh = io.BytesIO()
+    sink = open_sink(fh, "parquet")
+    write_rows([(0, "d", RECORD, None), (1, "e", None, "boom")], sink)
+    sink.close()
+    table = pq.read_table(io.BytesIO(fh.getvalue()))
+    assert table.column("price_amount").to_pylist() == [999.0, None]
+    assert table.column("features").to_pylist() == [["5G", "USB-C", "NFC"], []]
@@ -0,0 +1,55 @@
+# tests/test_prodbot_packing.py  (PACKED EXTRACTION: PACKING, SALVAGE, ALIGNMENT)
+from __future__ import annotations
+import os, sys, json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PRODBOT_CACHE", "off")       # no .cache/ file from importing prodbot
+import prodbot  # noqa: E402
+from prodbot import align_packed, _salvage_array, iter_packs  # noqa: E402
+
+# ==============================================================================
+# _salvage_array
+# ==============================================================================
+def test_salvage_keeps_complete_elements_of_a_cut_off_array():
+    text = 'Here: [{"i": 0, "brand": "A"}, {"i": 1, "brand": "B"}, {"i": 2, "bra'
+    assert _salvage_array(text) == [{"i": 0, "brand": "A"}, {"i": 1, "brand": "B"}]
+
+def test_salvage_of_a_complete_array_and_of_no_array():
+    assert _salvage_array('[{"i": 0}, 1, "x"]') == [{"i": 0}, 1, "x"]
+    assert _salvage_array("[]") == []
+    assert _salvage_array("no json here") == []
+    assert _salvage_array('[{"i": 0}, oops, {"i": 1}]') == [{"i": 0}]   # stops at the first bad element
+
+# ==============================================================================
+# align_packed
+# ==============================================================================
+def test_align_maps_elements_by_their_index_not_their_order():
+    out = align_packed([{"i": 2, "brand": "C"}, {"i": 0, "brand": "A"}], 3)
+    assert [json.loads(o) if o else None for o in out] == [{"brand": "A"}, None, {"brand": "C"}]
+
+def test_align_drops_bad_and_duplicate_indexes():
+    items = [{"i": 0, "brand": "A"}, {"i": 0, "brand": "A again"}, {"i": 5, "brand": "out of range"},
+             {"i": True, "brand": "bool"}, {"i": "1", "brand": "str"}, {"brand": "no index"},
+             "not an object", {"i": 1}]
+    assert align_packed(items, 2) == [None, None]     # 0 claimed twice; 1 has no fields
+
+def test_align_of_a_non_list_is_all_retries():
+    assert align_packed({"i": 0, "brand": "A"}, 2) == [None, None]
+
+def test_complete_packed_salvages_a_truncated_stream(monkeypatch):
+    truncated = '[{"i": 1, "brand": "B"}, {"i": 0, "brand": "A"}, {"i": 2, "br'
+    monkeypatch.setattr(prodbot, "_stream_json", lambda *a, **k: truncated)
+    out = prodbot._complete_packed(["a", "b", "c"])
+    assert [json.loads(o)["brand"] if o else None for o in out] == ["A", "B", None]
+
+# ==============================================================================
+# iter_packs
+# ==============================================================================
+def test_packs_preserve_order_and_respect_max_items():
+    packs = list(iter_packs(range(10), text=str, max_items=4))
+    assert packs == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+def test_long_descriptions_travel_in_smaller_packs(monkeypatch):
+    monkeypatch.setattr(prodbot, "PACK_INPUT_TOKENS", 100)
+    long = "word " * 60          # ~75 tokens each
+    assert [len(p) for p in iter_packs([long, long, "short", long], max_items=8)] == [1, 2, 1]
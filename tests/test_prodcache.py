@@ -0,0 +1,135 @@
+# tests/test_prodcache.py  (DISK CACHE: SINGLE-FLIGHT, LRU AND TTL EVICTION)
+from __future__ import annotations
+import os, sys, time, threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import prodcache  # noqa: E402
+from prodcache import ResponseCache, cache_key  # noqa: E402
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def tick(self, seconds: float = 1.0) -> None:
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(prodcache, "time", fake)
+    return fake
+
+def _cache(tmp_path, **kwargs) -> ResponseCache:
+    return ResponseCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+
+def test_cache_key_is_stable_and_order_insensitive_for_dicts():
+    assert cache_key("m", {"a": 1, "b": 2}) == cache_key("m", {"b": 2, "a": 1})
+    assert cache_key("m", "x") != cache_key("m", "y")
+
+# ==============================================================================
+# TTL / LRU
+# ==============================================================================
+def test_expired_entries_are_misses(tmp_path, clock):
+    cache = _cache(tmp_path, ttl=60)
+    cache.put("k", "v")
+    clock.tick(59)
+    assert cache.get("k") == "v"
+    clock.tick(2)
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0          # purged on read
+
+def test_least_recently_read_entries_are_evicted_first(tmp_path, clock):
+    cache = _cache(tmp_path, max_entries=3, ttl=None, evict_every=1)
+    for key in "abc":
+        cache.put(key, key)
+        clock.tick()
+    assert cache.get("a") == "a"                  # "b" is now the coldest
+    clock.tick()
+    cache.put("d", "d")
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["a", "c", "d"]
+    assert cache.evictions == 1
+
+def test_byte_cap_evicts_until_under(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=250, ttl=None, evict_every=1)
+    for i in range(5):
+        cache.put(f"k{i}", "x" * 100)
+        clock.tick()
+    stats = cache.stats()
+    assert stats["bytes"] <= 250 and stats["entries"] == 2
+    assert cache.get("k4") is not None and cache.get("k0") is None
+
+# ==============================================================================
+# SINGLE-FLIGHT
+# ==============================================================================
+def test_concurrent_callers_share_one_compute(tmp_path):
+    cache = _cache(tmp_path)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 2
+    while cache.shared < 4 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert calls == [1]
+    assert results == ["value"] * 5
+    assert cache.get("k") == "value"
+
+def test_errors_reach_every_waiter_and_are_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(2)
+        raise RuntimeError("upstream down")
+
+    errors = []
+    def call():
+        try:
+            cache.get_or_compute("k", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(2)
+    follower = threading.Thread(target=call)
+    follower.start()
+    deadline = time.monotonic() + 2
+    while cache.shared < 1 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    leader.join(2)
+    follower.join(2)
+    assert errors == ["upstream down"] * 2
+    assert cache.get_or_compute("k", lambda: "ok") == "ok"
+
+def test_uncacheable_results_are_returned_but_not_stored(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get_or_compute("k", lambda: "[error]", cacheable=lambda v: not v.startswith("[")) == "[error]"
+    assert cache.get("k") is None
+
+def test_leader_rechecks_the_cache_before_computing(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    cache.put("k", "stored by a finished leader")
+    monkeypatch.setattr(cache, "get", lambda key: None)     # our first lookup raced that leader
+    assert cache.get_or_compute("k", lambda: pytest.fail("computed twice")) == "stored by a finished leader"
+    assert cache.shared == 1
@@ -0,0 +1,101 @@
+# tests/test_prodcli.py  (CHECKPOINT RESUME)
+"""
+    python -m pytest -q tests
+
+The extractor is replaced by a local fake that echoes each description and can stop
+after N rows, standing in for a crash part-way through a run.
+"""
+from __future__ import annotations
+import os, sys, json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PRODBOT_CACHE", "off")       # no .cache/ file from importing prodbot
+import prodcli  # noqa: E402
+
+class Crash(Exception):
+    pass
+
+def _fake_extract(crash_after=None):
+    def iter_extract(descriptions, **kwargs):
+        for i, desc in enumerate(descriptions):
+            if i == crash_after:
+                raise Crash()
+            yield i, desc, {"product_name": desc}, None
+    return iter_extract
+
+def _run(monkeypatch, source, fmt, ckpt, crash_after=None, **kwargs):
+    monkeypatch.setattr(prodcli, "iter_extract", _fake_extract(crash_after))
+    out_path = f"{ckpt}.jsonl"                      # appended to, like -o
+    with open(out_path, "a", encoding="utf-8") as out:
+        start = out.tell()
+        try:
+            stats = prodcli.run(source, fmt, out, checkpoint=ckpt, **kwargs)
+        except Crash:
+            stats = None
+    with open(out_path, encoding="utf-8") as f:
+        f.seek(start)
+        return stats, [json.loads(line) for line in f]   # the rows this call wrote
+
+def _interrupted_then_resumed(monkeypatch, tmp_path, name, text, fmt):
+    source = tmp_path / name
+    source.write_bytes(text.encode("utf-8"))
+    ckpt = str(tmp_path / "run.ckpt")
+    stats, first = _run(monkeypatch, str(source), fmt, ckpt, crash_after=2, checkpoint_every=1)
+    assert stats is None and len(first) == 2
+    stats, second = _run(monkeypatch, str(source), fmt, ckpt, checkpoint_every=1)
+    return stats, first + second
+
+# ==============================================================================
+# RESUME
+# ==============================================================================
+NAMES = ["Alpha phone 64GB", "Beta laptop 16GB", "Gamma watch", "Delta tablet 128GB", "Epsilon buds"]
+
+def _assert_complete(stats, rows):
+    assert stats["resumed_at"] == 2 and stats["rows"] == len(NAMES) - 2
+    assert [r["row"] for r in rows] == list(range(len(NAMES)))     # no repeats, numbering continues
+    assert [r["input"] for r in rows] == NAMES
+
+def test_resume_headered_csv(monkeypatch, tmp_path):
+    text = "sku,description\r\n" + "".join(f"{n},{d}\r\n" for n, d in enumerate(NAMES))
+    _assert_complete(*_interrupted_then_resumed(monkeypatch, tmp_path, "catalog.csv", text, "csv"))
+
+def test_resume_headerless_csv(monkeypatch, tmp_path):
+    # the first line is data, not a header: it must not be replayed on resume
+    text = "".join(f"{d},x\n" for d in NAMES)
+    _assert_complete(*_interrupted_then_resumed(monkeypatch, tmp_path, "catalog.csv", text, "csv"))
+
+def test_resume_lines_with_bom_and_blank_lines(monkeypatch, tmp_path):
+    text = "\ufeff" + NAMES[0] + "\n\n" + "\n".join(NAMES[1:]) + "\n"
+    _assert_complete(*_interrupted_then_resumed(monkeypatch, tmp_path, "items.txt", text, "lines"))
+
+def test_resume_jsonl(monkeypatch, tmp_path):
+    text = "".join(json.dumps({"description": d}) + "\n" for d in NAMES)
+    _assert_complete(*_interrupted_then_resumed(monkeypatch, tmp_path, "items.jsonl", text, "jsonl"))
+
+def test_finished_run_resumes_to_nothing(monkeypatch, tmp_path):
+    source = tmp_path / "items.txt"
+    source.write_text("\n".join(NAMES) + "\n", encoding="utf-8")
+    ckpt = str(tmp_path / "run.ckpt")
+    stats, rows = _run(monkeypatch, str(source), "lines", ckpt, checkpoint_every=100)
+    assert stats["rows"] == len(NAMES) and len(rows) == len(NAMES)
+    saved = json.load(open(ckpt, encoding="utf-8"))
+    assert saved["offset"] == source.stat().st_size and saved["rows"] == len(NAMES)
+    stats, rows = _run(monkeypatch, str(source), "lines", ckpt)
+    assert stats == {"rows": 0, "errors": 0, "resumed_at": len(NAMES), "merged": 0} and rows == []
+
+# ==============================================================================
+# CHECKPOINT FILE
+# ==============================================================================
+def test_checkpoint_for_another_source_is_refused(tmp_path):
+    ckpt = str(tmp_path / "run.ckpt")
+    prodcli.save_checkpoint(ckpt, {"source": "/data/a.csv", "offset": 10, "rows": 1})
+    with pytest.raises(SystemExit):
+        prodcli.load_checkpoint(ckpt, "/data/b.csv")
+    assert prodcli.load_checkpoint(ckpt, "/data/a.csv")["offset"] == 10
+    assert not os.path.exists(ckpt + ".tmp")
+
+def test_missing_checkpoint_starts_at_zero(tmp_path):
+    assert prodcli.load_checkpoint(str(tmp_path / "none.ckpt"), "x") == {"source": "x", "offset": 0, "rows": 0}
+    assert prodcli.load_checkpoint(None, "x")["offset"] == 0
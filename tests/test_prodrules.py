@@ -0,0 +1,63 @@
+# tests/test_prodrules.py  (LOCAL RULE-BASED PRE-EXTRACTOR)
+from __future__ import annotations
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prodrules import pre_extract, FIELDS, FastPathStats, EMPTY_CONF_FORMULAIC, EMPTY_CONF_PROSE  # noqa: E402
+
+def test_formulaic_listing_fills_the_easy_fields():
+    out = pre_extract("Apple iPhone 15 Pro, 256GB, Natural Titanium, 187 g, $999")
+    v, c = out.values, out.confidence
+    assert (v["brand"], v["category"]) == ("Apple", "Smartphone")
+    assert (v["storage"], v["weight"], v["price"]) == ("256GB", "187 g", "$999")
+    assert v["color"] == "Natural Titanium"
+    assert c["storage"] >= 0.9 and c["price"] >= 0.9
+    assert c["dimensions"] == EMPTY_CONF_FORMULAIC      # nothing left that could hold it
+
+def test_specs_in_the_title_stay_out_of_model_and_description():
+    v = pre_extract("Samsung Galaxy S24 128GB black, $799").values
+    assert v["model"] == "Galaxy S24"
+    assert v["description"] == "Samsung Galaxy S24 with 128GB storage in Black."
+    assert v["product_name"] == "Samsung Galaxy S24 128GB black"    # raw title; the model trims it
+
+def test_trailing_category_noun_is_not_part_of_the_model():
+    v = pre_extract("Dell XPS 13 laptop silver 512GB").values
+    assert v["model"] == "XPS 13"
+    assert v["description"] == "Dell XPS 13 laptop with 512GB storage in Silver."
+
+def test_leading_product_line_stays_in_the_model():
+    assert pre_extract("Apple iPhone 15, Blue, $799").values["model"] == "iPhone 15"
+
+def test_labelled_model_wins_over_the_title():
+    out = pre_extract("Logitech MX Master 3S mouse, Model: 910-006557, Graphite")
+    assert out.values["model"] == "910-006557" and out.confidence["model"] == 0.95
+
+def test_ambiguous_values_get_low_confidence():
+    out = pre_extract("Phone case, $10 or $12 for two, red or blue")
+    assert out.values["price"] == "$10" and out.confidence["price"] == 0.5
+    assert out.confidence["color"] < 0.85
+
+def test_prose_leaves_empty_fields_uncertain():
+    out = pre_extract("This lovely handmade bowl was carved from a single piece of walnut by a local "
+                      "artisan and makes a thoughtful gift for anyone who enjoys cooking at home.")
+    assert out.values["storage"] == "" and out.confidence["storage"] == EMPTY_CONF_PROSE
+    assert "storage" in out.low_confidence(0.5)
+
+def test_unclaimed_segments_become_features():
+    v = pre_extract("Sony WH-1000XM5 headphones, Black, Noise cancelling, 30h battery, $399").values
+    assert v["features"] == ["Noise cancelling", "30h battery"]
+
+def test_to_json_keeps_schema_order_and_omits_empty_features():
+    out = pre_extract("Nike Pegasus 40, Size 10, Blue")
+    data = out.to_json()
+    assert list(data) == [f for f in FIELDS if f != "features"]
+    out.set("features", ["Breathable mesh"], 0.8)
+    assert out.to_json()["features"] == ["Breathable mesh"]
+
+def test_stats_shares():
+    stats = FastPathStats()
+    stats.record(13, 13)
+    stats.record(5, 13)
+    snap = stats.snapshot()
+    assert snap["rows"] == 2 and snap["rows_local"] == 1
+    assert snap["fields_local_share"] == round(18 / 26, 3)
@@ -0,0 +1,83 @@
+# tests/test_retrieval.py  (TURN INDEX + RETRIEVAL-BACKED CONVERSATION MEMORY)
+from __future__ import annotations
+import os, sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from retrieval import TurnIndex  # noqa: E402
+from chat_memory import ConversationMemory, count_tokens  # noqa: E402
+
+TURNS = [
+    "User: My manager keeps emailing me late at night about deadlines.",
+    "Assistant: That sounds stressful. Could you agree on hours when email waits until morning?",
+    "User: I also started running in the park on weekends.",
+    "Assistant: Running is a great outlet. How do you feel after a run?",
+    "User: My sister is visiting next month and I'm nervous about it.",
+    "Assistant: Family visits can stir up a lot. What part feels hardest?",
+]
+
+def _index(turns=TURNS, **kwargs) -> TurnIndex:
+    index = TurnIndex(recent=0, **kwargs)
+    for line in turns:
+        index.add(line)
+    return index
+
+def test_search_finds_the_turn_about_the_query():
+    hits = _index().search("what did I say about my manager and email", k=2)
+    assert hits and hits[0][0] in (0, 1)
+    assert all(a[1] >= b[1] for a, b in zip(hits, hits[1:]))       # best first
+
+def test_exclude_last_and_min_score():
+    index = _index()
+    assert all(pos < 4 for pos, _ in index.search("sister visiting", exclude_last=2, min_score=0.0))
+    assert index.search("sister visiting", min_score=0.99) == []
+    assert index.search("the and of") == []                          # only stop words
+
+def test_relevant_lines_are_in_conversation_order_and_fit_max_tokens():
+    index = _index()
+    lines = index.relevant_lines("running in the park, and my manager's email", k=4, exclude_last=0)
+    assert lines == sorted(lines, key=TURNS.index)
+    budget = count_tokens(TURNS[2]) + 1
+    fitted = index.relevant_lines("running in the park, and my manager's email", k=4, exclude_last=0,
+                                  max_tokens=budget)
+    assert fitted and sum(count_tokens(line) for line in fitted) <= budget
+
+def test_dropping_the_oldest_keeps_document_frequencies_exact():
+    turns = [f"User: turn {i} about {'sleep' if i % 3 else 'work'} and topic{i % 7}" for i in range(50)]
+    capped = _index(turns, max_turns=16)
+    fresh = _index(turns[-len(capped):])
+    assert len(capped) <= 16
+    np.testing.assert_allclose(capped._df, fresh._df)
+    query = "work and topic3"
+    assert capped.search(query, min_score=0.0) == fresh.search(query, min_score=0.0)
+
+def test_index_is_stored_sparse():
+    index = _index([f"User: a short turn number {i} about sleep" for i in range(1000)], max_turns=1000)
+    arrays = index._idx.nbytes + index._tf.nbytes
+    assert arrays < 1000 * index.n_features * 4 / 20                 # dense rows would be 4 MiB
+
+def test_long_turns_are_clipped_when_stored():
+    index = _index(["User: " + "word " * 500])
+    assert len(index.relevant_lines("word", exclude_last=0, k=1)[0]) <= 600
+
+# ==============================================================================
+# ConversationMemory with an index
+# ==============================================================================
+def _memory(n: int, budget: int = 300) -> ConversationMemory:
+    memory = ConversationMemory(budget_tokens=budget, summary_tokens=80, index=TurnIndex(recent=2))
+    for i in range(n):
+        role, text = ("user", "assistant")[i % 2], TURNS[i % len(TURNS)].split(": ", 1)[1]
+        memory.add(role, f"{text} ({i})")
+    return memory
+
+def test_retrieval_keeps_the_summary_and_the_budget():
+    memory = _memory(60)
+    text = memory.history_text("my manager and late email")
+    assert text.startswith("Summary of earlier conversation:")
+    assert "Relevant earlier turns:" in text and "Recent turns:" in text
+    assert count_tokens(text) <= memory.budget_tokens + 10            # + section headers
+
+def test_short_conversations_skip_retrieval():
+    memory = _memory(2)
+    assert memory.history_text("manager") == memory.history_text()
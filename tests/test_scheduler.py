@@ -0,0 +1,143 @@
+# tests/test_scheduler.py  (SCHEDULER ADMISSION, RESERVE, FAIRNESS, REFUNDS)
+"""
+    python -m pytest -q tests
+
+Waiters are queued against an empty requests bucket, then released one request at a
+time, so the order they are admitted in is exactly the order the scheduler picks.
+"""
+from __future__ import annotations
+import os, sys, time, threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scheduler import Scheduler, NullScheduler, INTERACTIVE, BATCH  # noqa: E402
+
+def _scheduler(rpm: float = 6, tpm: float = 1_000_000, batch_reserve: float = 0.0) -> Scheduler:
+    # rpm=6 refills one request every 10 s: nothing is admitted unless the test releases it
+    return Scheduler(rpm, tpm, headroom=1.0, batch_reserve=batch_reserve)
+
+def _waiting(s: Scheduler) -> int:
+    with s._cond:
+        return sum(len(q) for sessions in s._queues.values() for q in sessions.values())
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+def _queue(s: Scheduler, waiters):
+    """Start one acquire() per (name, priority, session), in that order; returns the admission log."""
+    admitted, threads = [], []
+
+    def run(name, priority, session):
+        s.acquire(10, priority, session)
+        admitted.append(name)
+
+    with s._cond:
+        s.requests.level = 0
+    for n, (name, priority, session) in enumerate(waiters):
+        t = threading.Thread(target=run, args=(name, priority, session), daemon=True)
+        t.start()
+        threads.append(t)
+        _wait_for(lambda: _waiting(s) == n + 1)     # queued in a known order
+    return admitted, threads
+
+def _release_all(s: Scheduler, admitted, threads):
+    for n in range(len(threads)):
+        with s._cond:
+            s.requests.level = 1
+            s._cond.notify_all()
+        _wait_for(lambda: len(admitted) == n + 1)
+    for t in threads:
+        t.join(1)
+    return admitted
+
+# ==============================================================================
+# ADMISSION ORDER
+# ==============================================================================
+def test_interactive_admitted_before_earlier_batch():
+    s = _scheduler()
+    admitted, threads = _queue(s, [("b1", BATCH, "bulk"), ("b2", BATCH, "bulk"), ("i1", INTERACTIVE, "chat")])
+    assert _release_all(s, admitted, threads) == ["i1", "b1", "b2"]
+    assert s.granted == {INTERACTIVE: 1, BATCH: 2}
+
+def test_fifo_within_a_session():
+    s = _scheduler()
+    admitted, threads = _queue(s, [(f"c{i}", INTERACTIVE, "chat") for i in range(4)])
+    assert _release_all(s, admitted, threads) == ["c0", "c1", "c2", "c3"]
+
+# ==============================================================================
+# ROUND-ROBIN BY SESSION
+# ==============================================================================
+def test_sessions_take_turns():
+    s = _scheduler()
+    waiters = [("a1", BATCH, "a"), ("a2", BATCH, "a"), ("a3", BATCH, "a"), ("b1", BATCH, "b"), ("b2", BATCH, "b")]
+    admitted, threads = _queue(s, waiters)
+    assert _release_all(s, admitted, threads) == ["a1", "b1", "a2", "b2", "a3"]
+
+# ==============================================================================
+# BATCH RESERVE
+# ==============================================================================
+def test_batch_may_not_use_the_reserve():
+    s = Scheduler(rpm=600, tpm=60, headroom=1.0, batch_reserve=0.2)    # 1 token/s; reserve = 12
+    with s._cond:
+        s.tokens.level = 25
+    now = time.monotonic()
+    assert s._delay(now, 20, INTERACTIVE) == 0
+    assert s._delay(now, 20, BATCH) > 5         # needs 20 + 12 in the bucket
+
+    admitted = []
+    t = threading.Thread(target=lambda: admitted.append(s.acquire(20, BATCH, "bulk")), daemon=True)
+    t.start()
+    _wait_for(lambda: _waiting(s) == 1)
+    time.sleep(0.05)
+    assert not admitted
+
+    grant = s.acquire(20, INTERACTIVE, "chat")  # interactive still gets in while batch waits
+    assert grant.waited < 1
+
+    with s._cond:
+        s.tokens.level = 40
+        s._cond.notify_all()
+    t.join(1)
+    assert len(admitted) == 1 and s.granted[BATCH] == 1
+
+# ==============================================================================
+# SETTLE / REFUND
+# ==============================================================================
+def test_settle_refunds_the_unused_estimate():
+    s = Scheduler(rpm=600, tpm=600, headroom=1.0)
+    grant = s.acquire(100)
+    assert s.tokens.level == pytest.approx(500, abs=1)
+    grant.settle(30)
+    assert s.tokens.level == pytest.approx(570, abs=1)
+    grant.settle(0)                             # settled once; later calls are ignored
+    assert s.tokens.level == pytest.approx(570, abs=1)
+
+def test_settle_none_keeps_estimate_and_zero_refunds_all():
+    s = Scheduler(rpm=600, tpm=600, headroom=1.0)
+    kept = s.acquire(100)
+    kept.settle(None)
+    assert s.tokens.level == pytest.approx(500, abs=1)
+    unused = s.acquire(100)
+    unused.settle(0)
+    assert s.tokens.level == pytest.approx(500, abs=1)
+
+def test_refund_wakes_a_waiting_caller():
+    s = Scheduler(rpm=600, tpm=60, headroom=1.0)
+    first = s.acquire(60)
+    admitted = []
+    t = threading.Thread(target=lambda: admitted.append(s.acquire(40)), daemon=True)
+    t.start()
+    _wait_for(lambda: _waiting(s) == 1)
+    first.settle(10)                            # 50 back: enough for the waiter right away
+    t.join(1)
+    assert admitted and admitted[0].waited < 1
+
+def test_null_scheduler_grants_settle_quietly():
+    grant = NullScheduler().acquire(100, BATCH, "bulk")
+    grant.settle(10)
+    assert grant.waited == 0.0
@@ -0,0 +1,260 @@
+# tiers.py  (MODEL TIERS, HEDGED STREAMS AND FAILOVER)
+from __future__ import annotations
+import os, time, queue, threading, contextvars
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+import llm_client
+import metrics
+
+# ==============================================================================
+# CONFIG (env overrides)
+# ==============================================================================
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+HEDGE = os.getenv("HUB_HEDGE", "on").lower() not in ("0", "off", "false")
+HEDGE_QUANTILE = _env_float("HUB_HEDGE_QUANTILE", 0.95)     # hedge once a call is slower than this TTFT quantile
+HEDGE_MIN_DELAY = _env_float("HUB_HEDGE_MIN_DELAY", 0.25)   # seconds; never hedge sooner
+HEDGE_INITIAL_DELAY = _env_float("HUB_HEDGE_INITIAL_DELAY", 1.5)   # until a tier has MIN_SAMPLES
+HEDGE_BUDGET = _env_float("HUB_HEDGE_BUDGET", 0.1)          # at most this share of calls get a hedge
+FAILOVER_COOLDOWN = _env_float("HUB_FAILOVER_COOLDOWN", 30.0)      # seconds a failing tier is skipped
+MIN_SAMPLES = 20
+WINDOW = 256   # TTFT samples kept per tier
+
+def models_for(app: str, default: str) -> List[str]:
+    """Tier order for an app: HUB_MODELS_<APP>="fast-model,fallback-model" (first = primary)."""
+    raw = os.getenv(f"HUB_MODELS_{app.upper()}", "")
+    models = [m.strip() for m in raw.split(",") if m.strip()]
+    return models or [default]
+
+# ==============================================================================
+# PER-TIER LATENCY + HEALTH
+# ==============================================================================
+class TierStats:
+    """
+    Recent TTFTs of one model (the hedge threshold is their HEDGE_QUANTILE) and a
+    cooldown after errors / 429s. A call that lost a hedge race is recorded at the time
+    it was cancelled (a lower bound), so hedging doesn't hide the slow tail it reacts to.
+    """
+    __slots__ = ("ttfts", "cooldown_until", "lock")
+
+    def __init__(self):
+        self.ttfts: Deque[float] = deque(maxlen=WINDOW)
+        self.cooldown_until = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, ttft: float) -> None:
+        with self.lock:
+            self.ttfts.append(ttft)
+
+    def hedge_delay(self) -> float:
+        with self.lock:
+            if len(self.ttfts) < MIN_SAMPLES:
+                return HEDGE_INITIAL_DELAY
+            ordered = sorted(self.ttfts)
+        return max(HEDGE_MIN_DELAY, ordered[min(len(ordered) - 1, int(HEDGE_QUANTILE * len(ordered)))])
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def fail(self, seconds: float) -> None:
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+_stats: Dict[str, TierStats] = {}
+_stats_lock = threading.Lock()
+_calls = _hedges = 0
+
+def tier(model: str) -> TierStats:
+    stats = _stats.get(model)
+    if stats is None:
+        with _stats_lock:
+            stats = _stats.setdefault(model, TierStats())
+    return stats
+
+def snapshot() -> Dict[str, Any]:
+    """Per-tier hedge threshold, sample count and cooldown (for a debug sidebar)."""
+    now = time.monotonic()
+    return {"calls": _calls, "hedges": _hedges, "tiers": {
+        m: {"hedge_after_s": round(s.hedge_delay(), 3), "samples": len(s.ttfts),
+            "cooldown_s": round(max(0.0, s.cooldown_until - now), 1)} for m, s in list(_stats.items())}}
+
+def _take_hedge() -> bool:
+    """Hedge budget: hedged calls stay under HEDGE_BUDGET of all calls, so a global slowdown can't double load."""
+    global _hedges
+    with _stats_lock:
+        if _hedges + 1 > HEDGE_BUDGET * _calls:
+            return False
+        _hedges += 1
+        return True
+
+# ==============================================================================
+# ATTEMPTS — each opens a stream on a worker thread and reads up to the first token
+# ==============================================================================
+def _has_content(chunk: Any) -> bool:
+    choices = getattr(chunk, "choices", None)
+    return bool(choices and getattr(choices[0].delta, "content", None))
+
+class _Cancelled(Exception):
+    """Raised from on_admit when the attempt lost before it was sent."""
+
+class _Attempt:
+    """
+    One stream opened on a worker thread. It reports ("admitted", self) on `done` once the
+    scheduler lets it send, and ("done", self) once it has a first token or an error. TTFT
+    counts from the send, not from the start of the scheduler queue or a 429 pause.
+    """
+    def __init__(self, app: str, model: str, kwargs: Dict[str, Any], retries: Optional[int],
+                 done: "queue.Queue[_Attempt]", role: str):
+        self.app, self.model, self.role = app, model, role
+        self.head: List[Any] = []      # chunks read up to and including the first token
+        self.rest: Optional[Iterator[Any]] = None
+        self.stream = None
+        self.error: Optional[BaseException] = None
+        self.started: Optional[float] = None     # perf_counter when the request was sent
+        self.ttft: Optional[float] = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._done: "queue.Queue[Tuple[str, _Attempt]]" = done
+        # copy the context so the call keeps the caller's scheduler lane (priority, session)
+        threading.Thread(target=contextvars.copy_context().run, args=(self._run, kwargs, retries),
+                         name=f"llm-{role}", daemon=True).start()
+
+    def _admitted(self) -> None:
+        with self._lock:
+            if self._cancelled:
+                raise _Cancelled()
+            self.started = time.perf_counter()
+        self._done.put(("admitted", self))
+
+    def _run(self, kwargs: Dict[str, Any], retries: Optional[int]) -> None:
+        if self._cancelled:     # lost before it got a thread: never queue for admission
+            return
+        try:
+            stream = llm_client.chat_completion(app=self.app, retries=retries, on_admit=self._admitted,
+                                                **dict(kwargs, model=self.model))
+            with self._lock:
+                if self._cancelled:
+                    stream.close()
+                    return
+                self.stream = stream
+            it = iter(stream)
+            for chunk in it:
+                self.head.append(chunk)
+                if _has_content(chunk):
+                    break
+            self.ttft = time.perf_counter() - self.started
+            self.rest = it
+        except _Cancelled:
+            return
+        except BaseException as e:
+            self.error = e
+        self._done.put(("done", self))
+
+    def cancel(self) -> None:
+        """
+        Close the losing stream (or the one still opening, as soon as it opens). One still
+        waiting for admission is refunded and never sent.
+        """
+        with self._lock:
+            self._cancelled = True
+            stream, started = self.stream, self.started
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        if self.ttft is None and started is not None:
+            tier(self.model).observe(time.perf_counter() - started)
+
+class HedgedStream:
+    """The winning attempt's stream: buffered head chunks, then the live rest. `model` says who won."""
+    def __init__(self, attempt: _Attempt):
+        self._attempt = attempt
+        self.model = attempt.model
+
+    def __iter__(self):
+        yield from self._attempt.head
+        if self._attempt.rest is not None:
+            yield from self._attempt.rest
+
+    def close(self) -> None:
+        if self._attempt.stream is not None:
+            self._attempt.stream.close()
+
+# ==============================================================================
+# PUBLIC API
+# ==============================================================================
+def stream_completion(app: str, model: str, **kwargs: Any):
+    """
+    chat_completion(stream=True) across the app's model tiers (HUB_MODELS_<APP>, default
+    `model`):
+    - starts on the first healthy tier;
+    - if no token arrives within that tier's adaptive threshold (p95 TTFT), counted from
+      when the request was admitted and sent (not while it waits in the scheduler), sends one
+      hedged duplicate to the next healthy tier (or the same model when there is only
+      one); the first to produce a token wins and the other is closed;
+    - if a tier errors or is rate-limited (Groq limits are per model), it cools down and
+      the call fails over to the next tier at once instead of backing off.
+    Returns a stream with the usual chunk iteration and close().
+    """
+    global _calls
+    models = models_for(app, model)
+    kwargs = dict(kwargs, stream=True)
+    if len(models) == 1 and not HEDGE:
+        return llm_client.chat_completion(app=app, **dict(kwargs, model=models[0]))
+    with _stats_lock:
+        _calls += 1
+
+    now = time.monotonic()
+    order = [m for m in models if tier(m).healthy(now)] or models
+    # With somewhere to fail over to, don't retry the same model first
+    retries = 0 if len(order) > 1 else None
+    done: "queue.Queue[Tuple[str, _Attempt]]" = queue.Queue()
+    running = [_Attempt(app, order[0], kwargs, retries, done, "primary")]
+    next_tier = 1
+    hedge_due = HEDGE       # the hedge timer runs once per call
+    hedged = False
+    deadline: Optional[float] = None     # armed when the first attempt is admitted and sent
+    last_error: Optional[BaseException] = None
+
+    while running:
+        timeout = max(0.0, deadline - time.monotonic()) if hedge_due and deadline is not None else None
+        try:
+            event, attempt = done.get(timeout=timeout)
+        except queue.Empty:
+            hedge_due = False
+            if _take_hedge():
+                hedged = True
+                alt = order[next_tier] if next_tier < len(order) else order[0]
+                next_tier += next_tier < len(order)
+                running.append(_Attempt(app, alt, kwargs, retries, done, "hedge"))
+            continue
+
+        if event == "admitted":
+            if deadline is None:
+                deadline = time.monotonic() + tier(attempt.model).hedge_delay()
+            continue
+        running.remove(attempt)
+        if attempt.error is not None:
+            last_error = attempt.error
+            reason = llm_client._retry_reason(attempt.error)
+            if llm_client.is_retryable(attempt.error):
+                tier(attempt.model).fail(llm_client._retry_after(attempt.error) or FAILOVER_COOLDOWN)
+            if next_tier < len(order) and llm_client.is_retryable(attempt.error):
+                metrics.record_failover(app, attempt.model, order[next_tier], reason)
+                running.append(_Attempt(app, order[next_tier], kwargs, retries, done, "failover"))
+                next_tier += 1
+            continue
+
+        tier(attempt.model).observe(attempt.ttft)
+        for other in running:
+            other.cancel()
+        if hedged:
+            metrics.record_hedge(app, attempt.role)
+        return HedgedStream(attempt)
+
+    raise last_error